@@ -397,10 +397,25 @@ create_golden_image() {
 JSONEOF
     ok "Metadata saved to golden_info.json"
 
-    # Compress directly from source (no intermediate copy of the 10GB qcow2)
+    # Compress directly from source (no intermediate copy of the 10GB qcow2).
+    # Preferred: golden pack (.mgp) — 4 MB chunks compressed on every core,
+    # zero chunks skipped, unpacked in parallel by the GUI. Else 7z.
     local archive="$OUTPUT_DIR/jSpoof-golden-mac-a13.7z"
+    local pack="$OUTPUT_DIR/jSpoof-golden-mac-a13.mgp"
+    local pack_tool="$SCRIPT_DIR/../gui/golden_pack.py"
     local sevenz=""
 
+    if command -v python3 &>/dev/null && [ -f "$pack_tool" ]; then
+        log "Packing golden image on all cores (golden_pack.py)..."
+        if python3 "$pack_tool" pack "$data_qcow2" -o "$pack" \
+                --add "$OUTPUT_DIR/golden_info.json" --add-dir "$host_staging"; then
+            archive="$pack"
+            ok "Pack created: $pack ($(du -h "$pack" | cut -f1))"
+        else
+            warn "golden_pack.py failed — falling back to 7z"
+        fi
+    fi
+
     # Find 7z binary
     if [ -f "$BLUESTACKS/Contents/MacOS/7zz" ]; then
         sevenz="$BLUESTACKS/Contents/MacOS/7zz"
@@ -410,7 +425,9 @@ JSONEOF
         sevenz="7zz"
     fi
 
-    if [ -n "$sevenz" ]; then
+    if [ "$archive" = "$pack" ]; then
+        :
+    elif [ -n "$sevenz" ]; then
         log "Compressing golden image with 7z (archiving directly from source - no extra copy needed)..."
         log "This may take several minutes for a ${src_size} disk image..."
         "$sevenz" a -t7z -mx=5 "$archive" \
@@ -429,6 +446,15 @@ JSONEOF
         ok "data.qcow2 copied"
     fi
 
+    # Chunk manifest for delta updates (publish next to the raw data.qcow2)
+    local manifest_tool="$SCRIPT_DIR/../gui/image_manifest.py"
+    if command -v python3 &>/dev/null && [ -f "$manifest_tool" ]; then
+        log "Writing chunk manifest for delta updates..."
+        python3 "$manifest_tool" "$data_qcow2" -o "$OUTPUT_DIR/data.qcow2.manifest.json" >/dev/null \
+            && ok "Manifest saved to data.qcow2.manifest.json" \
+            || warn "Could not write the chunk manifest"
+    fi
+
     echo ""
     echo -e "${GREEN}═══════════════════════════════════════════════════════════════${NC}"
     echo -e "${GREEN}  GOLDEN IMAGE CREATED!${NC}"
@@ -439,11 +465,11 @@ JSONEOF
     if [ -f "$archive" ]; then
         local final_size
         final_size=$(du -h "$archive" | cut -f1)
-        echo "  Archive: jSpoof-golden-mac-a13.7z ($final_size)"
+        echo "  Archive: $(basename "$archive") ($final_size)"
         echo ""
     fi
     echo "  To restore from this golden image:"
-    echo "  1. Extract the .7z archive"
+    echo "  1. Extract the archive (.mgp: python3 gui/golden_pack.py unpack <pack> -C <dir>)"
     echo "  2. Place data.qcow2 in the target instance Engine directory"
     echo "  3. Copy host/Promotions/ and host/AppCache/ to the same Engine directory"
     echo "  4. Apply a unique jorkSpoofer profile to the new instance"
@@ -30,6 +30,27 @@ a = Analysis(
         ('clone_instance.py', '.'),
         ('randomize_instances.py', '.'),
         ('vpn_manager.py', '.'),
+        ('boot_waiter.py', '.'),
+        ('scheduler.py', '.'),
+        ('fleet_launcher.py', '.'),
+        ('instance_telemetry.py', '.'),
+        ('rpc_daemon.py', '.'),
+        ('fleet_fanout.py', '.'),
+        ('bulk_stop.py', '.'),
+        ('op_journal.py', '.'),
+        ('batch_planner.py', '.'),
+        ('progress_reporter.py', '.'),
+        ('snapshot_diff.py', '.'),
+        ('settings_store.py', '.'),
+        ('log_store.py', '.'),
+        ('downloader.py', '.'),
+        ('decompress_stream.py', '.'),
+        ('image_store.py', '.'),
+        ('image_manifest.py', '.'),
+        ('delta_update.py', '.'),
+        ('bandwidth.py', '.'),
+        ('golden_pack.py', '.'),
+        ('qcow2_info.py', '.'),
         # ── Web UI (gui/) ──
         ('index.html', '.'),
         ('osmb-logo.gif', '.'),
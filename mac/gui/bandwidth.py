@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Bandwidth — token-bucket shaping and low-priority sockets for downloads.
+
+An image download reads as fast as the link allows, and running instances'
+proxied traffic suffers for it.  A Shaper sits between the downloader's
+socket reads and the disk:
+
+    shaper = Shaper(rate=20 * 1024 * 1024)     # bytes/s, 0 = unlimited
+    shaper.consume(len(chunk))                 # blocks until within budget
+    shaper.configure(rate=5 * 1024 * 1024)     # live, from any thread
+
+Tokens refill continuously at ``rate`` up to one second's worth (the burst),
+and every connection of a download draws from the same bucket, so the cap
+holds however many segments are in flight.
+
+Adaptive mode (configure(adaptive=True)) runs a probe thread that times a
+TCP connect to a nearby host (the default gateway, else PROBE_FALLBACK) —
+a refused connection times the round trip just as well.  The lowest RTT
+seen is the idle baseline.  While the smoothed RTT stays below baseline +
+RTT_TARGET_MS the rate grows by a fraction per probe, up to the cap and to
+twice the throughput downloads actually achieved; above it the rate is cut
+in proportion to the excess (LEDBAT-style), so queues other traffic shares
+stay short.  The probe sleeps once no download has read for IDLE_AFTER
+seconds and wakes on the next consume().
+
+background_opener() builds a urllib opener whose sockets are marked low
+priority: DSCP CS1 (lower-effort) on every platform, plus the macOS
+background traffic class (SO_TRAFFIC_CLASS = SO_TC_BK) where available.
+
+Requires: nothing beyond the standard library
+"""
+from __future__ import annotations
+
+import http.client
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from typing import Callable, Optional
+
+# Seconds between adaptive RTT probes
+PROBE_INTERVAL = 0.5
+
+# Seconds without a consume() after which the probe goes quiet
+IDLE_AFTER = 5.0
+
+# Queueing delay tolerated above the idle RTT before backing off (ms)
+RTT_TARGET_MS = 25.0
+
+# Adaptive rate bounds (bytes/s)
+MIN_RATE = 256 * 1024
+START_RATE = 4 * 1024 * 1024
+
+# Probe target when no default gateway is found
+PROBE_FALLBACK = ("1.1.1.1", 53)
+
+# DSCP CS1 (lower effort) in the IP TOS byte
+_TOS_CS1 = 0x20
+
+# macOS <sys/socket.h>
+_SO_TRAFFIC_CLASS = 0x1086
+_SO_TC_BK = 100
+
+
+class Shaper:
+    """Shared token bucket with optional RTT-driven rate; see the module docstring."""
+
+    def __init__(self, rate: float = 0, adaptive: bool = False, background: bool = True,
+                 probe_target: Optional[tuple[str, int]] = None):
+        self._cond = threading.Condition()
+        self._cap = max(0.0, float(rate))        # configured ceiling, 0 = none
+        self._rate = self._cap                   # current rate, 0 = unlimited
+        self._tokens = 0.0
+        self._stamp = time.monotonic()
+        self._adaptive = False
+        self._probe_target = probe_target
+        self._probe: Optional[threading.Thread] = None
+        self._base_rtt: Optional[float] = None
+        self._rtt: Optional[float] = None
+        self._last_use: Optional[float] = None  # monotonic time of the last consume()
+        self._window_bytes = 0                   # consumed since the last probe
+        self._window_start = self._stamp
+        self._throughput: Optional[float] = None
+        self.background = background
+        self.counters = {"bytes": 0, "waits": 0, "wait_secs": 0.0, "backoffs": 0}
+        self.configure(adaptive=adaptive)
+
+    # ── Settings ──
+
+    def configure(self, rate: Optional[float] = None, adaptive: Optional[bool] = None,
+                  background: Optional[bool] = None):
+        """Change the cap (bytes/s, 0 = none), adaptive mode or socket
+        priority; takes effect on the next read of running downloads."""
+        with self._cond:
+            if rate is not None:
+                self._cap = max(0.0, float(rate))
+                self._rate = self._cap if not self._adaptive else self._clamp(self._rate or START_RATE)
+            if background is not None:
+                self.background = bool(background)
+            if adaptive is not None and adaptive != self._adaptive:
+                self._adaptive = bool(adaptive)
+                if self._adaptive:
+                    self._rate = self._clamp(START_RATE)
+                    self._base_rtt = None
+                    if self._probe is None or not self._probe.is_alive():
+                        self._probe = threading.Thread(target=self._probe_loop, daemon=True,
+                                                       name="bw-probe")
+                        self._probe.start()
+                else:
+                    self._rate = self._cap
+            self._cond.notify_all()
+
+    def settings(self) -> dict:
+        with self._cond:
+            return {"rate": self._cap, "adaptive": self._adaptive, "background": self.background}
+
+    def stats(self) -> dict:
+        with self._cond:
+            return dict(self.counters, rate=self._cap, current_rate=round(self._rate),
+                        throughput=round(self._throughput or 0),
+                        adaptive=self._adaptive, background=self.background,
+                        base_rtt_ms=_ms(self._base_rtt), rtt_ms=_ms(self._rtt))
+
+    # ── Shaping ──
+
+    def consume(self, n: int, cancelled: Optional[Callable[[], bool]] = None):
+        """Take n bytes of budget, sleeping until it is available."""
+        waited = 0.0
+        with self._cond:
+            now = time.monotonic()
+            if self._idle(now):
+                # Waking up: measure afresh and let a sleeping probe resume
+                self._window_bytes = 0
+                self._window_start = now
+                self._throughput = None
+                self._cond.notify_all()
+            self._last_use = now
+            self._window_bytes += n
+            self.counters["bytes"] += n
+            while True:
+                rate = self._rate
+                if not rate:
+                    self._tokens = 0.0
+                    self._stamp = time.monotonic()
+                    break
+                self._refill(rate)
+                if self._tokens >= min(n, rate):
+                    self._tokens -= n            # may go negative: the debt delays the next reader
+                    break
+                if cancelled is not None and cancelled():
+                    break
+                delay = min(0.25, (min(n, rate) - self._tokens) / rate)
+                t0 = time.monotonic()
+                self._cond.wait(delay)
+                waited += time.monotonic() - t0
+            if waited:
+                self.counters["waits"] += 1
+                self.counters["wait_secs"] += waited
+
+    def _refill(self, rate: float):
+        # Lock held
+        now = time.monotonic()
+        self._tokens = min(rate, self._tokens + (now - self._stamp) * rate)
+        self._stamp = now
+
+    def _idle(self, now: float) -> bool:
+        # Lock held
+        return self._last_use is None or now - self._last_use > IDLE_AFTER
+
+    def _clamp(self, rate: float) -> float:
+        if self._cap:
+            rate = min(rate, self._cap)
+        return max(MIN_RATE, rate)
+
+    # ── Adaptive ──
+
+    def _probe_loop(self):
+        target = self._probe_target or default_gateway() or PROBE_FALLBACK
+        while True:
+            with self._cond:
+                while self._adaptive and self._idle(time.monotonic()):
+                    self._cond.wait()
+                if not self._adaptive:
+                    return
+            rtt = _connect_rtt(target)
+            if rtt is not None:
+                self._adjust(rtt)
+            time.sleep(PROBE_INTERVAL)
+
+    def _adjust(self, rtt: float):
+        with self._cond:
+            now = time.monotonic()
+            elapsed = now - self._window_start
+            if elapsed >= PROBE_INTERVAL / 2:     # a probe right after wake-up measures nothing
+                sample = self._window_bytes / elapsed
+                self._throughput = (sample if self._throughput is None
+                                    else 0.7 * self._throughput + 0.3 * sample)
+                self._window_bytes = 0
+                self._window_start = now
+            self._base_rtt = rtt if self._base_rtt is None else min(self._base_rtt, rtt)
+            self._rtt = rtt if self._rtt is None else 0.7 * self._rtt + 0.3 * rtt
+            queueing_ms = (self._rtt - self._base_rtt) * 1000
+            if queueing_ms > RTT_TARGET_MS:
+                excess = min(1.0, (queueing_ms - RTT_TARGET_MS) / RTT_TARGET_MS)
+                self._rate = self._clamp(self._rate * (1 - 0.5 * excess))
+                self.counters["backoffs"] += 1
+            else:
+                # Grow only towards what the link is demonstrably delivering
+                ceiling = max(self._rate, START_RATE, 2 * (self._throughput or 0))
+                self._rate = self._clamp(min(self._rate * 1.1 + MIN_RATE / 4, ceiling))
+            self._cond.notify_all()
+
+
+def _ms(secs: Optional[float]) -> Optional[float]:
+    return None if secs is None else round(secs * 1000, 1)
+
+
+def _connect_rtt(target: tuple[str, int], timeout: float = 1.0) -> Optional[float]:
+    """Seconds for a TCP handshake (or refusal) with target; None on timeout."""
+    t0 = time.monotonic()
+    try:
+        with socket.create_connection(target, timeout=timeout):
+            pass
+    except ConnectionRefusedError:
+        pass                                    # the RST came back: still a round trip
+    except OSError:
+        return None
+    return time.monotonic() - t0
+
+
+def default_gateway() -> Optional[tuple[str, int]]:
+    """(gateway IP, 53) from the routing table, or None."""
+    try:
+        if sys.platform == "darwin":
+            out = subprocess.run(["route", "-n", "get", "default"], capture_output=True,
+                                 text=True, timeout=3).stdout
+            m = re.search(r"gateway:\s*(\d+\.\d+\.\d+\.\d+)", out)
+        else:
+            out = subprocess.run(["ip", "route", "show", "default"], capture_output=True,
+                                 text=True, timeout=3).stdout
+            m = re.search(r"default via (\d+\.\d+\.\d+\.\d+)", out)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return (m.group(1), 53) if m else None
+
+
+# ── Low-priority sockets ──
+
+def mark_background(sock):
+    """Best-effort: lower-effort DSCP and, on macOS, the background traffic class."""
+    for level, opt, value in ((socket.IPPROTO_IP, socket.IP_TOS, _TOS_CS1),
+                              (socket.SOL_SOCKET, _SO_TRAFFIC_CLASS, _SO_TC_BK)):
+        if opt == _SO_TRAFFIC_CLASS and sys.platform != "darwin":
+            continue
+        try:
+            sock.setsockopt(level, opt, value)
+        except (OSError, AttributeError):
+            pass
+
+
+class _BackgroundHTTPConnection(http.client.HTTPConnection):
+    def connect(self):
+        super().connect()
+        mark_background(self.sock)
+
+
+class _BackgroundHTTPSConnection(http.client.HTTPSConnection):
+    def connect(self):
+        super().connect()
+        mark_background(self.sock)
+
+
+class _BackgroundHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_BackgroundHTTPConnection, req)
+
+
+class _BackgroundHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_BackgroundHTTPSConnection, req, context=self._context)
+
+
+def background_opener() -> urllib.request.OpenerDirector:
+    """urllib opener whose connections are marked low priority."""
+    return urllib.request.build_opener(_BackgroundHTTPHandler, _BackgroundHTTPSHandler)
+
+
+_shared: Optional[Shaper] = None
+_shared_lock = threading.Lock()
+
+
+def shared() -> Shaper:
+    """The process-wide shaper all image downloads draw from."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Shaper()
+        return _shared
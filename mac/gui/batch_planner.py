@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Batch Planner — fast dry-run of clone / delete / base-create batches.
+
+The dry-run flag of clone_instance walks the real code paths one instance at
+a time and only prints what it would do.  The planner instead simulates a
+whole batch against ONE snapshot of bluestacks.conf and the Engine folder,
+without touching either, and returns the complete plan:
+
+  * per instance: action, assigned ADB port, display name / number,
+    bytes to copy and bytes freed, estimated seconds, warnings
+  * totals: bytes to copy / free, free space now and at the low point of the
+    batch (deletes free space only once they run), whether it fits
+  * estimated duration, from the operation journal's historical copy
+    throughput and per-step timings (fallback constants when there is no
+    history yet)
+
+A batch is a list of operations, applied in order:
+
+    {"op": "clone", "name": "Tiramisu64_5", "source": "Tiramisu64",
+     "display_name": "...", "source_dir": "/path/to/image", "fix": False}
+    {"op": "delete", "name": "Tiramisu64_3"}
+    {"op": "create_base", "name": "Tiramisu64", "display_name": "...",
+     "image": "/path/to/base-image.qcow2"}
+
+Port and display-number assignment mirror clone_instance: highest existing
+adb_port + 10, next "BlueStacks Air N".  Everything is stat()-only, so a
+plan for dozens of instances takes milliseconds.
+
+Requires: clone_instance (conf parsing), op_journal (optional history)
+"""
+from __future__ import annotations
+
+import re
+import shutil
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import clone_instance
+
+# Headroom that must remain on the Engine volume after the batch (bytes)
+MIN_FREE_AFTER = 2 * 1024 ** 3
+
+# Fallbacks when the journal has no history for a step
+DEFAULT_COPY_MB_S = 300.0
+DEFAULT_STEP_SECS = {
+    "payload": 2.0,
+    "conf": 0.2,
+    "mim": 0.2,
+    "delete": 2.0,
+    "boot_wait": 60.0,
+}
+
+# Fixed per-job overhead: stop MIM, unlock conf, relaunch MIM (seconds)
+JOB_OVERHEAD_SECS = 5.0
+
+_NAME_RE = re.compile(r"^Tiramisu64(_\d+)?$")
+_DISPLAY_RE = re.compile(r"BlueStacks Air (\d+)")
+
+
+@dataclass
+class PlannedItem:
+    op: str                       # clone | replace | delete | create_base
+    name: str
+    display_name: str = ""
+    display_number: Optional[int] = None
+    adb_port: Optional[int] = None
+    bytes_copy: int = 0
+    bytes_freed: int = 0
+    est_secs: float = 0.0
+    warnings: list[str] = field(default_factory=list)
+    error: str = ""
+
+
+@dataclass
+class BatchPlan:
+    items: list[PlannedItem] = field(default_factory=list)
+    bytes_copy: int = 0
+    bytes_freed: int = 0
+    free_bytes: Optional[int] = None
+    min_free_bytes: Optional[int] = None    # low point while the batch runs
+    free_after: Optional[int] = None
+    fits: bool = True
+    est_secs: float = 0.0
+    estimate_basis: str = "default"         # history | default
+    errors: list[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# ─── Sizes ───────────────────────────────────────────────────────────────────
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def _tree_size(path: Path) -> int:
+    total = 0
+    try:
+        for p in path.rglob("*"):
+            try:
+                if p.is_file() and not p.is_symlink():
+                    total += p.stat().st_size
+            except OSError:
+                continue
+    except OSError:
+        pass
+    return total
+
+
+def _payload_size(source_dir: Path) -> int:
+    """Bytes copy_non_disk_payload would copy (everything but disks and logs)."""
+    total = 0
+    try:
+        entries = list(source_dir.iterdir())
+    except OSError:
+        return 0
+    for p in entries:
+        if clone_instance.is_disk_file(p.name) or p.name == "qvirt.log":
+            continue
+        total += _tree_size(p) if p.is_dir() else _file_size(p)
+    return total
+
+
+# ─── Simulated conf ──────────────────────────────────────────────────────────
+
+class _ConfSim:
+    """Ports, display names and instance blocks from one conf snapshot."""
+
+    def __init__(self, conf_path: Path):
+        self.present = conf_path.is_file()
+        lines = clone_instance.parse_conf(conf_path) if self.present else []
+        self.blocks: dict[str, dict] = {}
+        for key, val in lines:
+            if val is None or not key.startswith("bst.instance."):
+                continue
+            name, _, suffix = key[len("bst.instance."):].partition(".")
+            if suffix:
+                self.blocks.setdefault(name, {})[suffix] = val.strip('"')
+
+    def ports(self) -> list[int]:
+        out = []
+        for block in self.blocks.values():
+            try:
+                out.append(int(block.get("adb_port", "")))
+            except ValueError:
+                pass
+        return out
+
+    def next_port(self) -> int:
+        return max(self.ports(), default=5555) + 10
+
+    def next_display_number(self) -> int:
+        nums = [int(m.group(1)) for b in self.blocks.values()
+                if (m := _DISPLAY_RE.search(b.get("display_name", "")))]
+        return max(nums, default=0) + 1
+
+    def add(self, name: str, port: int, display_name: str):
+        self.blocks[name] = {"adb_port": str(port), "display_name": display_name}
+
+    def remove(self, name: str):
+        self.blocks.pop(name, None)
+
+
+# ─── Planner ─────────────────────────────────────────────────────────────────
+
+class _Estimator:
+    def __init__(self, rates: Optional[dict]):
+        rates = rates or {}
+        self.copy_mb_s = rates.get("copy_mb_s") or DEFAULT_COPY_MB_S
+        self.steps = {k: v for k, v in (rates.get("step_p50_secs") or {}).items() if v is not None}
+        self.from_history = bool(rates.get("copy_mb_s"))
+
+    def copy(self, nbytes: int) -> float:
+        return nbytes / 1048576 / self.copy_mb_s
+
+    def step(self, name: str) -> float:
+        return self.steps.get(name, DEFAULT_STEP_SECS.get(name, 0.0))
+
+
+def plan_batch(engine_dir, ops: list[dict], rates: Optional[dict] = None) -> BatchPlan:
+    """Simulate ops against the current Engine folder and bluestacks.conf.
+
+    rates: op_journal.Journal.rates() output, or None for default estimates.
+    """
+    engine = Path(engine_dir)
+    conf = _ConfSim(engine.parent / "bluestacks.conf")
+    est = _Estimator(rates)
+    plan = BatchPlan(estimate_basis="history" if est.from_history else "default")
+
+    existing_dirs = {p.name for p in engine.iterdir() if p.is_dir()} if engine.is_dir() else set()
+    sizes: dict[str, tuple[int, int]] = {}     # source dir -> (disk, payload)
+    seen: set[str] = set()
+    jobs: set[str] = set()
+    need = low = 0                              # running net bytes, its peak
+
+    def _source_sizes(src: Path) -> tuple[int, int]:
+        key = str(src)
+        if key not in sizes:
+            sizes[key] = (_file_size(src / "data.qcow2"), _payload_size(src))
+        return sizes[key]
+
+    for op in ops:
+        kind = op.get("op", "")
+        name = op.get("name", "")
+        if kind == "clone" and op.get("fix"):
+            kind = "replace"
+        item = PlannedItem(op=kind, name=name)
+        plan.items.append(item)
+
+        if not name:
+            item.error = "missing instance name"
+        elif name in seen:
+            item.error = "appears more than once in the batch"
+        seen.add(name)
+
+        if kind in ("clone", "replace"):
+            jobs.add("clone")
+            source = op.get("source", "")
+            src = Path(op["source_dir"]) if op.get("source_dir") else engine / source
+            disk, payload = _source_sizes(src)
+            if not (src / "data.qcow2").is_file():
+                item.error = item.error or f"source disk not found: {src / 'data.qcow2'}"
+            if source and source not in conf.blocks:
+                item.warnings.append(f"'{source}' not in bluestacks.conf — conf entry will be skipped")
+
+            if kind == "replace":
+                if name not in existing_dirs:
+                    item.error = item.error or f"{name} does not exist (nothing to replace)"
+                item.bytes_copy = disk
+                net = disk - _file_size(engine / name / "data.qcow2")
+                block = conf.blocks.get(name)
+                if block:
+                    item.adb_port = int(block.get("adb_port") or 0) or None
+                    item.display_name = block.get("display_name", "")
+                item.est_secs = est.copy(disk) + est.step("conf")
+            else:
+                if name in existing_dirs:
+                    item.error = item.error or f"{name} already exists"
+                elif not _NAME_RE.match(name):
+                    item.error = item.error or "instance names must use Tiramisu64_N format"
+                item.bytes_copy = disk + payload
+                net = item.bytes_copy
+                item.est_secs = (est.copy(disk) + est.step("payload")
+                                 + est.step("conf") + est.step("mim"))
+
+            if name not in conf.blocks and not item.error:
+                item.adb_port = conf.next_port()
+                if op.get("display_name"):
+                    item.display_name = op["display_name"]
+                else:
+                    item.display_number = conf.next_display_number()
+                    item.display_name = f"BlueStacks Air {item.display_number}"
+                conf.add(name, item.adb_port, item.display_name)
+            existing_dirs.add(name)
+
+        elif kind == "delete":
+            jobs.add("delete")
+            if name not in existing_dirs and name not in conf.blocks:
+                item.warnings.append("not found — nothing to delete")
+            block = conf.blocks.get(name, {})
+            item.display_name = block.get("display_name", "")
+            try:
+                item.adb_port = int(block.get("adb_port", "")) or None
+            except ValueError:
+                pass
+            if name in existing_dirs:
+                item.bytes_freed = _tree_size(engine / name)
+            net = -item.bytes_freed
+            item.est_secs = est.step("delete")
+            conf.remove(name)
+            existing_dirs.discard(name)
+
+        elif kind == "create_base":
+            jobs.add("create_base")
+            image = Path(op.get("image") or "")
+            if not image.is_file():
+                item.error = item.error or f"base image not found: {image}"
+            if name in existing_dirs and (engine / name / "data.qcow2").is_file():
+                item.error = item.error or f"{name} already exists"
+            if not conf.present:
+                item.error = item.error or "bluestacks.conf not found — is BlueStacks installed?"
+            item.bytes_copy = _file_size(image)
+            net = item.bytes_copy
+            item.display_name = op.get("display_name") or name
+            m = _DISPLAY_RE.search(item.display_name)
+            item.display_number = int(m.group(1)) if m else None
+            item.adb_port = conf.next_port()
+            conf.add(name, item.adb_port, item.display_name)
+            existing_dirs.add(name)
+            item.est_secs = est.copy(item.bytes_copy) + est.step("conf") + est.step("mim")
+
+        else:
+            item.error = f"unknown operation: {kind or '(none)'}"
+            net = 0
+
+        item.est_secs = round(item.est_secs, 1)
+        if item.error:
+            plan.errors.append(f"{name or '?'}: {item.error}")
+            continue
+        plan.bytes_copy += item.bytes_copy
+        plan.bytes_freed += item.bytes_freed
+        need += net
+        low = max(low, need)
+
+    # ── Free space ──
+    try:
+        plan.free_bytes = shutil.disk_usage(engine if engine.is_dir() else engine.parent).free
+    except OSError:
+        plan.free_bytes = None
+    if plan.free_bytes is not None:
+        plan.min_free_bytes = plan.free_bytes - low
+        plan.free_after = plan.free_bytes - need
+        plan.fits = plan.min_free_bytes >= MIN_FREE_AFTER
+        if not plan.fits:
+            plan.errors.append(
+                f"not enough disk space: needs {_gb(low)} plus {_gb(MIN_FREE_AFTER)} headroom, "
+                f"{_gb(plan.free_bytes)} free"
+            )
+
+    # ── Duration ──
+    total = sum(i.est_secs for i in plan.items if not i.error) + JOB_OVERHEAD_SECS * len(jobs)
+    if any(i.op == "clone" and not i.error for i in plan.items):
+        total += est.step("boot_wait")    # clones boot in parallel after the copy
+    plan.est_secs = round(total, 1)
+    return plan
+
+
+def _gb(n: int) -> str:
+    return f"{n / 1024 ** 3:.1f} GB"
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Boot Waiter — concurrent boot tracking for BlueStacks Air instances.
+
+Replaces the per-instance ``time.sleep(2)`` polling loops with a service that
+watches many instances at once.  Each watched instance gets its own worker
+thread and a ``concurrent.futures.Future`` that resolves as soon as that
+instance has reached ``sys.boot_completed=1`` and passed the settle
+condition, so post-boot work can start per instance instead of after the
+slowest one.
+
+Strategy per instance:
+  1. ``adb connect`` with adaptive backoff until the emulator's adbd answers.
+  2. Blocking wait on the device: ``wait-for-device`` followed by a shell
+     loop on ``getprop sys.boot_completed`` (one long-lived adb call instead
+     of dozens of short ones).
+  3. If the blocking wait fails (adbd restarts during boot, old adb without
+     ``wait-for-device`` support), fall back to polling ``getprop`` with
+     adaptive backoff.
+  4. Settle: a fixed grace period after boot, then an optional settle check
+     (e.g. ``probe_root`` — Magisk finishes init after boot_completed).
+
+Requires: randomize_instances.adb_connect, randomize_instances.run_cmd
+"""
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, as_completed
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import randomize_instances
+
+# Overall budget for one instance to reach sys.boot_completed=1 (seconds)
+BOOT_TIMEOUT = 90
+
+# Grace period after boot_completed before the settle check runs (seconds)
+SETTLE_SECONDS = 5
+
+# How long the settle check may keep failing before we give up (seconds)
+SETTLE_TIMEOUT = 20
+
+# Adaptive backoff bounds for polling fallbacks (seconds)
+_BACKOFF_MIN = 0.5
+_BACKOFF_MAX = 5.0
+_BACKOFF_FACTOR = 1.5
+
+# Shell loop run on the device — blocks until boot completes
+_BOOT_WAIT_SHELL = 'while [ "$(getprop sys.boot_completed)" != "1" ]; do sleep 1; done'
+
+
+@dataclass
+class BootResult:
+    """Outcome of waiting for one instance."""
+    name: str
+    serial: str
+    booted: bool = False
+    settled: bool = False
+    method: str = ""        # "blocking" or "poll"
+    boot_secs: float = 0.0  # time until sys.boot_completed=1
+    ready_secs: float = 0.0  # time until settled (or gave up)
+    error: str = ""
+
+
+class _Backoff:
+    """Multiplicative backoff between _BACKOFF_MIN and _BACKOFF_MAX."""
+
+    def __init__(self):
+        self.delay = _BACKOFF_MIN
+
+    def next(self) -> float:
+        d = self.delay
+        self.delay = min(self.delay * _BACKOFF_FACTOR, _BACKOFF_MAX)
+        return d
+
+
+class BootWaiter:
+    """Tracks many booting instances concurrently.
+
+    Usage:
+        waiter = BootWaiter(adb_exe, settle_check=randomize_instances.probe_root)
+        futures = {waiter.watch(name, serial): name for name, serial in targets}
+        for fut in as_completed(futures):
+            result = fut.result()   # BootResult
+    """
+
+    def __init__(
+        self,
+        adb_exe: str,
+        timeout: float = BOOT_TIMEOUT,
+        settle_seconds: float = SETTLE_SECONDS,
+        settle_check: Optional[Callable[[str, str], bool]] = None,
+        settle_timeout: float = SETTLE_TIMEOUT,
+        use_blocking: bool = True,
+    ):
+        self._adb_exe = adb_exe
+        self._timeout = timeout
+        self._settle_seconds = settle_seconds
+        self._settle_check = settle_check
+        self._settle_timeout = settle_timeout
+        self._use_blocking = use_blocking
+
+        self._stop = threading.Event()
+        self._futures: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    # ── Public API ──
+
+    def watch(self, name: str, serial: str) -> Future:
+        """Start tracking an instance. Returns a Future resolving to a BootResult.
+
+        Watching the same name twice returns the existing future.
+        """
+        with self._lock:
+            fut = self._futures.get(name)
+            if fut is not None:
+                return fut
+            fut = Future()
+            fut.set_running_or_notify_cancel()
+            self._futures[name] = fut
+
+        threading.Thread(
+            target=self._worker, args=(name, serial, fut),
+            daemon=True, name=f"boot-wait-{name}",
+        ).start()
+        return fut
+
+    def futures(self) -> dict[str, Future]:
+        """Snapshot of {instance_name: Future} for everything being watched."""
+        with self._lock:
+            return dict(self._futures)
+
+    def wait_all(self, timeout: Optional[float] = None) -> dict[str, BootResult]:
+        """Block until every watched instance resolves. Returns {name: BootResult}."""
+        futs = self.futures()
+        results = {}
+        for fut in as_completed(futs.values(), timeout=timeout):
+            r = fut.result()
+            results[r.name] = r
+        return results
+
+    def cancel(self):
+        """Abort all outstanding waits (workers resolve with error='cancelled')."""
+        self._stop.set()
+
+    # ── Worker ──
+
+    def _remaining(self, deadline: float) -> float:
+        return max(0.0, deadline - time.monotonic())
+
+    def _sleep(self, secs: float) -> bool:
+        """Interruptible sleep. Returns False if cancelled."""
+        return not self._stop.wait(timeout=secs)
+
+    def _worker(self, name: str, serial: str, fut: Future):
+        result = BootResult(name=name, serial=serial)
+        t0 = time.monotonic()
+        deadline = t0 + self._timeout
+        try:
+            if not self._connect(serial, deadline):
+                result.error = "cancelled" if self._stop.is_set() else "adb connect timeout"
+            else:
+                booted = False
+                if self._use_blocking:
+                    booted = self._wait_blocking(serial, deadline)
+                    if booted:
+                        result.method = "blocking"
+                if not booted and not self._stop.is_set() and self._remaining(deadline) > 0:
+                    booted = self._wait_polling(serial, deadline)
+                    if booted:
+                        result.method = "poll"
+
+                if booted:
+                    result.booted = True
+                    result.boot_secs = time.monotonic() - t0
+                    result.settled = self._settle(serial)
+                    if not result.settled and not result.error:
+                        result.error = "cancelled" if self._stop.is_set() else "settle check failed"
+                elif not result.error:
+                    result.error = "cancelled" if self._stop.is_set() else "boot timeout"
+        except Exception as e:
+            result.error = str(e)
+        result.ready_secs = time.monotonic() - t0
+        fut.set_result(result)
+
+    def _connect(self, serial: str, deadline: float) -> bool:
+        backoff = _Backoff()
+        while not self._stop.is_set():
+            remaining = self._remaining(deadline)
+            if remaining <= 0:
+                return False
+            if randomize_instances.adb_connect(self._adb_exe, serial,
+                                               timeout_sec=max(1, min(8, int(remaining)))):
+                return True
+            if not self._sleep(min(backoff.next(), remaining)):
+                return False
+        return False
+
+    def _wait_blocking(self, serial: str, deadline: float) -> bool:
+        """One long-lived adb call per phase instead of a polling loop."""
+        remaining = self._remaining(deadline)
+        if remaining <= 0:
+            return False
+        cp = randomize_instances.run_cmd(
+            [self._adb_exe, "-s", serial, "wait-for-device"],
+            timeout_sec=max(1, int(remaining)),
+        )
+        if cp.returncode != 0 or self._stop.is_set():
+            return False
+
+        remaining = self._remaining(deadline)
+        if remaining <= 0:
+            return False
+        cp = randomize_instances.run_cmd(
+            [self._adb_exe, "-s", serial, "shell", _BOOT_WAIT_SHELL],
+            timeout_sec=max(1, int(remaining)),
+        )
+        if cp.returncode != 0:
+            return False
+        # Confirm — a dropped connection can also exit 0 on some adb builds
+        return randomize_instances.probe_boot_completed(self._adb_exe, serial)
+
+    def _wait_polling(self, serial: str, deadline: float) -> bool:
+        backoff = _Backoff()
+        while not self._stop.is_set():
+            if randomize_instances.probe_boot_completed(self._adb_exe, serial):
+                return True
+            remaining = self._remaining(deadline)
+            if remaining <= 0:
+                return False
+            if not self._sleep(min(backoff.next(), remaining)):
+                return False
+            # adbd restarts during boot drop the TCP connection — reconnect
+            randomize_instances.adb_connect(self._adb_exe, serial, timeout_sec=4)
+        return False
+
+    def _settle(self, serial: str) -> bool:
+        if self._settle_seconds > 0 and not self._sleep(self._settle_seconds):
+            return False
+        if self._settle_check is None:
+            return True
+
+        deadline = time.monotonic() + self._settle_timeout
+        backoff = _Backoff()
+        while not self._stop.is_set():
+            try:
+                if self._settle_check(self._adb_exe, serial):
+                    return True
+            except Exception:
+                pass
+            remaining = self._remaining(deadline)
+            if remaining <= 0:
+                return False
+            if not self._sleep(min(backoff.next(), remaining)):
+                return False
+        return False
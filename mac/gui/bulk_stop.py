@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Bulk Stop — stop many BlueStacks Air instances concurrently.
+
+Stopping a fleet one ``stop_instance`` call at a time re-parses the conf,
+reconnects adb and waits per instance.  The bulk stop instead:
+
+  1. Takes the instance → port map from one bluestacks.conf snapshot
+     (done by the caller) and one host process-table snapshot.
+  2. Sends ``su -c reboot -p`` to every instance at once.
+  3. Waits on ONE shared deadline, re-reading the process table once per
+     tick until every instance's process tree is gone.
+  4. Escalates only for stragglers: SIGTERM their processes, short grace,
+     then SIGKILL.
+
+Every instance gets a record of how it stopped and how long it took:
+  method  "adb"          powered off after the graceful request
+          "term"/"kill"  needed SIGTERM / SIGKILL
+          "not_running"  no process and adb did not answer
+          "failed"       still alive after SIGKILL
+  secs    seconds from the start of the bulk stop until it was gone
+
+Requires: instance_telemetry.snapshot_processes, randomize_instances.adb_connect
+"""
+from __future__ import annotations
+
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+import instance_telemetry
+import randomize_instances
+
+# Shared deadline for graceful power-off (seconds)
+GRACEFUL_TIMEOUT = 30.0
+
+# Grace after SIGTERM before SIGKILL (seconds)
+TERM_GRACE = 5.0
+
+# Process-table poll interval while waiting (seconds)
+_POLL = 1.0
+
+# Max concurrent adb power-off requests
+_MAX_WORKERS = 16
+
+
+@dataclass
+class StopResult:
+    name: str
+    serial: str
+    method: str = ""
+    graceful_sent: bool = False
+    secs: Optional[float] = None
+    error: str = ""
+
+
+def _instance_pids() -> dict[str, list[int]]:
+    """{instance: [pids]} from one process-table snapshot.
+
+    Our own process and its ancestors are never included, so a stray
+    "--instance" on a launching shell can't get the GUI signalled.
+    """
+    rows = instance_telemetry.snapshot_processes()
+    parent = {r.pid: r.ppid for r in rows}
+    own, pid = set(), os.getpid()
+    while pid and pid not in own:
+        own.add(pid)
+        pid = parent.get(pid, 0)
+    groups = instance_telemetry.map_instances(rows)
+    out = {}
+    for name, procs in groups.items():
+        pids = [p.pid for p in procs if p.pid not in own]
+        if pids:
+            out[name] = pids
+    return out
+
+
+def _signal_all(pids: list[int], sig: int):
+    for pid in pids:
+        try:
+            os.kill(pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def _request_poweroff(adb_exe: str, serial: str) -> bool:
+    if not randomize_instances.adb_connect(adb_exe, serial, timeout_sec=5):
+        return False
+    cp = randomize_instances.run_cmd(
+        [adb_exe, "-s", serial, "shell", "su", "-c", "reboot -p"], timeout_sec=10,
+    )
+    return cp.returncode == 0
+
+
+def stop_instances(
+    adb_exe: str,
+    targets: list[tuple[str, str]],
+    graceful_timeout: float = GRACEFUL_TIMEOUT,
+    term_grace: float = TERM_GRACE,
+    on_stopped: Optional[Callable[[StopResult], None]] = None,
+) -> list[StopResult]:
+    """Stop [(instance_name, serial), ...] concurrently. Results in target order."""
+    t0 = time.monotonic()
+    results = {name: StopResult(name=name, serial=serial) for name, serial in targets}
+    pending: set[str] = set()
+
+    def _done(name: str, method: str):
+        r = results[name]
+        r.method = method
+        r.secs = round(time.monotonic() - t0, 1)
+        pending.discard(name)
+        if on_stopped:
+            try:
+                on_stopped(r)
+            except Exception:
+                pass
+
+    # ── Graceful power-off, all at once ──
+    alive = _instance_pids()
+    with ThreadPoolExecutor(max_workers=min(_MAX_WORKERS, len(targets) or 1)) as pool:
+        sent = dict(zip(
+            [n for n, _ in targets],
+            pool.map(lambda t: _request_poweroff(adb_exe, t[1]), targets),
+        ))
+    for name, _ in targets:
+        results[name].graceful_sent = bool(sent.get(name))
+        if name in alive:
+            pending.add(name)
+        elif results[name].graceful_sent:
+            # No host process visible (launched in a way we can't map) —
+            # the power-off request is all we can confirm
+            _done(name, "adb")
+        else:
+            _done(name, "not_running")
+
+    # ── One shared deadline for everyone ──
+    def _wait(until: float) -> dict[str, list[int]]:
+        while pending:
+            alive = _instance_pids()
+            for name in list(pending):
+                if name not in alive:
+                    _done(name, current_method)
+            if not pending or time.monotonic() >= until:
+                return alive
+            time.sleep(_POLL)
+        return {}
+
+    current_method = "adb"
+    alive = _wait(t0 + graceful_timeout)
+
+    # ── Escalate only for stragglers ──
+    if pending:
+        current_method = "term"
+        for name in pending:
+            _signal_all(alive.get(name, []), signal.SIGTERM)
+        alive = _wait(time.monotonic() + term_grace)
+    if pending:
+        current_method = "kill"
+        for name in pending:
+            _signal_all(alive.get(name, []), signal.SIGKILL)
+        _wait(time.monotonic() + 2.0)
+    for name in list(pending):
+        results[name].error = "still running after SIGKILL"
+        _done(name, "failed")
+
+    return [results[name] for name, _ in targets]
+
+
+def summarize(results: list[StopResult]) -> dict:
+    """Counts per stop method plus total and slowest stop time."""
+    by_method: dict[str, int] = {}
+    for r in results:
+        by_method[r.method] = by_method.get(r.method, 0) + 1
+    times = [r.secs for r in results if r.secs is not None and r.method not in ("not_running", "failed")]
+    return {
+        "total": len(results),
+        "by_method": by_method,
+        "stopped": sum(by_method.get(m, 0) for m in ("adb", "term", "kill")),
+        "failed": by_method.get("failed", 0),
+        "max_secs": max(times) if times else None,
+    }
+
+
+def to_dicts(results: list[StopResult]) -> list[dict]:
+    return [asdict(r) for r in results]
@@ -22,6 +22,7 @@ Flags:
   --engine-dir DIR       Engine directory containing instance folders. Auto-detected if omitted.
   --bluestacks-dir DIR   BlueStacks Air app contents directory.
   --dry-run              Show what would be done without making any changes.
+  --no-verify            Skip the chunk-by-chunk check of the copied data disk.
 
 Examples:
   # Re-copy data disk from golden source to MIM clones
@@ -46,6 +47,10 @@ import sys
 import uuid
 from pathlib import Path
 
+import image_manifest
+import op_journal
+import progress_reporter
+
 BLUESTACKS_PROCESSES = ["BlueStacks"]
 DEFAULT_BLUESTACKS_DIR = "/Applications/BlueStacks.app/Contents"
 DEFAULT_ENGINE_DIR = "/Users/Shared/Library/Application Support/BlueStacks/Engine"
@@ -111,40 +116,75 @@ def check_bluestacks_stopped(dry_run=False):
 
 
 def copy_with_progress(src, dst, desc="", quiet=False):
-    """Copy a file with progress indicator for large files."""
+    """Copy a file with progress indicator for large files.
+
+    Progress goes through a ProgressReporter: a rewritten line a few times a
+    second with throughput and ETA, or (quiet) an occasional plain line.
+    """
     size = src.stat().st_size
-    copied = 0
     chunk_size = 4 * 1024 * 1024  # 4 MB chunks
-    last_pct = -1
 
     label = desc or src.name
     if size == 0:
         shutil.copy2(src, dst)
         return
 
+    if quiet:
+        def _show(u):
+            print(f"Copying {label} — {u.describe()}")
+        reporter = progress_reporter.ProgressReporter(size, _show, max_hz=0.2)
+    else:
+        def _show(u):
+            print(f"\r  Copying {label}: {u.describe()}", end="", flush=True)
+        reporter = progress_reporter.ProgressReporter(size, _show)
+
     with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
         while True:
             buf = fsrc.read(chunk_size)
             if not buf:
                 break
             fdst.write(buf)
-            copied += len(buf)
-            pct = copied * 100 // size
-            if quiet:
-                if pct >= last_pct + 25 or pct == 100:
-                    print(f"Copying {label} — {pct}%")
-                    last_pct = pct
-            else:
-                mb_done = copied // (1024 * 1024)
-                mb_total = size // (1024 * 1024)
-                print(f"\r  Copying {label}: {mb_done}/{mb_total} MB ({pct}%)", end="", flush=True)
+            reporter.advance(len(buf))
+    reporter.finish()
     if not quiet:
         print()
     shutil.copystat(src, dst)
+    op_journal.add_bytes(reporter.done)
+
+
+def is_disk_file(name):
+    """data.qcow2 or one of its sidecars (.sha256, .manifest.json)."""
+    return name in DISK_FILES or any(name.startswith(d + ".") for d in DISK_FILES)
+
 
+def verify_disk_copy(src, dst):
+    """Check a copied disk chunk by chunk against its source.
 
-def copy_disk_files(source_dir, clone_dir, dry_run, quiet=False):
-    """Copy data.qcow2 from source to clone directory."""
+    The reference is the manifest cached next to the source (a downloaded
+    image has one), else the source is hashed now in parallel and the
+    manifest cached for the next clone.  When the copy matches, the
+    manifest is saved next to it too, so diagnostics can re-check the disk
+    until the instance first boots.  Returns an image_manifest.VerifyResult.
+    """
+    ref = image_manifest.cached(str(src))
+    if ref is None:
+        ref = image_manifest.build_parallel(str(src))
+        _save_manifest(ref, src)
+    res = image_manifest.verify(str(dst), ref)
+    if res.ok:
+        _save_manifest(ref, dst)
+    return res
+
+
+def _save_manifest(manifest, disk):
+    try:
+        manifest.save(str(disk) + image_manifest.SUFFIX)
+    except OSError:
+        pass
+
+
+def copy_disk_files(source_dir, clone_dir, dry_run, quiet=False, verify=True):
+    """Copy data.qcow2 from source to clone directory (and verify the copy)."""
     src = source_dir / "data.qcow2"
     dst = clone_dir / "data.qcow2"
     if not src.exists():
@@ -155,13 +195,22 @@ def copy_disk_files(source_dir, clone_dir, dry_run, quiet=False):
         print(f"[dry-run] Would copy data.qcow2 ({size_mb} MB)")
         return
     copy_with_progress(src, dst, "data.qcow2", quiet=quiet)
+    if verify:
+        with op_journal.step("verify", instance=clone_dir.name):
+            res = verify_disk_copy(src, dst)
+        if not res.ok:
+            print(f"ERROR: Copied data.qcow2 doesn't match the source — {res.describe()}")
+            dst.unlink(missing_ok=True)
+            sys.exit(1)
+        if not quiet:
+            print(f"  Verified data.qcow2 ({res.describe()}, {res.secs:.1f}s)")
 
 
 def copy_non_disk_payload(source_dir, clone_dir, dry_run, quiet=False):
     """Copy non-disk instance payload (AppCache/, Flyers/, etc.) for full clones."""
     payload_items = []
     for src in sorted(source_dir.iterdir(), key=lambda p: p.name.lower()):
-        if src.name in DISK_FILES:
+        if is_disk_file(src.name):
             continue
         # Skip log files that are instance-specific
         if src.name == "qvirt.log":
@@ -946,6 +995,7 @@ def create_instance_from_base(
     engine_dir=None,
     quiet=False,
     on_progress=None,
+    verify=True,
 ):
     """Create a brand-new BlueStacks instance from a pre-built base image.
 
@@ -966,6 +1016,7 @@ def create_instance_from_base(
         engine_dir:      Override for Engine directory; auto-detected if None.
         quiet:           Suppress verbose output.
         on_progress:     Optional callback(msg: str) for GUI progress updates.
+        verify:          Check the copied data.qcow2 against the base image.
 
     Returns:
         {"ok": True, "instance_name": ..., "adb_port": ..., "path": ...}
@@ -1024,8 +1075,16 @@ def create_instance_from_base(
         # ── Step 2: Copy base image ──
         _emit("Copying base image (this may take a moment)...")
         dst_qcow2 = instance_dir / "data.qcow2"
-        copy_with_progress(base_image_path, dst_qcow2, "data.qcow2", quiet=quiet)
+        with op_journal.step("copy", instance=instance_name):
+            copy_with_progress(base_image_path, dst_qcow2, "data.qcow2", quiet=quiet)
         _emit(f"Image copied ({dst_qcow2.stat().st_size // (1024*1024)} MB)")
+        if verify:
+            with op_journal.step("verify", instance=instance_name):
+                check = verify_disk_copy(base_image_path, dst_qcow2)
+            if not check.ok:
+                dst_qcow2.unlink(missing_ok=True)
+                return {"ok": False, "error": f"Copied image doesn't match the base image — {check.describe()}"}
+            _emit(f"Image verified ({check.secs:.1f}s)")
 
         # ── Step 3: Generate unique identity ──
         lines = parse_conf(conf_path)
@@ -1068,7 +1127,8 @@ def create_instance_from_base(
             # No installed_images key exists — create it
             lines.append(("bst.installed_images", f'"{instance_name}"'))
 
-        write_conf(conf_path, lines)
+        with op_journal.step("conf", instance=instance_name):
+            write_conf(conf_path, lines)
         _emit("bluestacks.conf updated ✓")
 
         # ── Step 6: Register in MimMetaData.json ──
@@ -1083,8 +1143,9 @@ def create_instance_from_base(
             pass
         if mim_meta_path.is_file():
             _emit("Registering in MimMetaData.json...")
-            update_mim_metadata(mim_meta_path, instance_name, dry_run=False,
-                                display_name=display_name)
+            with op_journal.step("mim", instance=instance_name):
+                update_mim_metadata(mim_meta_path, instance_name, dry_run=False,
+                                    display_name=display_name)
             try:
                 os.chmod(str(mim_meta_path), 0o666)
             except Exception:
@@ -1107,7 +1168,8 @@ def create_instance_from_base(
 
 
 def clone_instance(source_name, clone_name, engine_dir, bluestacks_dir, fix_mode, dry_run,
-                   quiet=False, source_dir_override=None, display_name_override=None):
+                   quiet=False, source_dir_override=None, display_name_override=None,
+                   verify=True):
     """Clone a single instance.
 
     On Mac/BlueStacks Air, cloning involves:
@@ -1169,7 +1231,8 @@ def clone_instance(source_name, clone_name, engine_dir, bluestacks_dir, fix_mode
         pass
     else:
         print("\nCopying data disk...")
-    copy_disk_files(source_dir, clone_dir, dry_run, quiet=quiet)
+    with op_journal.step("copy", instance=clone_name):
+        copy_disk_files(source_dir, clone_dir, dry_run, quiet=quiet, verify=verify)
 
     # Step 2b: Full clone mode copies additional instance payload
     if not fix_mode:
@@ -1177,7 +1240,8 @@ def clone_instance(source_name, clone_name, engine_dir, bluestacks_dir, fix_mode
             print("Copying instance payload...")
         else:
             print("\nCopying non-disk instance payload...")
-        copy_non_disk_payload(source_dir, clone_dir, dry_run, quiet=quiet)
+        with op_journal.step("payload", instance=clone_name):
+            copy_non_disk_payload(source_dir, clone_dir, dry_run, quiet=quiet)
 
     # Step 2c: Seed custom boot screen if Promotions/ is empty
     if not dry_run:
@@ -1189,10 +1253,11 @@ def clone_instance(source_name, clone_name, engine_dir, bluestacks_dir, fix_mode
         print("Updating bluestacks.conf...")
     else:
         print("\nConfiguring bluestacks.conf...")
-    update_bluestacks_conf(
-        conf_path, source_name, clone_name, fix_mode, dry_run,
-        display_name_override=display_name_override
-    )
+    with op_journal.step("conf", instance=clone_name):
+        update_bluestacks_conf(
+            conf_path, source_name, clone_name, fix_mode, dry_run,
+            display_name_override=display_name_override
+        )
 
     # Step 4: Full clone mode — add to MIM organization metadata
     # Skip if MimMetaData.json wasn't editable (non-fatal — MIM auto-detects)
@@ -1201,8 +1266,9 @@ def clone_instance(source_name, clone_name, engine_dir, bluestacks_dir, fix_mode
             print("Updating MimMetaData.json...")
         else:
             print("\nUpdating MimMetaData.json...")
-        update_mim_metadata(mim_meta_path, clone_name, dry_run,
-                            display_name=display_name_override)
+        with op_journal.step("mim", instance=clone_name):
+            update_mim_metadata(mim_meta_path, clone_name, dry_run,
+                                display_name=display_name_override)
         # Ensure MimMetaData.json stays world-writable (BS convention)
         try:
             os.chmod(str(mim_meta_path), 0o666)
@@ -1230,6 +1296,8 @@ def main():
                         help=argparse.SUPPRESS)  # hidden: full clone without MIM
     parser.add_argument("--dry-run", action="store_true",
                         help="Show what would be done without making changes")
+    parser.add_argument("--no-verify", action="store_true",
+                        help="Skip the chunk-by-chunk check of the copied disk")
 
     args = parser.parse_args()
 
@@ -1267,7 +1335,8 @@ def main():
             sys.exit(1)
         clone_instance(
             args.source, clone_name, engine_dir,
-            args.bluestacks_dir, fix_mode, args.dry_run
+            args.bluestacks_dir, fix_mode, args.dry_run,
+            verify=not args.no_verify
         )
 
     print(f"\n{'='*60}")
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Decompress Stream — download a compressed disk image straight to data.qcow2.
+
+A .7z / .zip image is downloaded in full, extracted next to itself and only
+then deleted: twice the disk space and a long extraction phase after the
+download.  Stream-friendly formats avoid both.  The compressed bytes come
+from downloader.Download.stream() (in order, several connections ahead),
+are decompressed chunk by chunk and written to ``<dest>.part`` in pieces of
+at most OUT_CHUNK bytes as they are produced (a sparse image compresses
+thousands to one, so one input chunk may stand for gigabytes); the SHA-256
+of the decompressed image is computed in the same pass:
+
+    res = fetch_decompressed(url, "/images/a13/data.qcow2",
+                             expected_sha256=None, on_progress=cb)
+    res.sha256, res.bytes_in, res.bytes_out
+
+Peak disk use is the image itself.  The hash is checked against
+expected_sha256 when one is given and always written next to the image as
+``data.qcow2.sha256`` (shasum format) for later verification.
+
+Supported suffixes: .qcow2.zst (needs the optional ``zstandard`` package),
+.qcow2.gz, .qcow2.xz.  Concatenated frames / members / streams are handled.
+A .gz / .xz that ends mid-stream is rejected; zstandard's chunked writer
+can't tell, so a short .zst is only caught by the transfer's length check
+and the hash.  A streamed download can't resume; an interrupted one starts
+over.
+
+Requires: downloader; zstandard (optional, for .zst)
+"""
+from __future__ import annotations
+
+import hashlib
+import lzma
+import os
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+import downloader
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODECS = {".zst": "zstd", ".gz": "gzip", ".xz": "xz"}
+
+# Most decompressed bytes handed on at once
+OUT_CHUNK = 4 * 1024 * 1024
+
+
+@dataclass
+class StreamResult:
+    path: str
+    sha256: str
+    bytes_in: int       # compressed, transferred
+    bytes_out: int      # decompressed, written
+
+
+def codec_for(url: str) -> Optional[str]:
+    """'zstd' / 'gzip' / 'xz' for a stream-decompressible image URL, else None."""
+    path = url.split("?", 1)[0].lower()
+    for suffix, codec in CODECS.items():
+        if path.endswith(suffix):
+            return codec
+    return None
+
+
+class _Decoder:
+    """One decompressor interface over zlib / lzma / zstandard, restarting on
+    each new frame, member or stream in the input.  Output goes to sink in
+    pieces of at most OUT_CHUNK bytes, each as soon as it is produced."""
+
+    def __init__(self, codec: str, sink: Callable[[bytes], None]):
+        if codec == "zstd" and zstandard is None:
+            raise downloader.DownloadError(
+                ".zst images need the zstandard package (pip install zstandard)")
+        self._codec = codec
+        self._sink = sink
+        self._at_boundary = True    # no partial frame buffered
+        if codec == "zstd":
+            # decompressobj() has no output limit; the writer hands on
+            # write_size pieces and reads across frames
+            self._writer = zstandard.ZstdDecompressor().stream_writer(
+                _SinkFile(sink), write_size=OUT_CHUNK, closefd=False)
+        else:
+            self._obj = self._new()
+
+    def _new(self):
+        if self._codec == "gzip":
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return lzma.LZMADecompressor()
+
+    def decompress(self, data: bytes):
+        if self._codec == "zstd":
+            self._writer.write(data)
+            return
+        while data:
+            self._at_boundary = False
+            while True:
+                piece = self._obj.decompress(data, OUT_CHUNK)
+                if piece:
+                    self._sink(piece)
+                if self._obj.eof:
+                    break
+                if self._codec == "xz":
+                    if self._obj.needs_input:
+                        return
+                    data = b""                      # more output pending
+                else:
+                    data = self._obj.unconsumed_tail
+                    if not data and len(piece) < OUT_CHUNK:
+                        return
+            self._at_boundary = True
+            data = self._obj.unused_data          # start of the next member, if any
+            self._obj = self._new()
+
+    def finish(self):
+        if self._codec == "zstd":
+            self._writer.flush()
+        elif not self._at_boundary:
+            raise downloader.DownloadError("compressed stream ended early (truncated download?)")
+
+
+class _SinkFile:
+    """Minimal file object for zstandard's stream_writer."""
+
+    def __init__(self, sink: Callable[[bytes], None]):
+        self._sink = sink
+
+    def write(self, data) -> int:
+        self._sink(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def fetch_decompressed(
+    url: str,
+    dest: str,
+    expected_sha256: Optional[str] = None,
+    on_start: Optional[Callable[[downloader.ProbeResult], None]] = None,
+    on_progress: Optional[Callable[[int], None]] = None,
+    cancelled: Optional[Callable[[], bool]] = None,
+    connections: int = downloader.CONNECTIONS,
+    mirrors: Iterable[str] = (),
+    shaper=None,
+) -> StreamResult:
+    """Download url, decompress on the fly to dest and hash the output.
+
+    on_start(probe) is called once the compressed size is known;
+    on_progress(compressed_bytes_done) as the transfer proceeds.
+    mirrors: other URLs serving the same file, shaper: a bandwidth.Shaper
+    (both passed to downloader.Download).
+    Raises downloader.DownloadError on a hash mismatch or a bad stream;
+    dest is only replaced once the image is complete and verified.
+    """
+    codec = codec_for(url)
+    if codec is None:
+        raise ValueError(f"not a stream-decompressible image: {url}")
+    part = dest + ".part"
+    digest = hashlib.sha256()
+    written = 0
+    out = None
+
+    def _write(piece: bytes):
+        nonlocal written
+        out.write(piece)
+        digest.update(piece)
+        written += len(piece)
+
+    decoder = _Decoder(codec, _write)
+    dl = downloader.Download(url, dest, connections=connections, cancelled=cancelled,
+                             mirrors=mirrors, shaper=shaper)
+    info = dl.probe()
+    if on_start is not None:
+        on_start(info)
+    try:
+        with open(part, "wb") as f:
+            out = f
+            for chunk in dl.stream(on_progress=on_progress):
+                decoder.decompress(chunk)
+            decoder.finish()
+            f.flush()
+            os.fsync(f.fileno())
+    except (zlib.error, lzma.LZMAError) as e:
+        _remove(part)
+        raise downloader.DownloadError(f"corrupt {codec} stream: {e}") from e
+    except Exception as e:
+        _remove(part)
+        if zstandard is not None and isinstance(e, zstandard.ZstdError):
+            raise downloader.DownloadError(f"corrupt zstd stream: {e}") from e
+        raise
+
+    sha = digest.hexdigest()
+    if expected_sha256 and sha != expected_sha256.lower():
+        _remove(part)
+        raise downloader.DownloadError(
+            f"SHA-256 mismatch: got {sha}, expected {expected_sha256.lower()}")
+    os.replace(part, dest)
+    with open(dest + ".sha256", "w") as f:
+        f.write(f"{sha}  {os.path.basename(dest)}\n")
+    return StreamResult(path=dest, sha256=sha, bytes_in=dl.fetched, bytes_out=written)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
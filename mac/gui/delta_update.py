@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Delta Update — refresh a local disk image by fetching only changed chunks.
+
+A golden-image refresh usually changes a few hundred MB of a multi-GB
+qcow2, yet every host downloaded the whole file again.  When the server
+publishes a chunk manifest next to the raw image (image_manifest,
+``<url>.manifest.json``), the new image is assembled from the old one:
+
+    res = fetch_delta(url, manifest_url, base="/images/a13/data.qcow2",
+                      dest="/images/a13/data.qcow2", on_progress=cb)
+    res.fetched_bytes, res.reused_bytes
+
+1. The remote manifest is fetched and compared with the local image's
+   (cached as data.qcow2.manifest.json, built on first use).
+2. ``<dest>.delta.part`` is created at the new size.  Chunks whose hash
+   exists anywhere in the local image are copied from it (and re-hashed
+   on the way, so a stale local manifest can't slip through); zero chunks
+   are left as holes.
+3. The remaining chunks are fetched with HTTP Range requests by
+   downloader.Download(ranges=...) — parallel, retried and resumable.
+4. The assembled file is read through once: fetched chunks are checked
+   against the manifest and the whole image is hashed, which must match
+   expected_sha256 (and the manifest's own sha256) when given.  The file
+   then replaces dest, and the manifest plus a data.qcow2.sha256 holding
+   the computed hash are saved next to it.
+
+The base is only read, so dest may be the base itself.  A server without
+range support, or a manifest that doesn't match the image (or names a
+different sha256 than the caller expects), raises DeltaUnavailable and the caller does a full download instead.
+
+Requires: downloader, image_manifest
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import urllib.error
+import urllib.request
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+import downloader
+import image_manifest
+
+# Largest manifest accepted from a server (bytes)
+MAX_MANIFEST_BYTES = 16 * 1024 * 1024
+
+
+class DeltaUnavailable(downloader.DownloadError):
+    """No delta possible for this image; do a full download."""
+
+
+@dataclass
+class DeltaPlan:
+    manifest: image_manifest.Manifest
+    copy: dict[int, int]        # new chunk index -> local chunk index
+    fetch: list[int]            # new chunk indices to download
+    zero: list[int]             # new chunk indices that are all zeros
+
+    def byte_count(self, indices) -> int:
+        return sum(self.manifest.chunk_range(i)[1] - self.manifest.chunk_range(i)[0]
+                   for i in indices)
+
+    def fetch_ranges(self) -> list[tuple[int, int]]:
+        """Chunks to fetch as coalesced [start, end) byte ranges."""
+        out: list[tuple[int, int]] = []
+        for i in self.fetch:
+            start, end = self.manifest.chunk_range(i)
+            if out and out[-1][1] == start:
+                out[-1] = (out[-1][0], end)
+            else:
+                out.append((start, end))
+        return out
+
+
+@dataclass
+class DeltaResult:
+    path: str
+    sha256: Optional[str]
+    fetched_bytes: int
+    reused_bytes: int
+    zero_bytes: int
+    chunks: int
+    chunks_fetched: int
+
+
+def fetch_manifest(manifest_url: str, timeout: float = downloader.TIMEOUT) -> image_manifest.Manifest:
+    """Download and parse a published manifest; DeltaUnavailable if there is none."""
+    req = urllib.request.Request(manifest_url, headers={"User-Agent": downloader.USER_AGENT})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            data = resp.read(MAX_MANIFEST_BYTES + 1)
+    except urllib.error.HTTPError as e:
+        raise DeltaUnavailable(f"no manifest at {manifest_url} (HTTP {e.code})") from e
+    except (urllib.error.URLError, OSError) as e:
+        raise DeltaUnavailable(f"manifest unreachable: {e}") from e
+    if len(data) > MAX_MANIFEST_BYTES:
+        raise DeltaUnavailable("manifest too large")
+    try:
+        return image_manifest.loads(data)
+    except (ValueError, KeyError, TypeError) as e:
+        raise DeltaUnavailable(f"bad manifest: {e}") from e
+
+
+def plan(remote: image_manifest.Manifest, local: image_manifest.Manifest) -> DeltaPlan:
+    """Which chunks of the new image come from where."""
+    by_hash: dict[str, int] = {}
+    if local.chunk_size == remote.chunk_size:
+        for i, h in enumerate(local.chunks):
+            by_hash.setdefault(h, i)
+        if local.chunks:
+            # The short tail chunk can only stand in for a chunk of its own length
+            tail = len(local.chunks) - 1
+            if local.chunk_range(tail)[1] - local.chunk_range(tail)[0] != local.chunk_size:
+                if by_hash.get(local.chunks[tail]) == tail:
+                    del by_hash[local.chunks[tail]]
+    copy, fetch, zero = {}, [], []
+    for i, h in enumerate(remote.chunks):
+        start, end = remote.chunk_range(i)
+        if remote.is_zero(i):
+            zero.append(i)
+        elif h in by_hash:
+            copy[i] = by_hash[h]
+        elif (local.chunk_size == remote.chunk_size and i < len(local.chunks)
+              and local.chunks[i] == h and local.chunk_range(i) == (start, end)):
+            copy[i] = i
+        else:
+            fetch.append(i)
+    return DeltaPlan(manifest=remote, copy=copy, fetch=fetch, zero=zero)
+
+
+def fetch_delta(
+    url: str,
+    manifest_url: str,
+    base: str,
+    dest: str,
+    on_start: Optional[Callable[[DeltaPlan], None]] = None,
+    on_progress: Optional[Callable[[int], None]] = None,
+    on_hash_progress: Optional[Callable[[int, int], None]] = None,
+    cancelled: Optional[Callable[[], bool]] = None,
+    connections: int = downloader.CONNECTIONS,
+    mirrors: Iterable[str] = (),
+    shaper=None,
+    expected_sha256: Optional[str] = None,
+) -> DeltaResult:
+    """Build dest (the image at url) from base plus the changed chunks.
+
+    on_start(plan) is called before the transfer; on_progress(bytes) as the
+    changed chunks arrive; on_hash_progress(done, total) while the local
+    image is hashed (only when it has no cached manifest).  Chunks may
+    come from any of mirrors as well as url; the manifest is read from
+    manifest_url only.  shaper paces the transfer (bandwidth.Shaper).
+    expected_sha256, when set, is the SHA-256 the finished image must have.
+    """
+    cancelled = cancelled or (lambda: False)
+    expected = expected_sha256.lower() if expected_sha256 else None
+    remote = fetch_manifest(manifest_url)
+    if expected and remote.sha256 and remote.sha256.lower() != expected:
+        raise DeltaUnavailable(f"manifest is for sha256 {remote.sha256}, expected {expected}")
+    base_size = os.path.getsize(base)
+    local = image_manifest.for_image(
+        base, remote.chunk_size, cancelled=cancelled,
+        on_progress=(lambda n: on_hash_progress(n, base_size)) if on_hash_progress else None)
+    delta = plan(remote, local)
+
+    work = dest + ".delta"
+    mirrors = list(mirrors)
+    dl = downloader.Download(url, work, connections=connections, cancelled=cancelled,
+                             ranges=delta.fetch_ranges(), mirrors=mirrors,
+                             shaper=shaper)
+    info = dl.probe()
+    if not info.ranges:
+        raise DeltaUnavailable("server doesn't support ranged requests")
+    if info.size != remote.size:
+        raise DeltaUnavailable(f"manifest is for {remote.size} bytes, server has {info.size}")
+
+    stale = _seed(dl.part, base, delta, resumed=os.path.exists(dl.part), cancelled=cancelled)
+    if stale:
+        # Local chunks that no longer match their manifest: fetch them too
+        delta.fetch = sorted(set(delta.fetch) | set(stale))
+        for i in stale:
+            delta.copy.pop(i, None)
+        dl = downloader.Download(url, work, connections=connections, cancelled=cancelled,
+                                 ranges=delta.fetch_ranges(), mirrors=mirrors,
+                                 shaper=shaper)
+        dl.probe()
+    if on_start is not None:
+        on_start(delta)
+    dl.run(on_progress=on_progress)
+
+    bad, sha = _verify(work, delta, cancelled)
+    if bad:
+        _remove(work)
+        raise downloader.DownloadError(
+            f"{len(bad)} downloaded chunk(s) don't match the manifest (first at byte "
+            f"{remote.chunk_range(bad[0])[0]})")
+    for want in (expected, remote.sha256 and remote.sha256.lower()):
+        if want and sha != want:
+            _remove(work)
+            raise downloader.DownloadError(f"SHA-256 mismatch: got {sha}, expected {want}")
+    os.replace(work, dest)
+    try:
+        remote.save(dest + image_manifest.SUFFIX)
+        with open(dest + ".sha256", "w") as f:
+            f.write(f"{sha}  {os.path.basename(dest)}\n")
+    except OSError:
+        pass
+    return DeltaResult(path=dest, sha256=sha,
+                       fetched_bytes=delta.byte_count(delta.fetch),
+                       reused_bytes=delta.byte_count(delta.copy),
+                       zero_bytes=delta.byte_count(delta.zero),
+                       chunks=len(remote.chunks), chunks_fetched=len(delta.fetch))
+
+
+def _seed(part: str, base: str, delta: DeltaPlan, resumed: bool,
+          cancelled: Callable[[], bool]) -> list[int]:
+    """Write the copied (and, when resuming, zero) chunks into part.
+    Returns copied chunks whose local data didn't match the manifest."""
+    m = delta.manifest
+    stale = []
+    mode = "r+b" if resumed else "wb"
+    with open(base, "rb") as src, open(part, mode) as out:
+        if os.fstat(out.fileno()).st_size != m.size:
+            out.truncate(m.size)
+        fd = out.fileno()
+        for i, j in sorted(delta.copy.items()):
+            if cancelled():
+                raise downloader.DownloadCancelled("download cancelled")
+            start, end = m.chunk_range(i)
+            src.seek(j * m.chunk_size)
+            data = src.read(end - start)
+            if hashlib.sha256(data).hexdigest() != m.chunks[i]:
+                stale.append(i)
+                continue
+            os.pwrite(fd, data, start)
+        if resumed:
+            for i in delta.zero:
+                start, end = m.chunk_range(i)
+                os.pwrite(fd, bytes(end - start), start)
+        out.flush()
+        os.fsync(fd)
+    return stale
+
+
+def _verify(path: str, delta: DeltaPlan,
+            cancelled: Callable[[], bool]) -> tuple[list[int], str]:
+    """Read the assembled image once, in order: the indices of fetched
+    chunks whose content doesn't match the manifest, and the SHA-256 of
+    the whole file."""
+    m = delta.manifest
+    fetched = set(delta.fetch)
+    bad = []
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for i in range(len(m.chunks)):
+            if cancelled():
+                raise downloader.DownloadCancelled("download cancelled")
+            start, end = m.chunk_range(i)
+            data = f.read(end - start)
+            digest.update(data)
+            if i in fetched and hashlib.sha256(data).hexdigest() != m.chunks[i]:
+                bad.append(i)
+        digest.update(f.read())                 # nothing, unless the file outgrew the manifest
+    return bad, digest.hexdigest()
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,670 @@
+#!/usr/bin/env python3
+"""
+Downloader — parallel, ranged, resumable HTTP downloads for disk images.
+
+A single urllib stream restarts from zero when the connection drops and
+rarely fills the link on its own.  Download probes the server first and,
+when it honours byte ranges, splits the file into fixed-size segments that
+several connections fetch concurrently, each writing at its own offset of
+a preallocated ``<dest>.part`` file:
+
+    dl = Download(url, "/path/base-image.qcow2", connections=4)
+    info = dl.probe()                       # size, range support, ETag
+    dl.run(on_progress=lambda done: ...)    # blocks; renames .part -> dest
+
+Per-segment progress is saved to ``<dest>.part.json`` about once a second
+(after an fsync of the .part, so it never claims bytes that aren't on disk),
+so a download that is interrupted (network, crash, cancel) resumes where
+it stopped — as long as the server still reports the same size and
+ETag / Last-Modified; otherwise it starts over.  A dropped connection is
+retried per segment with backoff, from the last byte written.
+
+Servers without range support (or with unknown size) get a single-stream
+download, which cannot resume.
+
+ranges=[(start, end), ...] fetches only those byte ranges into a .part the
+caller has already filled in (delta_update); the rest is left untouched.
+
+Mirrors: Download(url, dest, mirrors=[url2, url3]) probes every URL at
+once — time to first byte plus a short throughput sample — and drops those
+that fail or report a different size.  Each segment request goes to the
+ready mirror with the best throughput per connection in flight, so
+segments come from several mirrors at once.  A mirror that drops or errors
+is benched with backoff (for good on a 4xx or a wrong range) and the
+segment continues from its last byte on another one; nothing already
+written is fetched again.  expected_sha256 verifies the finished file
+before it replaces dest — mirrors are only trusted to agree on the size.
+
+shaper=bandwidth.Shaper(...) paces every body read of the transfer through
+one token bucket (the cap can change mid-download) and, with its
+background flag, marks the connections low priority.
+
+stream() hands the body out in order instead of writing a file, still
+fetching a few segments ahead in parallel — for consumers that transform
+the bytes on the way to disk (decompress_stream).
+
+Requires: bandwidth (only when a shaper is passed)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Callable, Iterable, Iterator, Optional
+
+USER_AGENT = "LukesMirage/2.2"
+
+# Concurrent connections for a ranged download
+CONNECTIONS = 4
+
+# Bytes per segment (unit of work and of resume state)
+SEGMENT_BYTES = 32 * 1024 * 1024
+
+# Bytes per segment when streaming in order (held in memory)
+STREAM_SEGMENT_BYTES = 8 * 1024 * 1024
+
+# Read size per socket read
+CHUNK_BYTES = 256 * 1024
+
+# Socket timeout per request / read (seconds)
+TIMEOUT = 30
+
+# Attempts per segment before the download fails (with backoff in between)
+RETRIES = 5
+
+# Seconds between saves of the resume state
+STATE_SAVE_SECS = 1.0
+
+# Bytes fetched from each mirror to estimate its throughput
+PROBE_SAMPLE_BYTES = 512 * 1024
+
+# Read size when verifying a finished download
+HASH_CHUNK_BYTES = 8 * 1024 * 1024
+
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+class DownloadError(Exception):
+    """The download could not complete (state is kept for a later resume)."""
+
+
+class DownloadCancelled(DownloadError):
+    """Stopped by the caller's cancel check."""
+
+
+class _RangeIgnored(Exception):
+    """The server answered a range request with the whole file."""
+
+
+@dataclass
+class ProbeResult:
+    url: str                    # after redirects
+    size: Optional[int]         # None when the server doesn't say
+    ranges: bool
+    etag: str = ""
+    last_modified: str = ""
+
+
+@dataclass
+class Mirror:
+    url: str                    # after redirects
+    latency: float = 0.0        # seconds for the probe request
+    throughput: float = 0.0     # bytes/s over the probe sample (0 = unmeasured)
+    active: int = 0             # requests in flight
+    failures: int = 0           # consecutive failures
+    retry_at: float = 0.0       # monotonic time before which it is skipped
+    dead: bool = False          # permanent error: never used again
+    fetched: int = 0            # bytes received by this run
+
+    def to_dict(self) -> dict:
+        return {"url": self.url, "latency_ms": round(self.latency * 1000),
+                "throughput": round(self.throughput), "fetched": self.fetched,
+                "failures": self.failures, "dead": self.dead}
+
+
+@dataclass
+class Segment:
+    start: int
+    end: int                    # exclusive
+    got: int = 0                # bytes written from start
+
+    @property
+    def done(self) -> bool:
+        return self.start + self.got >= self.end
+
+
+def probe(url: str, timeout: float = TIMEOUT, user_agent: str = USER_AGENT) -> ProbeResult:
+    """One GET for byte 0: a 206 means ranges work and carries the full size."""
+    req = urllib.request.Request(url, headers={"User-Agent": user_agent, "Range": "bytes=0-0"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        headers = resp.headers
+        final_url = resp.geturl()
+        size, ranges = None, False
+        if resp.status == 206:
+            m = _CONTENT_RANGE_RE.match(headers.get("Content-Range", ""))
+            if m and m.group(3) != "*":
+                size, ranges = int(m.group(3)), True
+        elif headers.get("Content-Length"):
+            size = int(headers["Content-Length"])
+    return ProbeResult(url=final_url, size=size, ranges=ranges,
+                       etag=headers.get("ETag", ""),
+                       last_modified=headers.get("Last-Modified", ""))
+
+
+def probe_mirror(url: str, timeout: float = TIMEOUT, user_agent: str = USER_AGENT,
+                 sample_bytes: int = PROBE_SAMPLE_BYTES) -> tuple[Mirror, ProbeResult]:
+    """probe() plus a timed sample download (when ranges work)."""
+    t0 = time.monotonic()
+    info = probe(url, timeout, user_agent)
+    mirror = Mirror(url=info.url, latency=time.monotonic() - t0)
+    if info.ranges and info.size and sample_bytes:
+        n = min(sample_bytes, info.size)
+        req = urllib.request.Request(info.url, headers={"User-Agent": user_agent,
+                                                        "Range": f"bytes=0-{n - 1}"})
+        t0 = time.monotonic()
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            got = len(resp.read(n))
+        mirror.throughput = got / max(time.monotonic() - t0, 1e-6)
+    return mirror, info
+
+
+class Download:
+    """One URL (or a set of mirrors) to one file; see the module docstring."""
+
+    def __init__(
+        self,
+        url: str,
+        dest: str,
+        connections: int = CONNECTIONS,
+        segment_bytes: int = SEGMENT_BYTES,
+        cancelled: Optional[Callable[[], bool]] = None,
+        user_agent: str = USER_AGENT,
+        timeout: float = TIMEOUT,
+        retries: int = RETRIES,
+        ranges: Optional[list[tuple[int, int]]] = None,
+        mirrors: Iterable[str] = (),
+        expected_sha256: Optional[str] = None,
+        shaper=None,
+    ):
+        self.url = url
+        self.dest = dest
+        self.part = dest + ".part"
+        self.state_path = dest + ".part.json"
+        self._connections = max(1, connections)
+        self._segment_bytes = max(CHUNK_BYTES, segment_bytes)
+        self._cancelled = cancelled or (lambda: False)
+        self._user_agent = user_agent
+        self._timeout = timeout
+        self._retries = retries
+        self._ranges = [list(r) for r in ranges] if ranges is not None else None
+        self._mirror_urls = [u for u in mirrors if u and u != url]
+        self._expected_sha256 = expected_sha256.lower() if expected_sha256 else None
+        self._mirror_cond = threading.Condition()
+        self._shaper = shaper
+        self._opener = None
+        if shaper is not None and shaper.background:
+            import bandwidth
+            self._opener = bandwidth.background_opener()
+        self.mirrors: list[Mirror] = []
+        self._lock = threading.Lock()
+        self._segments: list[Segment] = []
+        self._next = 0
+        self._error: Optional[BaseException] = None
+        self._on_progress: Optional[Callable[[int], None]] = None
+        self._last_save = 0.0
+        self._sync_fd: Optional[int] = None
+        self.info: Optional[ProbeResult] = None
+        self.resumed_bytes = 0      # already on disk from an earlier run
+        self.fetched = 0            # transferred by this run
+        self.sha256: Optional[str] = None   # set once expected_sha256 is verified
+
+    # ── Public ──
+
+    def probe(self) -> ProbeResult:
+        if self.info is None:
+            if self._mirror_urls:
+                self.info = self._probe_mirrors()
+            else:
+                self.info = probe(self.url, self._timeout, self._user_agent)
+                self.mirrors = [Mirror(url=self.info.url)]
+            if self.info.ranges:
+                self._load_state()
+        return self.info
+
+    @property
+    def done(self) -> int:
+        with self._lock:
+            return sum(s.got for s in self._segments)
+
+    def run(self, on_progress: Optional[Callable[[int], None]] = None) -> str:
+        """Download to dest; on_progress(bytes_done) is called from worker
+        threads (serialized). Returns dest."""
+        info = self.probe()
+        self._on_progress = on_progress
+        if self._ranges is not None and not (info.ranges and info.size):
+            raise DownloadError("server doesn't support ranged requests")
+        if info.ranges and info.size:
+            self._run_ranged(info)
+        else:
+            self._run_single(info)
+        if self._expected_sha256:
+            self._verify()
+        os.replace(self.part, self.dest)
+        self._clear_state()
+        return self.dest
+
+    def mirror_stats(self) -> list[dict]:
+        with self._mirror_cond:
+            return [m.to_dict() for m in self.mirrors]
+
+    # ── Mirrors ──
+
+    def _probe_mirrors(self) -> ProbeResult:
+        """Probe every URL concurrently; keep the ones that agree on the size,
+        fastest first.  The primary URL's answer is the reference when it
+        has one (its ETag keys the resume state)."""
+        urls = [self.url] + self._mirror_urls
+        with ThreadPoolExecutor(len(urls), thread_name_prefix="dl-probe") as pool:
+            futures = [pool.submit(probe_mirror, u, self._timeout, self._user_agent) for u in urls]
+            results = []
+            for f in futures:
+                try:
+                    results.append(f.result())
+                except (urllib.error.URLError, OSError, ValueError) as e:
+                    results.append(e)
+        ok = [r for r in results if not isinstance(r, Exception)]
+        if not ok:
+            raise results[0]
+        info = ok[0][1]
+        same = [(m, i) for m, i in ok if i.size == info.size and i.ranges == info.ranges]
+        self.mirrors = sorted((m for m, _ in same), key=lambda m: (-m.throughput, m.latency))
+        return info
+
+    def _pick_mirror(self) -> Mirror:
+        """The ready mirror with the most throughput per request in flight;
+        waits out a backoff when every live mirror is benched."""
+        with self._mirror_cond:
+            while True:
+                if self._cancelled():
+                    raise DownloadCancelled("download cancelled")
+                if self._error is not None:
+                    raise DownloadCancelled("download stopped")
+                live = [m for m in self.mirrors if not m.dead]
+                if not live:
+                    raise DownloadError("no mirror left to download from")
+                now = time.monotonic()
+                ready = [m for m in live if m.retry_at <= now]
+                if ready:
+                    best = min(ready, key=lambda m: (m.active + 1) / max(m.throughput, 1.0))
+                    best.active += 1
+                    return best
+                wait = min(m.retry_at for m in live) - now
+                self._mirror_cond.wait(min(wait, 0.5))
+
+    def _release_mirror(self, mirror: Mirror, error: Optional[BaseException] = None,
+                        permanent: bool = False, progressed: bool = False) -> int:
+        """Return a mirror after a request; on error bench it (or retire it).
+        Returns how many mirrors are still live."""
+        with self._mirror_cond:
+            mirror.active -= 1
+            if error is None:
+                mirror.failures = 0
+            elif permanent:
+                mirror.dead = True
+            else:
+                mirror.failures = 1 if progressed else mirror.failures + 1
+                mirror.retry_at = time.monotonic() + min(30, 2 ** (mirror.failures - 1))
+            self._mirror_cond.notify_all()
+            return sum(1 for m in self.mirrors if not m.dead)
+
+    def _urlopen(self, req):
+        if self._opener is not None:
+            return self._opener.open(req, timeout=self._timeout)
+        return urllib.request.urlopen(req, timeout=self._timeout)
+
+    def _shape(self, n: int):
+        if self._shaper is not None:
+            self._shaper.consume(n, self._cancelled)
+
+    def _best_url(self) -> str:
+        live = [m for m in self.mirrors if not m.dead]
+        return live[0].url if live else self.info.url
+
+    def _verify(self):
+        digest = hashlib.sha256()
+        with open(self.part, "rb") as f:
+            while True:
+                if self._cancelled():
+                    raise DownloadCancelled("download cancelled")
+                chunk = f.read(HASH_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        sha = digest.hexdigest()
+        if sha != self._expected_sha256:
+            try:
+                os.remove(self.part)
+            except OSError:
+                pass
+            self._clear_state()
+            raise DownloadError(f"SHA-256 mismatch: got {sha}, expected {self._expected_sha256}")
+        self.sha256 = sha
+
+    # ── Ranged ──
+
+    def _run_ranged(self, info: ProbeResult):
+        if not self._segments:
+            spans = self._ranges if self._ranges is not None else [(0, info.size)]
+            self._segments = [Segment(off, min(off + self._segment_bytes, end))
+                              for start, end in spans
+                              for off in range(start, end, self._segment_bytes)]
+        self.resumed_bytes = sum(s.got for s in self._segments)
+        self._next = 0
+        self._preallocate(info.size)
+        self._sync_fd = os.open(self.part, os.O_WRONLY)
+        self._report()
+
+        workers = [threading.Thread(target=self._worker, daemon=True, name=f"dl-{i}")
+                   for i in range(min(self._connections, len(self._segments)))]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        self._save_state(force=True)
+        os.close(self._sync_fd)
+        self._sync_fd = None
+
+        if isinstance(self._error, _RangeIgnored) and self._ranges is not None:
+            raise DownloadError("server stopped honouring range requests")
+        if isinstance(self._error, _RangeIgnored):
+            # Probe said yes, segment requests said no: start over as one stream
+            self._segments = []
+            self._error = None
+            self._clear_state()
+            self._run_single(info)
+            return
+        if self._error is not None:
+            raise self._error
+        if not all(s.done for s in self._segments):
+            raise DownloadError("download incomplete")
+
+    def _take(self) -> Optional[Segment]:
+        with self._lock:
+            while self._next < len(self._segments):
+                seg = self._segments[self._next]
+                self._next += 1
+                if not seg.done:
+                    return seg
+            return None
+
+    def _worker(self):
+        fd = os.open(self.part, os.O_WRONLY)
+        try:
+            while self._error is None:
+                seg = self._take()
+                if seg is None:
+                    return
+                try:
+                    self._fetch_segment(seg, lambda off, chunk: os.pwrite(fd, chunk, off))
+                except BaseException as e:
+                    with self._lock:
+                        self._error = self._error or e
+                    return
+        finally:
+            os.close(fd)
+
+    def _fetch_segment(self, seg: Segment, write: Callable[[int, bytes], object]):
+        """Fetch the rest of seg, write(offset, chunk) by chunk; a dropped
+        request continues from the last byte, on another mirror if any."""
+        attempt = 0
+        while not seg.done:
+            if self._cancelled():
+                raise DownloadCancelled("download cancelled")
+            if self._error is not None:
+                return
+            mirror = self._pick_mirror()
+            offset = seg.start + seg.got
+            got_before = seg.got
+            headers = {"User-Agent": self._user_agent, "Range": f"bytes={offset}-{seg.end - 1}"}
+            req = urllib.request.Request(mirror.url, headers=headers)
+            try:
+                with self._urlopen(req) as resp:
+                    if resp.status != 206:
+                        raise _RangeIgnored()
+                    m = _CONTENT_RANGE_RE.match(resp.headers.get("Content-Range", ""))
+                    if not m or int(m.group(1)) != offset:
+                        raise DownloadError(f"server sent the wrong range for offset {offset}")
+                    while not seg.done:
+                        if self._cancelled():
+                            raise DownloadCancelled("download cancelled")
+                        chunk = resp.read(min(CHUNK_BYTES, seg.end - seg.start - seg.got))
+                        if not chunk:
+                            raise ConnectionError("connection closed mid-segment")
+                        self._shape(len(chunk))
+                        write(seg.start + seg.got, chunk)
+                        self._advance(seg, len(chunk), mirror)
+            except DownloadCancelled:
+                self._release_mirror(mirror)
+                raise
+            except (_RangeIgnored, DownloadError) as e:
+                if len(self.mirrors) == 1:
+                    self._release_mirror(mirror)
+                    raise
+                # This mirror can't serve ranges properly: retire it if others remain
+                if self._release_mirror(mirror, e, permanent=True) == 0:
+                    raise
+                continue
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                progressed = seg.got > got_before
+                if isinstance(e, urllib.error.HTTPError) and 400 <= e.code < 500 and e.code != 429:
+                    if self._release_mirror(mirror, e, permanent=True) == 0:
+                        raise DownloadError(f"HTTP {e.code} for bytes {offset}-{seg.end - 1}") from e
+                    continue
+                live = self._release_mirror(mirror, e, progressed=progressed)
+                if progressed:
+                    attempt = 0             # it was making progress: a fresh drop
+                attempt += 1
+                if attempt > self._retries + live - 1:
+                    raise DownloadError(f"segment at {seg.start} failed after "
+                                        f"{attempt - 1} retries: {e}") from e
+                continue
+            self._release_mirror(mirror)
+
+    def _advance(self, seg: Segment, n: int, mirror: Optional[Mirror] = None):
+        with self._lock:
+            seg.got += n
+            self.fetched += n
+            if mirror is not None:
+                mirror.fetched += n
+            self._report()
+        if self._sync_fd is not None:      # writing to .part: keep resume state current
+            self._save_state()
+
+    def _report(self):
+        # Lock held (or single-threaded)
+        if self._on_progress is not None:
+            try:
+                self._on_progress(sum(s.got for s in self._segments))
+            except Exception:
+                pass
+
+    def _preallocate(self, size: int):
+        """Create the .part at full size so workers can write at any offset.
+
+        truncate() reserves the length (sparse on APFS); space for the rest
+        is claimed as segments land.
+        """
+        mode = "r+b" if os.path.exists(self.part) else "wb"
+        with open(self.part, mode) as f:
+            if os.fstat(f.fileno()).st_size != size:
+                f.truncate(size)
+
+    # ── In-order streaming (no file) ──
+
+    def stream(self, on_progress: Optional[Callable[[int], None]] = None,
+               segment_bytes: int = STREAM_SEGMENT_BYTES) -> Iterator[bytes]:
+        """Yield the body in order without writing it anywhere.
+
+        On ranged servers the next few segments are fetched concurrently
+        into memory (at most 2 x connections x segment_bytes) and handed out
+        in order, so a sequential consumer — a decompressor — still gets
+        several connections' worth of throughput.  There is no resume: the
+        consumer couldn't pick up mid-stream anyway.
+        """
+        info = self.probe()
+        self._on_progress = on_progress
+        self._segments = []
+        if not (info.ranges and info.size):
+            yield from self._stream_single(info)
+            return
+        self._segments = [Segment(off, min(off + segment_bytes, info.size))
+                          for off in range(0, info.size, segment_bytes)]
+        pending = deque()
+        queue = iter(self._segments)
+        with ThreadPoolExecutor(self._connections, thread_name_prefix="dl") as pool:
+            def _fill():
+                while len(pending) < 2 * self._connections:
+                    seg = next(queue, None)
+                    if seg is None:
+                        return
+                    pending.append(pool.submit(self._fetch_to_memory, seg))
+            yielded = False
+            try:
+                _fill()
+                while pending:
+                    try:
+                        data = pending.popleft().result()
+                    except _RangeIgnored:
+                        if yielded:
+                            raise DownloadError("server stopped honouring range requests")
+                        self._error = DownloadCancelled("fallback")   # stop the others
+                        for f in pending:
+                            f.cancel()
+                        pending.clear()
+                        break
+                    _fill()
+                    yielded = True
+                    yield data
+                else:
+                    return
+            finally:
+                if pending:
+                    self._error = self._error or DownloadCancelled("stream closed")
+                    for f in pending:
+                        f.cancel()
+        # Probe said ranges work, the segment requests said otherwise
+        self._error = None
+        self._segments = []
+        yield from self._stream_single(info)
+
+    def _fetch_to_memory(self, seg: Segment) -> bytearray:
+        buf = bytearray(seg.end - seg.start)
+
+        def _put(offset, chunk):
+            buf[offset - seg.start:offset - seg.start + len(chunk)] = chunk
+        self._fetch_segment(seg, _put)
+        if not seg.done:
+            raise self._error or DownloadError("segment incomplete")
+        return buf
+
+    def _stream_single(self, info: ProbeResult) -> Iterator[bytes]:
+        done = 0
+        req = urllib.request.Request(self._best_url(), headers={"User-Agent": self._user_agent})
+        with self._urlopen(req) as resp:
+            while True:
+                if self._cancelled():
+                    raise DownloadCancelled("download cancelled")
+                chunk = resp.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                self._shape(len(chunk))
+                done += len(chunk)
+                self.fetched = done
+                if self._on_progress is not None:
+                    try:
+                        self._on_progress(done)
+                    except Exception:
+                        pass
+                yield chunk
+        if info.size and done != info.size:
+            raise DownloadError(f"connection closed at {done} of {info.size} bytes")
+
+    # ── Single stream ──
+
+    def _run_single(self, info: ProbeResult):
+        self.resumed_bytes = 0
+        done = 0
+        req = urllib.request.Request(self._best_url(), headers={"User-Agent": self._user_agent})
+        with self._urlopen(req) as resp, open(self.part, "wb") as f:
+            while True:
+                if self._cancelled():
+                    raise DownloadCancelled("download cancelled")
+                chunk = resp.read(CHUNK_BYTES)
+                if not chunk:
+                    break
+                self._shape(len(chunk))
+                f.write(chunk)
+                done += len(chunk)
+                self.fetched = done
+                if self._on_progress is not None:
+                    try:
+                        self._on_progress(done)
+                    except Exception:
+                        pass
+            f.flush()
+            os.fsync(f.fileno())
+        if info.size and done != info.size:
+            raise DownloadError(f"connection closed at {done} of {info.size} bytes")
+
+    # ── Resume state ──
+
+    def _load_state(self):
+        info = self.info
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        same = (state.get("size") == info.size
+                and state.get("etag", "") == info.etag
+                and state.get("last_modified", "") == info.last_modified
+                and state.get("ranges") == self._ranges
+                and os.path.exists(self.part))
+        if not same:
+            self._clear_state()
+            return
+        self._segments = [Segment(**s) for s in state.get("segments", [])]
+
+    def _save_state(self, force: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_save < STATE_SAVE_SECS:
+                return
+            self._last_save = now
+            state = {"url": self.url, "size": self.info.size, "etag": self.info.etag,
+                     "last_modified": self.info.last_modified, "ranges": self._ranges,
+                     "segments": [asdict(s) for s in self._segments]}
+        tmp = self.state_path + ".tmp"
+        try:
+            if self._sync_fd is not None:
+                os.fsync(self._sync_fd)     # never record bytes that aren't on disk
+            with open(tmp, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp, self.state_path)
+        except OSError:
+            pass
+
+    def _clear_state(self):
+        for path in (self.state_path, self.state_path + ".tmp"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Fleet Fan-out — run a per-instance maintenance plan on many instances at once.
+
+Fleet-wide passes (permission fixes, auto-update hardening, status probes)
+used to walk the instances one after another, each running its adb
+commands in sequence, so wall time grew with instances × commands.  The
+fan-out runs one worker per instance (capped) and executes that instance's
+plan in order:
+
+    plan = [
+        PlanStep("probe", probe_fn, required=True),
+        PlanStep("magisk_settings", settings_fn),
+        ...
+    ]
+    results = FanOut(max_workers=6).run(targets, plan)
+    ok, failed = names_with(results, "magisk_settings", "ok"), ...
+
+A step function takes (name, serial) and returns one of:
+  True / False / None          → "ok" / "failed" / "ok"
+  (status, detail)             → status may be a bool or any string
+                                 (e.g. "missing", "skipped")
+Exceptions are recorded as status "error".  When a ``required`` step does
+not end "ok", the remaining steps for that instance are skipped.
+
+Results are structured per instance and per step (status, detail, timing)
+so callers build their summaries from data instead of parallel name lists.
+
+Requires: nothing beyond the standard library
+"""
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Optional
+
+# Max instances worked on at once — adb server and host CPU are shared
+DEFAULT_CONCURRENCY = 6
+
+
+@dataclass
+class PlanStep:
+    name: str
+    fn: Callable[[str, str], object]
+    required: bool = False    # skip the rest of the plan unless this is "ok"
+
+
+@dataclass
+class StepResult:
+    step: str
+    status: str = "ok"        # ok | failed | error | skipped | <custom>
+    detail: str = ""
+    secs: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+
+@dataclass
+class InstanceResult:
+    name: str
+    serial: str
+    steps: list[StepResult] = field(default_factory=list)
+    secs: float = 0.0
+
+    def step(self, name: str) -> Optional[StepResult]:
+        for s in self.steps:
+            if s.step == name:
+                return s
+        return None
+
+    def status(self, name: str) -> str:
+        s = self.step(name)
+        return s.status if s else "skipped"
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _normalize(ret) -> tuple[str, str]:
+    if ret is None or ret is True:
+        return "ok", ""
+    if ret is False:
+        return "failed", ""
+    if isinstance(ret, tuple):
+        status, detail = ret[0], (ret[1] if len(ret) > 1 else "")
+        if isinstance(status, bool):
+            status = "ok" if status else "failed"
+        return str(status), str(detail or "")
+    return "ok", str(ret)
+
+
+class FanOut:
+    """Runs a plan on every target in parallel, at most max_workers at a time.
+
+    on_instance_done: optional callback(InstanceResult) as each target finishes.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_CONCURRENCY,
+        on_instance_done: Optional[Callable[[InstanceResult], None]] = None,
+    ):
+        self._max_workers = max(1, int(max_workers))
+        self._on_instance_done = on_instance_done
+
+    def run(self, targets: list[tuple[str, str]], plan: list[PlanStep]) -> list[InstanceResult]:
+        """Run plan on [(name, serial), ...]. Results come back in target order."""
+        if not targets:
+            return []
+        workers = min(self._max_workers, len(targets))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fanout") as pool:
+            futures = [pool.submit(self._run_one, name, serial, plan) for name, serial in targets]
+            return [f.result() for f in futures]
+
+    def _run_one(self, name: str, serial: str, plan: list[PlanStep]) -> InstanceResult:
+        res = InstanceResult(name=name, serial=serial)
+        t0 = time.monotonic()
+        blocked = None
+        for step in plan:
+            if blocked:
+                res.steps.append(StepResult(step.name, "skipped", f"{blocked} not ok"))
+                continue
+            s0 = time.monotonic()
+            try:
+                status, detail = _normalize(step.fn(name, serial))
+            except Exception as e:
+                status, detail = "error", str(e)
+            res.steps.append(StepResult(step.name, status, detail,
+                                        round(time.monotonic() - s0, 2)))
+            if step.required and status != "ok":
+                blocked = step.name
+        res.secs = round(time.monotonic() - t0, 2)
+        if self._on_instance_done:
+            try:
+                self._on_instance_done(res)
+            except Exception:
+                pass
+        return res
+
+
+# ─── Summary helpers ─────────────────────────────────────────────────────────
+
+def names_with(results: list[InstanceResult], step: str, *statuses: str) -> list[str]:
+    """Names of instances whose step ended in any of statuses."""
+    return [r.name for r in results if r.status(step) in statuses]
+
+
+def names_failed(results: list[InstanceResult], step: str) -> list[str]:
+    """Names whose step failed or raised."""
+    return names_with(results, step, "failed", "error")
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Fleet Launcher — load-aware, staggered startup of many BlueStacks instances.
+
+Launching 20 instances at once saturates CPU and disk; many of them then
+hang on the "Starting BlueStacks Air" splash.  The launcher starts instances
+in waves instead:
+
+  1. Start one wave (initial size from the policy).
+  2. Wait until most of the wave has reached sys.boot_completed=1 (or the
+     wave timeout expires) using the concurrent BootWaiter.
+  3. Sample host CPU, free memory and disk throughput.
+  4. Grow the next wave when the host has headroom, shrink it when any
+     signal is over its limit, then repeat.
+
+Every instance's time-to-boot (launch → boot_completed) is recorded in the
+report so the policy can be tuned from real numbers.
+
+Host sampling uses psutil when it is installed, otherwise macOS built-ins
+(``iostat`` for CPU + disk, ``vm_stat`` for memory, ``os.getloadavg`` as
+a last resort).
+
+Requires: boot_waiter.BootWaiter
+"""
+from __future__ import annotations
+
+import math
+import os
+import re
+import subprocess
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import asdict, dataclass, fields
+from typing import Callable, Optional
+
+import boot_waiter
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Longest a wait on boots goes without checking for cancellation (s)
+_CANCEL_POLL = 1.0
+
+
+@dataclass
+class LaunchPolicy:
+    """Concurrency policy for a fleet launch. All limits are per host."""
+    initial_wave: int = 3
+    min_wave: int = 1
+    max_wave: int = 8
+    max_cpu_busy: float = 0.85      # fraction of total CPU (0-1)
+    min_free_mem_mb: int = 2048
+    max_disk_mb_s: float = 400.0
+    ready_fraction: float = 0.75    # share of a wave that must boot before the next
+    wave_timeout: float = 120.0     # max seconds to wait on one wave
+    boot_timeout: float = 240.0     # per-instance budget from launch to boot
+
+    @classmethod
+    def from_dict(cls, d: Optional[dict]) -> "LaunchPolicy":
+        """Build a policy from a (possibly partial) dict, ignoring unknown keys."""
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in (d or {}).items() if k in known})
+
+
+@dataclass
+class HostSample:
+    cpu_busy: float       # 0-1
+    free_mem_mb: int
+    disk_mb_s: float
+    source: str           # "psutil" or "macos"
+
+
+# ─── Host sampling ───────────────────────────────────────────────────────────
+
+def _sample_psutil(interval: float) -> HostSample:
+    io0 = psutil.disk_io_counters()
+    cpu = psutil.cpu_percent(interval=interval) / 100.0
+    io1 = psutil.disk_io_counters()
+    disk = 0.0
+    if io0 and io1:
+        moved = (io1.read_bytes - io0.read_bytes) + (io1.write_bytes - io0.write_bytes)
+        disk = moved / (1024 * 1024) / interval
+    free = psutil.virtual_memory().available // (1024 * 1024)
+    return HostSample(cpu_busy=cpu, free_mem_mb=int(free), disk_mb_s=disk, source="psutil")
+
+
+def _parse_iostat(output: str) -> tuple[Optional[float], float]:
+    """Parse ``iostat -c 2 -w 1`` → (cpu_busy, disk_mb_s) from the last sample.
+
+    Layout: first header lists disk names then "cpu" and "load average";
+    each data row has KB/t tps MB/s per disk followed by us sy id.
+    """
+    lines = [l for l in output.splitlines() if l.strip()]
+    if len(lines) < 3:
+        return None, 0.0
+    ndisks = len(re.findall(r"\bdisk\d+", lines[0]))
+    has_cpu = "cpu" in lines[0]
+    row = lines[-1].split()
+    disk = 0.0
+    for i in range(ndisks):
+        try:
+            disk += float(row[i * 3 + 2])
+        except (IndexError, ValueError):
+            pass
+    cpu = None
+    if has_cpu:
+        try:
+            idle = float(row[ndisks * 3 + 2])
+            cpu = max(0.0, min(1.0, (100.0 - idle) / 100.0))
+        except (IndexError, ValueError):
+            pass
+    return cpu, disk
+
+
+def _free_mem_vm_stat() -> int:
+    """Available memory (free + inactive + speculative pages) in MB via vm_stat."""
+    cp = subprocess.run(["vm_stat"], capture_output=True, text=True, timeout=5)
+    page = 4096
+    m = re.search(r"page size of (\d+) bytes", cp.stdout)
+    if m:
+        page = int(m.group(1))
+    pages = 0
+    for key in ("Pages free", "Pages inactive", "Pages speculative"):
+        m = re.search(rf"{key}:\s+(\d+)", cp.stdout)
+        if m:
+            pages += int(m.group(1))
+    return pages * page // (1024 * 1024)
+
+
+def _sample_macos(interval: float) -> HostSample:
+    cpu, disk = None, 0.0
+    try:
+        cp = subprocess.run(
+            ["iostat", "-c", "2", "-w", str(max(1, int(interval)))],
+            capture_output=True, text=True, timeout=interval + 5,
+        )
+        cpu, disk = _parse_iostat(cp.stdout)
+    except Exception:
+        pass
+    if cpu is None:
+        try:
+            cpu = os.getloadavg()[0] / (os.cpu_count() or 1)
+        except OSError:
+            cpu = 0.0
+    try:
+        free = _free_mem_vm_stat()
+    except Exception:
+        free = 0
+    return HostSample(cpu_busy=cpu, free_mem_mb=free, disk_mb_s=disk, source="macos")
+
+
+def sample_host(interval: float = 1.0) -> HostSample:
+    """Measure CPU busy fraction, available memory and disk MB/s over interval."""
+    if psutil is not None:
+        try:
+            return _sample_psutil(interval)
+        except Exception:
+            pass
+    return _sample_macos(interval)
+
+
+# ─── Wave sizing ─────────────────────────────────────────────────────────────
+
+def next_wave_size(current: int, sample: HostSample, policy: LaunchPolicy) -> tuple[int, str]:
+    """Additive increase / multiplicative decrease on host pressure.
+
+    Returns (new_size, reason).
+    """
+    over = []
+    if sample.cpu_busy > policy.max_cpu_busy:
+        over.append(f"cpu {sample.cpu_busy:.0%}")
+    if sample.free_mem_mb and sample.free_mem_mb < policy.min_free_mem_mb:
+        over.append(f"mem {sample.free_mem_mb} MB free")
+    if sample.disk_mb_s > policy.max_disk_mb_s:
+        over.append(f"disk {sample.disk_mb_s:.0f} MB/s")
+    if over:
+        return max(policy.min_wave, current // 2), "shrink: " + ", ".join(over)
+
+    headroom = (
+        sample.cpu_busy < policy.max_cpu_busy * 0.6
+        and (not sample.free_mem_mb or sample.free_mem_mb > policy.min_free_mem_mb * 2)
+        and sample.disk_mb_s < policy.max_disk_mb_s * 0.5
+    )
+    if headroom:
+        return min(policy.max_wave, current + 1), "grow: host has headroom"
+    return current, "hold"
+
+
+# ─── Launcher ────────────────────────────────────────────────────────────────
+
+class FleetLauncher:
+    """Starts instances in adaptive waves and reports time-to-boot.
+
+    start_fn:  callable(instance_name) -> error string or None.  Launches
+               the BlueStacks process for one instance.
+    on_event:  optional callback(event: dict) for progress
+               (types: "wave", "started", "booted", "failed", "done").
+    """
+
+    def __init__(
+        self,
+        adb_exe: str,
+        start_fn: Callable[[str], Optional[str]],
+        policy: Optional[LaunchPolicy] = None,
+        on_event: Optional[Callable[[dict], None]] = None,
+        sampler: Callable[[], HostSample] = sample_host,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ):
+        self._adb_exe = adb_exe
+        self._start_fn = start_fn
+        self._policy = policy or LaunchPolicy()
+        self._on_event = on_event
+        self._sampler = sampler
+        self._cancelled = False
+        self._cancel_check = cancelled
+
+    def cancel(self):
+        """Stop launching further waves (already-started instances keep booting)."""
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        """cancel() was called or the cancelled callback says so (polled
+        between starts and while waiting on boots)."""
+        if not self._cancelled and self._cancel_check is not None and self._cancel_check():
+            self._cancelled = True
+        return self._cancelled
+
+    def _emit(self, event: dict):
+        if self._on_event:
+            try:
+                self._on_event(event)
+            except Exception:
+                pass
+
+    def launch(self, targets: list[tuple[str, str]]) -> dict:
+        """Launch [(instance_name, serial), ...]. Blocks until all boot or time out.
+
+        Returns {"policy", "waves": [...], "instances": [...], "summary": {...}}.
+        """
+        waiter = boot_waiter.BootWaiter(
+            self._adb_exe, timeout=self._policy.boot_timeout, settle_seconds=0,
+        )
+        try:
+            return self._launch(waiter, targets)
+        finally:
+            waiter.cancel()          # no boot-wait thread outlives the launch
+
+    def _launch(self, waiter: boot_waiter.BootWaiter,
+                targets: list[tuple[str, str]]) -> dict:
+        policy = self._policy
+        t0 = time.monotonic()
+        per_inst: dict[str, dict] = {}
+        futures: dict[Future, str] = {}
+        waves = []
+        remaining = list(targets)
+        wave_size = max(policy.min_wave, min(policy.initial_wave, policy.max_wave))
+
+        while remaining and not self.cancelled:
+            wave, remaining = remaining[:wave_size], remaining[wave_size:]
+            idx = len(waves) + 1
+            self._emit({"type": "wave", "wave": idx, "size": len(wave),
+                        "remaining": len(remaining)})
+
+            wave_futs = []
+            for name, serial in wave:
+                if self.cancelled:
+                    break
+                rec = {"name": name, "wave": idx, "booted": False,
+                       "boot_secs": None, "error": ""}
+                per_inst[name] = rec
+                err = self._start_fn(name)
+                if err:
+                    rec["error"] = err
+                    self._emit({"type": "failed", "name": name, "error": err})
+                    continue
+                fut = waiter.watch(name, serial)
+                fut.add_done_callback(self._on_resolved(name))
+                futures[fut] = name
+                wave_futs.append(fut)
+                self._emit({"type": "started", "name": name, "wave": idx})
+
+            wave_info = {"wave": idx, "size": len(wave)}
+            waves.append(wave_info)
+            if not remaining:
+                break
+
+            self._wait_wave(wave_futs, policy)
+            sample = self._sampler()
+            new_size, reason = next_wave_size(wave_size, sample, policy)
+            wave_info.update({"sample": asdict(sample), "next_size": new_size,
+                              "reason": reason})
+            wave_size = new_size
+
+        # Wait for everything already launched (unless cancelled).  Records
+        # are filled from the futures here (done-callbacks may still be
+        # running when wait returns).
+        deadline = time.monotonic() + policy.boot_timeout
+        pending = set(futures)
+        while pending and not self.cancelled and time.monotonic() < deadline:
+            _, pending = wait(pending, timeout=min(_CANCEL_POLL, deadline - time.monotonic()))
+        if self.cancelled:
+            waiter.cancel()          # stop polling adb for the rest
+        for fut, name in futures.items():
+            rec = per_inst[name]
+            if not fut.done():
+                rec["error"] = "cancelled" if self.cancelled else "boot timeout"
+                continue
+            res = fut.result()
+            rec["booted"] = res.booted
+            rec["boot_secs"] = round(res.boot_secs, 1) if res.booted else None
+            rec["error"] = res.error
+
+        boot_times = sorted(r["boot_secs"] for r in per_inst.values() if r["boot_secs"] is not None)
+        summary = {
+            "total": len(targets),
+            "launched": len(futures),
+            "booted": len(boot_times),
+            "failed": len(per_inst) - len(boot_times),
+            "skipped": len(targets) - len(per_inst),
+            "elapsed_secs": round(time.monotonic() - t0, 1),
+            "boot_p50_secs": _percentile(boot_times, 50),
+            "boot_p95_secs": _percentile(boot_times, 95),
+            "boot_max_secs": boot_times[-1] if boot_times else None,
+        }
+        report = {
+            "policy": asdict(policy),
+            "waves": waves,
+            "instances": list(per_inst.values()),
+            "summary": summary,
+        }
+        self._emit({"type": "done", "summary": summary})
+        return report
+
+    def _on_resolved(self, name: str):
+        def _cb(fut: Future):
+            res = fut.result()
+            if res.booted:
+                self._emit({"type": "booted", "name": name,
+                            "boot_secs": round(res.boot_secs, 1)})
+            else:
+                self._emit({"type": "failed", "name": name, "error": res.error})
+        return _cb
+
+    def _wait_wave(self, futs: list[Future], policy: LaunchPolicy):
+        """Block until ready_fraction of the wave has resolved or wave_timeout."""
+        if not futs:
+            return
+        need = math.ceil(len(futs) * policy.ready_fraction)
+        deadline = time.monotonic() + policy.wave_timeout
+        pending = set(futs)
+        while len(futs) - len(pending) < need and not self.cancelled:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            _, pending = wait(pending, timeout=min(_CANCEL_POLL, remaining),
+                              return_when=FIRST_COMPLETED)
+
+
+def _percentile(sorted_vals: list[float], pct: float) -> Optional[float]:
+    if not sorted_vals:
+        return None
+    k = (len(sorted_vals) - 1) * pct / 100.0
+    lo, hi = math.floor(k), math.ceil(k)
+    return round(sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo), 1)
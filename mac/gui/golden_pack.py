@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Golden Pack — chunked, parallel-compressed golden image archive (.mgp).
+
+create_golden_image.sh used to run ``7z a -mx=5`` over a multi-GB qcow2:
+slow, effectively one core for this workload, and the archive has to be
+decompressed front to back.  A golden pack cuts the image into fixed-size
+chunks, compresses each independently in a process pool, stores all-zero
+chunks as markers only, and ends with an index of offsets and hashes:
+
+    "MGPK" 0x01 000000                     8-byte header
+    chunk 0 | chunk 1 | ...                compressed (or raw) chunk blobs
+    extra files                            golden_info.json, host/...
+    index                                  zlib-compressed JSON
+    index offset (u64) | length (u32) | "MGPK"   16-byte footer
+
+    pack("data.qcow2", "golden-a13.mgp", extras={"golden_info.json": path})
+    unpack("golden-a13.mgp", "/images/a13")          # all cores, verified
+    with PackReader("golden-a13.mgp") as r:           # random access
+        header = r.read(0, 512)
+
+Index entries per chunk are [offset, length, sha256 of the raw chunk,
+stored_raw]; a zero chunk has offset -1.  The chunk size and hashes match
+image_manifest, so unpack() also leaves data.qcow2.manifest.json and
+data.qcow2.sha256 next to the image for delta updates and the image store.
+
+Chunks are zstd-compressed when the optional ``zstandard`` package is
+installed, else zlib; the codec is recorded in the index and unpacking a
+zstd pack needs zstandard.  Unpacking uses threads (both codecs release
+the GIL) and pwrite()s each chunk at its offset of a sparse file.
+
+    python3 golden_pack.py pack data.qcow2 -o golden.mgp --add golden_info.json --add-dir host
+    python3 golden_pack.py unpack golden.mgp -C /images/a13
+    python3 golden_pack.py info golden.mgp
+
+Requires: image_manifest; zstandard (optional, preferred codec)
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+import image_manifest
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# File suffix of a golden pack
+SUFFIX = ".mgp"
+
+# Raw bytes per chunk (same as image_manifest so the hashes line up)
+CHUNK_SIZE = image_manifest.CHUNK_SIZE
+
+# Compression levels per codec
+ZSTD_LEVEL = 9
+ZLIB_LEVEL = 6
+
+# Decompressed chunks PackReader keeps for sequential reads
+READER_CACHE_CHUNKS = 4
+
+_MAGIC = b"MGPK"
+_HEADER = _MAGIC + b"\x01\x00\x00\x00"
+_FOOTER = struct.Struct("<QI4s")
+_FORMAT = "mirage-pack"
+_VERSION = 1
+
+
+class PackError(ValueError):
+    """Not a golden pack, or a corrupt one."""
+
+
+def default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+# ── Packing ──
+
+def pack(image: str, out: str, extras: Optional[dict[str, str]] = None,
+         chunk_size: int = CHUNK_SIZE, codec: Optional[str] = None,
+         level: Optional[int] = None, workers: Optional[int] = None,
+         on_progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """Write image (plus extras: {name in pack: path}) to out.
+
+    Chunks are compressed in a process pool and written in order; the
+    whole-image SHA-256 is computed alongside.  Returns a summary.
+    """
+    codec = codec or default_codec()
+    if codec == "zstd" and zstandard is None:
+        raise PackError("zstd packs need the zstandard package (pip install zstandard)")
+    if codec not in ("zstd", "zlib"):
+        raise PackError(f"unknown codec {codec!r}")
+    level = level if level is not None else (ZSTD_LEVEL if codec == "zstd" else ZLIB_LEVEL)
+    workers = workers or os.cpu_count() or 2
+    size = os.path.getsize(image)
+    count = -(-size // chunk_size)
+    whole = hashlib.sha256()
+    entries: list = [None] * count
+    tmp = out + ".tmp"
+
+    with open(tmp, "wb") as f, open(image, "rb") as raw, \
+            ProcessPoolExecutor(workers) as pool:
+        f.write(_HEADER)
+        pending: deque = deque()
+        done = 0
+
+        def _drain_one():
+            nonlocal done
+            index, digest, blob, stored_raw = pending.popleft().result()
+            raw.seek(index * chunk_size)
+            data = raw.read(chunk_size)
+            whole.update(data)
+            if blob is None:
+                entries[index] = [-1, 0, digest, False]
+            else:
+                entries[index] = [f.tell(), len(blob), digest, stored_raw]
+                f.write(blob)
+            done += len(data)
+            if on_progress is not None:
+                on_progress(done, size)
+
+        for i in range(count):
+            pending.append(pool.submit(_pack_chunk, image, i, chunk_size, codec, level))
+            while len(pending) >= 2 * workers:
+                _drain_one()
+        while pending:
+            _drain_one()
+
+        files = {}
+        for name, path in sorted((extras or {}).items()):
+            with open(path, "rb") as src:
+                data = src.read()
+            blob = _compress(data, codec, level)
+            files[name] = [f.tell(), len(blob), len(data), hashlib.sha256(data).hexdigest()]
+            f.write(blob)
+
+        index = {"format": _FORMAT, "version": _VERSION, "codec": codec, "level": level,
+                 "name": os.path.basename(image), "chunk_size": chunk_size, "size": size,
+                 "sha256": whole.hexdigest(), "chunks": entries, "files": files}
+        blob = zlib.compress(json.dumps(index, separators=(",", ":")).encode(), 9)
+        offset = f.tell()
+        f.write(blob)
+        f.write(_FOOTER.pack(offset, len(blob), _MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, out)
+    zero = sum(1 for e in entries if e[0] < 0)
+    return {"path": out, "size": size, "packed": os.path.getsize(out), "chunks": count,
+            "zero_chunks": zero, "codec": codec, "sha256": index["sha256"]}
+
+
+def _pack_chunk(image: str, index: int, chunk_size: int, codec: str, level: int):
+    """Process-pool worker: (index, sha256, blob or None for zeros, stored_raw)."""
+    with open(image, "rb") as f:
+        f.seek(index * chunk_size)
+        data = f.read(chunk_size)
+    digest = hashlib.sha256(data).hexdigest()
+    if data == bytes(len(data)):
+        return index, digest, None, False
+    blob = _compress(data, codec, level)
+    if len(blob) >= len(data):
+        return index, digest, data, True
+    return index, digest, blob, False
+
+
+_zstd_local = threading.local()
+
+
+def _compress(data: bytes, codec: str, level: int) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(data, level)
+    cctx = getattr(_zstd_local, "c", None)
+    if cctx is None or getattr(_zstd_local, "level", None) != level:
+        cctx = _zstd_local.c = zstandard.ZstdCompressor(level=level)
+        _zstd_local.level = level
+    return cctx.compress(data)
+
+
+def _decompress(blob: bytes, codec: str, raw_size: int) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(blob)
+    dctx = getattr(_zstd_local, "d", None)
+    if dctx is None:
+        dctx = _zstd_local.d = zstandard.ZstdDecompressor()
+    return dctx.decompress(blob, max_output_size=raw_size)
+
+
+# ── Reading ──
+
+class PackReader:
+    """Random access to a golden pack: read(offset, n) decompresses only
+    the chunks it touches."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = os.open(path, os.O_RDONLY)
+        try:
+            self.index = _read_index(self._fd)
+        except Exception:
+            os.close(self._fd)
+            raise
+        self.codec = self.index["codec"]
+        if self.codec == "zstd" and zstandard is None:
+            os.close(self._fd)
+            raise PackError("this pack is zstd-compressed; install the zstandard package")
+        self.size: int = self.index["size"]
+        self.chunk_size: int = self.index["chunk_size"]
+        self._cache: OrderedDict[int, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    @property
+    def chunk_count(self) -> int:
+        return len(self.index["chunks"])
+
+    def chunk(self, i: int, verify: bool = True) -> bytes:
+        """Raw bytes of chunk i (PackError if its hash doesn't match)."""
+        offset, length, digest, stored_raw = self.index["chunks"][i]
+        raw_size = min(self.chunk_size, self.size - i * self.chunk_size)
+        if offset < 0:
+            return bytes(raw_size)
+        blob = os.pread(self._fd, length, offset)
+        if len(blob) != length:
+            raise PackError(f"chunk {i} is truncated")
+        try:
+            data = blob if stored_raw else _decompress(blob, self.codec, raw_size)
+        except Exception as e:
+            raise PackError(f"chunk {i} doesn't decompress: {e}") from e
+        if len(data) != raw_size or (verify and hashlib.sha256(data).hexdigest() != digest):
+            raise PackError(f"chunk {i} is corrupt")
+        return data
+
+    def read(self, offset: int, n: int) -> bytes:
+        """Image bytes [offset, offset + n)."""
+        end = min(self.size, offset + n)
+        out = []
+        while offset < end:
+            i, skip = divmod(offset, self.chunk_size)
+            data = self._cached_chunk(i)
+            piece = data[skip:skip + (end - offset)]
+            out.append(piece)
+            offset += len(piece)
+        return b"".join(out)
+
+    def files(self) -> list[str]:
+        return sorted(self.index["files"])
+
+    def read_file(self, name: str) -> bytes:
+        offset, length, raw_size, digest = self.index["files"][name]
+        data = _decompress(os.pread(self._fd, length, offset), self.codec, raw_size)
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise PackError(f"{name} is corrupt")
+        return data
+
+    def manifest(self) -> image_manifest.Manifest:
+        """The image's chunk manifest, straight from the index."""
+        return image_manifest.Manifest(chunk_size=self.chunk_size, size=self.size,
+                                       chunks=[e[2] for e in self.index["chunks"]],
+                                       sha256=self.index.get("sha256"))
+
+    def _cached_chunk(self, i: int) -> bytes:
+        with self._lock:
+            if i in self._cache:
+                self._cache.move_to_end(i)
+                return self._cache[i]
+        data = self.chunk(i)
+        with self._lock:
+            self._cache[i] = data
+            while len(self._cache) > READER_CACHE_CHUNKS:
+                self._cache.popitem(last=False)
+        return data
+
+
+def _read_index(fd: int) -> dict:
+    end = os.fstat(fd).st_size
+    if end < len(_HEADER) + _FOOTER.size or os.pread(fd, 4, 0) != _MAGIC:
+        raise PackError("not a golden pack")
+    offset, length, magic = _FOOTER.unpack(os.pread(fd, _FOOTER.size, end - _FOOTER.size))
+    if magic != _MAGIC or offset + length > end - _FOOTER.size:
+        raise PackError("golden pack is truncated (no index)")
+    try:
+        index = json.loads(zlib.decompress(os.pread(fd, length, offset)))
+    except (zlib.error, ValueError) as e:
+        raise PackError(f"golden pack index is corrupt: {e}") from e
+    if index.get("format") != _FORMAT or index.get("version") != _VERSION:
+        raise PackError(f"unsupported golden pack version {index.get('version')}")
+    name = index.get("name")
+    if not isinstance(name, str) or name in ("", ".", "..") or name != os.path.basename(name):
+        raise PackError(f"golden pack names its image {name!r}, not a plain file name")
+    return index
+
+
+# ── Unpacking ──
+
+def unpack(path: str, dest_dir: str, workers: Optional[int] = None,
+           on_progress: Optional[Callable[[int, int], None]] = None,
+           cancelled: Optional[Callable[[], bool]] = None,
+           image_name: Optional[str] = None,
+           expected_sha256: Optional[str] = None) -> dict:
+    """Extract the image and extra files of a pack into dest_dir.
+
+    Chunks are decompressed, verified and written in parallel while the
+    whole image is hashed in order; the image only appears under its final
+    name once every chunk checked out and that hash matches the index (and
+    expected_sha256, when set).  image_name, when set, is the name the
+    pack's image must have.
+    """
+    cancelled = cancelled or (lambda: False)
+    workers = workers or os.cpu_count() or 2
+    with PackReader(path) as reader:
+        index = reader.index
+        if image_name is not None and index["name"] != image_name:
+            raise PackError(f"golden pack holds {index['name']!r}, expected {image_name!r}")
+        os.makedirs(dest_dir, exist_ok=True)
+        image = os.path.join(dest_dir, index["name"])
+        part = image + ".part"
+        done = 0
+        lock = threading.Lock()
+        stop = threading.Event()
+        digest = hashlib.sha256()
+
+        with open(part, "wb") as f:
+            f.truncate(reader.size)             # zero chunks stay holes
+            fd = f.fileno()
+
+            def _one(i):
+                nonlocal done
+                if stop.is_set():
+                    return
+                if cancelled():
+                    stop.set()
+                    raise InterruptedError("cancelled")
+                data = reader.chunk(i)
+                if index["chunks"][i][0] >= 0:
+                    os.pwrite(fd, data, i * reader.chunk_size)
+                with lock:
+                    done += len(data)
+                    if on_progress is not None:
+                        on_progress(done, reader.size)
+                return data
+
+            try:
+                with ThreadPoolExecutor(workers, thread_name_prefix="unpack") as pool:
+                    # A bounded window of chunks in flight, hashed in image order
+                    pending: deque = deque()
+
+                    def _drain(keep):
+                        while len(pending) > keep:
+                            data = pending.popleft().result()
+                            if data is not None:        # None: skipped, the failure follows
+                                digest.update(data)
+
+                    try:
+                        for i in range(reader.chunk_count):
+                            pending.append(pool.submit(_one, i))
+                            _drain(2 * workers)
+                        _drain(0)
+                    except BaseException:
+                        stop.set()
+                        raise
+                sha = digest.hexdigest()
+                for want in (index.get("sha256"), expected_sha256):
+                    if want and sha != want.lower():
+                        raise PackError(f"SHA-256 mismatch: got {sha}, expected {want.lower()}")
+                os.fsync(fd)
+            except BaseException:
+                f.close()
+                _remove(part)
+                raise
+        os.replace(part, image)
+
+        root = os.path.abspath(dest_dir)
+        for name in reader.files():
+            target = os.path.abspath(os.path.join(root, name))
+            if not target.startswith(root + os.sep):
+                raise PackError(f"refusing to extract outside {dest_dir}: {name}")
+            if target == os.path.abspath(image):
+                raise PackError(f"extra file {name} would replace the image")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target + ".part", "wb") as out:
+                out.write(reader.read_file(name))
+            os.replace(target + ".part", target)   # never through an existing (linked) file
+
+        try:
+            reader.manifest().save(image + image_manifest.SUFFIX)
+            with open(image + ".sha256", "w") as out:
+                out.write(f"{sha}  {os.path.basename(image)}\n")
+        except OSError:
+            pass
+    return {"path": image, "size": index["size"], "sha256": sha,
+            "files": sorted(index["files"])}
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# ── CLI ──
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack / unpack golden image archives (.mgp).")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("pack", help="pack an image")
+    p.add_argument("image")
+    p.add_argument("-o", "--output", required=True)
+    p.add_argument("--add", action="append", default=[], metavar="FILE",
+                   help="extra file, stored under its base name")
+    p.add_argument("--add-dir", action="append", default=[], metavar="DIR",
+                   help="extra directory, stored as DIR-name/...")
+    p.add_argument("--codec", choices=("zstd", "zlib"), default=None)
+    p.add_argument("--level", type=int, default=None)
+    p.add_argument("--workers", type=int, default=None)
+    u = sub.add_parser("unpack", help="unpack a pack")
+    u.add_argument("pack")
+    u.add_argument("-C", "--directory", default=".")
+    u.add_argument("--workers", type=int, default=None)
+    i = sub.add_parser("info", help="show a pack's index summary")
+    i.add_argument("pack")
+    args = parser.parse_args()
+
+    if args.cmd == "pack":
+        extras = {os.path.basename(p): p for p in args.add}
+        for d in args.add_dir:
+            root = os.path.basename(os.path.normpath(d))
+            for dirpath, _, names in os.walk(d):
+                for name in names:
+                    full = os.path.join(dirpath, name)
+                    extras[os.path.join(root, os.path.relpath(full, d))] = full
+        last = [-1]
+
+        def _progress(done, total):
+            pct = done * 100 // max(total, 1)
+            if pct != last[0]:
+                last[0] = pct
+                print(f"\r  {pct}%", end="", flush=True)
+        res = pack(args.image, args.output, extras, codec=args.codec, level=args.level,
+                   workers=args.workers, on_progress=_progress)
+        print(f"\r{res['path']}: {res['size'] // 1048576} MB -> {res['packed'] // 1048576} MB "
+              f"({res['codec']}, {res['chunks']} chunks, {res['zero_chunks']} zero)")
+    elif args.cmd == "unpack":
+        res = unpack(args.pack, args.directory, workers=args.workers)
+        print(f"{res['path']}: {res['size'] // 1048576} MB, sha256 {res['sha256']}")
+        for name in res["files"]:
+            print(f"  {name}")
+    else:
+        with PackReader(args.pack) as r:
+            ix = r.index
+            zero = sum(1 for e in ix["chunks"] if e[0] < 0)
+            print(f"{ix['name']}: {ix['size']} bytes, {len(ix['chunks'])} chunks of "
+                  f"{ix['chunk_size'] // 1048576} MB ({zero} zero), codec {ix['codec']}")
+            print(f"sha256 {ix['sha256']}")
+            for name in r.files():
+                print(f"  {name}")
+
+
+if __name__ == "__main__":
+    main()
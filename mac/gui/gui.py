@@ -9,13 +9,18 @@ pywebview's js_api bridge.
 
 Run directly:  python gui.py
 With debug:    python gui.py --debug
+Headless:      python gui.py --daemon [unix:/path | tcp:127.0.0.1:PORT]
+Attach GUI:    python gui.py --attach [address]
 Or via the launcher:  ./jorkSpoofer.command
 
-Requires: pip install pywebview
+Requires: pip install pywebview (not needed for --daemon)
 """
 
 import argparse
+import atexit
+import concurrent.futures
 import contextlib
+import importlib.util
 import json
 import os
 import re
@@ -24,9 +29,17 @@ import shutil
 import subprocess
 import sys
 import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
 from pathlib import Path
 
-import webview
+_STARTUP_T0 = time.perf_counter()   # origin of the --debug startup report
+
+try:
+    import webview
+except ImportError:
+    webview = None  # headless --daemon mode only
 
 # ─── Path resolution (supports both dev and PyInstaller frozen .app) ──────────
 # BUNDLE_DIR = read-only assets (HTML, APKs, shell scripts, bin/)
@@ -50,12 +63,73 @@ SCRIPT_DIR = BUNDLE_DIR
 if SCRIPT_DIR not in sys.path:
     sys.path.insert(0, SCRIPT_DIR)
 
+
+class _LazyModule:
+    """Stands in for a module until its first attribute access, then imports
+    it.  Jobs touch these from several threads at once, and LazyLoader's
+    first-access path isn't thread-safe before Python 3.12, so the import
+    runs under a lock instead."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+                module = self._module
+        return getattr(module, attr)
+
+
+def _lazy_module(name):
+    """Import name on first attribute access instead of now (keeps cold start short)."""
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ImportError(f"No module named {name!r}")
+    return _LazyModule(name)
+
+
+import bandwidth
+import batch_planner
 import clone_instance
-import randomize_instances
-import vpn_manager
+import decompress_stream
+import delta_update
+import downloader
+import fleet_fanout
+import golden_pack
+import image_manifest
+import image_store
+import instance_telemetry
+import log_store
+import op_journal
+import progress_reporter
+import qcow2_info
+import rpc_daemon
+import scheduler
+import settings_store
+import snapshot_diff
+
+# ADB probing, boot waiting and the VPN stack aren't needed to paint the
+# window.  Everything that imports randomize_instances at module level is
+# deferred too, or importing it would load randomize_instances right away.
+randomize_instances = _lazy_module("randomize_instances")
+boot_waiter = _lazy_module("boot_waiter")
+bulk_stop = _lazy_module("bulk_stop")
+fleet_launcher = _lazy_module("fleet_launcher")
+vpn_manager = _lazy_module("vpn_manager")
 
 APP_TITLE = "Luke's Mirage | Instance Manager"
 SETTINGS_FILE = os.path.join(DATA_DIR, ".jorkspoofer_gui.json")
+DAEMON_SOCKET = os.path.join(DATA_DIR, "mirage.sock")
+JOURNAL_FILE = os.path.join(DATA_DIR, "op_journal.jsonl")
+LOG_DIR = os.path.join(DATA_DIR, "logs")
+INSTANCE_CACHE_FILE = os.path.join(DATA_DIR, "instances_cache.json")
+BASE_IMAGE_FILE = os.path.join(DATA_DIR, "base-image.qcow2")
 
 DEBUG = False
 
@@ -263,80 +337,612 @@ def dbg(msg):
         print(f"[DBG] {msg}", file=sys.__stderr__, flush=True)
 
 
+# ─── Staged startup ──────────────────────────────────────────────────────────
+# The window opens first; host setup (promo_guard deploy, launchctl, ad
+# patch) runs on a background thread and the page paints the cached
+# instance list before the first ADB scan.  Each stage is marked so
+# --debug can print where cold-start time went.
+
+class StartupTimer:
+    """Startup phase marks, relative to process start; report under --debug."""
+
+    def __init__(self, t0):
+        self._t0 = t0
+        self._marks = []            # (phase, at_secs, took_secs)
+        self._last = t0
+        self._reported = False
+        self._lock = threading.Lock()
+
+    def mark(self, phase, since=None):
+        """Record phase as done now. since: its own start (background or
+        on-demand phases); otherwise it took the time since the last mark."""
+        now = time.perf_counter()
+        with self._lock:
+            took = now - (since if since is not None else self._last)
+            if since is None:
+                self._last = now
+            self._marks.append((phase, now - self._t0, took))
+
+    def timings(self):
+        with self._lock:
+            return [{"phase": p, "at_secs": round(at, 3), "took_secs": round(took, 3)}
+                    for p, at, took in self._marks]
+
+    def report(self):
+        """Print the timing table once (debug mode only)."""
+        with self._lock:
+            if self._reported or not DEBUG:
+                return
+            self._reported = True
+            marks = sorted(self._marks, key=lambda m: m[1])
+        lines = ["=== Startup timing (seconds since launch) ==="]
+        lines += [f"  {at:7.3f}  {took:+7.3f}  {phase}" for phase, at, took in marks]
+        print("\n".join(lines), file=sys.__stderr__, flush=True)
+
+
+_startup = StartupTimer(_STARTUP_T0)
+_startup.mark("imports")
+
+# Cleared while host setup runs in the background; code that reads or
+# rewrites bluestacks.conf waits for it so it never sees a half-written file
+_host_ready = threading.Event()
+_host_ready.set()
+
+
+def run_host_setup():
+    """Deploy promo_guard + loading screen and patch host ad settings."""
+    t0 = time.perf_counter()
+    try:
+        # Fallback for the pkg postinstall
+        setup_promo_guard()
+        # Suppress BlueStacks ads at the host level (bluestacks.conf)
+        disable_host_ads()
+    finally:
+        _startup.mark("host_setup", since=t0)
+        _host_ready.set()
+
+
+def start_host_setup():
+    """run_host_setup() on a daemon thread; returns immediately."""
+    _host_ready.clear()
+    threading.Thread(target=run_host_setup, daemon=True, name="host-setup").start()
+
+
+def wait_host_setup(timeout=30):
+    return _host_ready.wait(timeout)
+
+
+# ─── Last-known instance list ────────────────────────────────────────────────
+
+def load_instance_cache(engine_dir):
+    """(instances, saved_at) from the last ADB scan of engine_dir, or ([], None)."""
+    try:
+        with open(INSTANCE_CACHE_FILE, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return [], None
+    if data.get("engine_dir") != engine_dir or not isinstance(data.get("instances"), list):
+        return [], None
+    return data["instances"], data.get("saved")
+
+
+def save_instance_cache(engine_dir, instances):
+    tmp = INSTANCE_CACHE_FILE + ".tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump({"engine_dir": engine_dir, "saved": time.time(), "instances": instances}, f)
+        os.replace(tmp, INSTANCE_CACHE_FILE)
+    except OSError:
+        pass
+
+
 # ─── Stdout capture for log forwarding ───────────────────────────────────────
 
 class LogCapture:
-    """Captures stdout/stderr writes and forwards them to the webview log panel."""
+    """Captures stdout/stderr writes and forwards them to the webview log panel.
+
+    Lines go into a bounded ring buffer; a flusher thread hands whatever has
+    accumulated, at most FLUSH_HZ times a second, to sink(batch) as one
+    list (the event bus delivers it to window.appendLogBatch).
+    Carriage-return progress updates collapse in the buffer so only the
+    latest state of a progress line is sent.  Each entry carries the
+    operation journal ID of the job whose thread wrote it.  Every writer
+    (key: a job, or a thread) has its own partial line, so half-lines of
+    concurrent jobs don't interleave.
+    """
 
-    def __init__(self, window_ref):
-        self._window_ref = window_ref
-        self._buf = ""
+    FLUSH_HZ = 20
+    MAX_PENDING = 2000      # lines held between flushes; oldest dropped beyond
+
+    def __init__(self, sink):
+        self._sink = sink
+        self._writers = {}          # key -> _LineState of that writer
+        self._line = None           # _LineState of the writer being handled
+        self._pending = deque(maxlen=self.MAX_PENDING)   # [kind, text, op_id]; "a"ppend / "r"eplace
+        self._op_id = ""            # journal op of the thread currently writing
+        self._dropped_unsent = 0
         self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.counters = {"lines": 0, "sent": 0, "batches": 0, "coalesced": 0, "dropped": 0}
 
-    def write(self, s):
+    def write(self, s, key=None):
+        """Buffer s from writer key (default: the calling thread)."""
         if not s:
             return
+        op = op_journal.current()
+        key = threading.get_ident() if key is None else key
         with self._lock:
-            self._buf += s
-        # Flush complete lines
-        while "\n" in self._buf:
-            line, self._buf = self._buf.split("\n", 1)
-            self._push_line(line)
-        # Handle carriage returns (progress bars)
-        while "\r" in self._buf:
-            parts = self._buf.split("\r")
-            if len(parts) > 1:
-                # Take the last part after \r as the current line
-                self._buf = parts[-1]
-                self._push_line(parts[-2], cr=True)
-                break
+            self._op_id = op.id if op else ""
+            line = self._line = self._writers.setdefault(key, _LineState())
+            lines = (line.partial + s).split("\n")
+            line.partial = lines.pop()
+            for text in lines:
+                self._take_line(text)
+            if "\r" in line.partial:
+                segs = line.partial.split("\r")
+                line.partial = segs.pop()
+                first = True
+                for seg in segs:
+                    if first and not line.cr_tail and seg:
+                        self._append(seg)       # text before the first \r is a normal line
+                    elif seg:
+                        self._progress(seg)
+                    first = False
+                line.cr_tail = True
+            self._ensure_flusher()
+        self._wake.set()
 
     def flush(self):
+        # print(..., flush=True) lands here mid-line; the flusher sends on its own clock
+        self._wake.set()
+
+    def drain(self, key=None):
+        """Commit writer key's partial line (every writer's when None),
+        forget it, and send everything now (end of a job)."""
+        with self._lock:
+            keys = list(self._writers) if key is None else [key]
+            for k in keys:
+                line = self._writers.pop(k, None)
+                if line is not None and line.partial:
+                    self._line = line
+                    self._take_line(line.partial)
+        self._send()
+
+    def stats(self):
         with self._lock:
-            if self._buf:
-                self._push_line(self._buf)
-                self._buf = ""
+            return dict(self.counters, pending=len(self._pending))
 
-    def _push_line(self, line, cr=False):
-        if not line:
+    # ── Buffering (lock held) ──
+
+    def _take_line(self, text):
+        line = self._line
+        segs = [seg for seg in text.split("\r") if seg]
+        if not segs:
+            line.cr_tail = False
+            line.live = None
             return
+        if line.cr_tail or len(segs) > 1:
+            if not line.cr_tail and not text.startswith("\r"):
+                self._append(segs.pop(0))
+            self.counters["coalesced"] += max(0, len(segs) - 1)
+            if segs:
+                self._progress(segs[-1])
+        else:
+            self._append(segs[0])
+        line.cr_tail = False
+        line.live = None
+
+    def _append(self, text, kind="a"):
+        if len(self._pending) == self._pending.maxlen:
+            self.counters["dropped"] += 1
+            self._dropped_unsent += 1
+        entry = [kind, text, self._op_id]
+        self._pending.append(entry)
+        self.counters["lines"] += 1
+        self._line.live = None
+        return entry
+
+    def _progress(self, text):
+        line = self._line
+        if line.live is not None and self._pending and self._pending[-1] is line.live:
+            line.live[1] = text
+            self.counters["coalesced"] += 1
+        else:
+            kind = "a" if line.live is None else "r"
+            line.live = self._append(text, kind)
+
+    # ── Flushing ──
+
+    def _ensure_flusher(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._flush_loop, daemon=True, name="log-flush")
+            self._thread.start()
+
+    def _flush_loop(self):
+        interval = 1.0 / self.FLUSH_HZ
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            self._send()
+            time.sleep(interval)
+
+    def _send(self):
+        with self._lock:
+            if not self._pending:
+                return
+            batch = list(self._pending)
+            self._pending.clear()
+            if self._dropped_unsent:
+                batch.insert(0, ["a", f"[skip] … {self._dropped_unsent} log line(s) dropped (output too fast)"])
+                self._dropped_unsent = 0
+            # A progress line stays live across flushes; later updates "r"eplace it
+            self.counters["sent"] += len(batch)
+            self.counters["batches"] += 1
+        try:
+            self._sink(batch)
+        except Exception:
+            pass
+
+
+class _LineState:
+    """Partial-line state of one LogCapture writer."""
+    __slots__ = ("partial", "cr_tail", "live")
+
+    def __init__(self):
+        self.partial = ""           # incomplete last line
+        self.cr_tail = False        # partial follows a \r (progress update)
+        self.live = None            # entry of the progress line being updated
+
+
+class _JobStreams:
+    """Routes sys.stdout / sys.stderr to the log capture per thread.
+
+    Installed once.  (contextlib.redirect_stdout swaps the process-wide
+    stream, and overlapping jobs would restore it out of order.)  A job's
+    own thread writes under the job's key; threads it starts (pools,
+    fan-outs) write under their own while any job runs; otherwise output
+    goes to the original stream.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._capture = None
+        self._jobs = 0
+
+    def install(self, capture):
+        with self._lock:
+            if self._capture is None:
+                sys.stdout = _RoutedStream(self, sys.stdout)
+                sys.stderr = _RoutedStream(self, sys.stderr)
+            self._capture = capture
+
+    @contextlib.contextmanager
+    def job(self):
+        """Route the calling thread's output to the capture under a fresh key."""
+        key = self._local.key = object()
+        with self._lock:
+            self._jobs += 1
+        try:
+            yield key
+        finally:
+            self._local.key = None
+            with self._lock:
+                self._jobs -= 1
+                idle = self._jobs == 0
+            self._capture.drain(None if idle else key)
+
+    def key(self):
+        """Writer key of the calling thread, or None: not captured."""
+        key = getattr(self._local, "key", None)
+        if key is not None:
+            return key
+        return threading.get_ident() if self._jobs and self._capture else None
+
+    def write(self, stream, s):
+        key = self.key()
+        if key is None:
+            return stream.write(s) if stream is not None else len(s)
+        self._capture.write(s, key)
+        return len(s)
+
+
+class _RoutedStream:
+    """sys.stdout / sys.stderr stand-in for _JobStreams."""
+
+    def __init__(self, router, stream):
+        self._router = router
+        self._stream = stream
+
+    def write(self, s):
+        return self._router.write(self._stream, s)
+
+    def flush(self):
+        if self._router.key() is not None:
+            self._router._capture.flush()
+        elif self._stream is not None:
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+_job_streams = _JobStreams()
+
+
+# ─── Event bus (backend → UI pushes) ─────────────────────────────────────────
+
+@dataclass(frozen=True)
+class EventTopic:
+    """One kind of push. Delivered as window[handler](...args)."""
+    handler: str
+    coalesce: bool = False   # only the latest event per key survives a frame
+    replay: int = 0          # kept for page reloads: latest per key when
+                             # coalescing, else the most recent N events
+
+
+EVENT_TOPICS = {
+    "log":              EventTopic("appendLogBatch", replay=200),
+    "job_queue":        EventTopic("onJobQueue", coalesce=True, replay=1),
+    "operation_done":   EventTopic("onOperationDone"),
+    "download":         EventTopic("onDownloadProgress", coalesce=True, replay=1),
+    "bs_install":       EventTopic("_onBsInstallProgress", coalesce=True, replay=1),
+    "rand_progress":    EventTopic("onRandProgress", coalesce=True, replay=2000),
+    "rand_done":        EventTopic("onRandInstanceDone", coalesce=True, replay=500),
+    "rand_results":     EventTopic("onRandResults"),
+    "fleet_launch":     EventTopic("onFleetLaunch"),
+    "telemetry":        EventTopic("onTelemetry", coalesce=True, replay=1),
+    "vpn_status":       EventTopic("onVpnStatus", coalesce=True, replay=500),
+}
+
+# Replay state that goes stale when an operation finishes: a reloaded page
+# shouldn't redraw a finished run's progress, or the VPN state of instances
+# that were rebooted or deleted (the VPN poller reports fresh state).
+STALE_AFTER_OPERATION = {
+    "download":  ("download",),
+    "randomize": ("rand_progress", "rand_done", "vpn_status"),
+    "delete":    ("vpn_status",),
+}
+
+
+class EventBus:
+    """Single channel for every backend → UI push.
+
+    emit() queues an event; a flusher thread delivers everything queued, at
+    most FLUSH_HZ times a second, in ONE evaluate_js call to the JS
+    dispatcher window.onBusEvents([[handler, args], ...]).  Coalescing topics
+    keep one queued event per key (the newest args, at the position of the
+    first).  A replay buffer keeps recent state so a reloaded page can catch
+    up via replay() without re-running backend scans.
+    """
+
+    FLUSH_HZ = 20
+
+    def __init__(self, window_ref, topics=None):
+        self._window_ref = window_ref
+        self._topics = topics or EVENT_TOPICS
+        self._lock = threading.Lock()
+        self._pending = []            # [topic, key, args]
+        self._queued = {}             # (topic, key) -> pending entry, coalescing topics
+        self._latest = {}             # topic -> OrderedDict(key -> (seq, args))
+        self._recent = {}             # topic -> deque((seq, args))
+        self._seq = 0
+        self._wake = threading.Event()
+        self._thread = None
+        self.counters = {"emitted": 0, "coalesced": 0, "delivered": 0, "frames": 0}
+
+    def emit(self, topic, *args, key=None):
+        t = self._topics[topic]       # unknown topic is a programming error
+        with self._lock:
+            self._seq += 1
+            self.counters["emitted"] += 1
+            if t.coalesce:
+                entry = self._queued.get((topic, key))
+                if entry is not None:
+                    entry[2] = args
+                    self.counters["coalesced"] += 1
+                else:
+                    entry = [topic, key, args]
+                    self._pending.append(entry)
+                    self._queued[(topic, key)] = entry
+                if t.replay:
+                    latest = self._latest.setdefault(topic, OrderedDict())
+                    latest.pop(key, None)
+                    latest[key] = (self._seq, args)
+                    while len(latest) > t.replay:
+                        latest.popitem(last=False)
+            else:
+                self._pending.append([topic, key, args])
+                if t.replay:
+                    recent = self._recent.get(topic)
+                    if recent is None:
+                        recent = self._recent[topic] = deque(maxlen=t.replay)
+                    recent.append((self._seq, args))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True, name="event-bus")
+                self._thread.start()
+        self._wake.set()
+
+    def forget(self, topic, key=None):
+        """Drop replay state for a topic (or one key of it) once it's stale."""
+        with self._lock:
+            if key is None:
+                self._latest.pop(topic, None)
+                self._recent.pop(topic, None)
+            else:
+                self._latest.get(topic, {}).pop(key, None)
+
+    def replay(self):
+        """Buffered events, oldest first, in dispatcher format."""
+        with self._lock:
+            items = []
+            for topic, latest in self._latest.items():
+                items.extend((seq, topic, args) for seq, args in latest.values())
+            for topic, recent in self._recent.items():
+                items.extend((seq, topic, args) for seq, args in recent)
+        items.sort(key=lambda it: it[0])
+        return [[self._topics[topic].handler, list(args)] for _, topic, args in items]
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, pending=len(self._pending))
+
+    def _loop(self):
+        interval = 1.0 / self.FLUSH_HZ
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            self._deliver()
+            time.sleep(interval)
+
+    def _deliver(self):
+        with self._lock:
+            if not self._pending:
+                return
+            batch = [[self._topics[topic].handler, list(args)] for topic, _, args in self._pending]
+            self._pending = []
+            self._queued = {}
+            self.counters["delivered"] += len(batch)
+            self.counters["frames"] += 1
         w = self._window_ref()
         if w is None:
             return
-        # Safely encode for JS using json.dumps (handles all edge cases)
-        safe = json.dumps(line)
         try:
-            if cr:
-                w.evaluate_js(f"if(window.replaceLine)window.replaceLine({safe})")
-            else:
-                w.evaluate_js(f"if(window.appendLog)window.appendLog({safe})")
+            w.evaluate_js(f"if(window.onBusEvents)window.onBusEvents({json.dumps(batch)})")
         except Exception:
             pass
 
 
 # ─── Settings persistence ────────────────────────────────────────────────────
+# Loaded once and held in memory; changes are written behind, atomically.
+# The VPN proxy pool and assignments live in their own files so that
+# saving them doesn't rewrite the small settings and vice versa.
 
-_settings_lock = threading.Lock()
+_settings = settings_store.SettingsStore(
+    SETTINGS_FILE, split=("vpn_proxy_pool", "vpn_assignments"))
+atexit.register(_settings.close)    # backstop; main() and run_daemon() close it too
 
 
-def load_settings():
-    with _settings_lock:
-        try:
-            with open(SETTINGS_FILE, "r") as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
+# ─── Source image store ──────────────────────────────────────────────────────
+# One content-addressed store per images dir; version directories and the
+# base-image file are refs into it (hard links to one blob per image).
 
+_image_stores: dict = {}
+_image_stores_lock = threading.Lock()
 
-def save_settings(data):
-    with _settings_lock:
-        try:
-            with open(SETTINGS_FILE, "w") as f:
-                json.dump(data, f, indent=2)
-                f.flush()
-                os.fsync(f.fileno())
-        except OSError:
-            pass
+# (path, size, mtime_ns, inode) -> VerifyResult dict of verify_image_file()
+_verify_results: dict = {}
+_verify_lock = threading.Lock()
+
+# (path, size, mtime_ns, inode) -> qcow2_summary() dict
+_qcow2_summaries: dict = {}
+_qcow2_lock = threading.Lock()
+
+
+def images_dir_setting():
+    return _settings.get("images_dir", os.path.join(DATA_DIR, "images"))
+
+
+def get_image_store(images_dir=None):
+    """The ImageStore for images_dir (default: the configured one)."""
+    images_dir = images_dir or images_dir_setting()
+    with _image_stores_lock:
+        store = _image_stores.get(images_dir)
+        if store is None:
+            store = image_store.ImageStore(images_dir)
+            store.track("base-image", BASE_IMAGE_FILE)
+            _image_stores[images_dir] = store
+        return store
+
+
+def verify_image_file(path, run=True, cancelled=None):
+    """Chunk-verify a disk image against the manifest saved next to it.
+
+    Results are kept until the file changes.  Returns the VerifyResult as
+    a dict, or None when there is no manifest at least as new as the image
+    (or, with run False, when it hasn't been verified since it changed).
+    Hashing a multi-GB image takes seconds: only jobs should pass run=True.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (str(path), st.st_size, st.st_mtime_ns, st.st_ino)
+    with _verify_lock:
+        if key in _verify_results:
+            return _verify_results[key]
+    if not run:
+        return None
+    manifest = image_manifest.sidecar(str(path))
+    if manifest is None:
+        return None
+    res = image_manifest.verify(str(path), manifest, cancelled=cancelled).to_dict()
+    with _verify_lock:
+        _verify_results[key] = res
+    return res
+
+
+def qcow2_summary(path):
+    """Disk metadata for the UI from the qcow2 header and tables (no data
+    is read; kept until the file changes).  None if path doesn't exist,
+    {"error": ...} if it isn't a readable qcow2."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    key = (str(path), st.st_size, st.st_mtime_ns, st.st_ino)
+    with _qcow2_lock:
+        if key in _qcow2_summaries:
+            return _qcow2_summaries[key]
+    try:
+        info = qcow2_info.read_info(str(path), refcounts=False)
+        res = {"error": None, "virtual_size": info.virtual_size,
+               "allocated_bytes": info.allocated_bytes, "file_size": info.file_size,
+               "backing_file": info.backing_file, "snapshots": len(info.snapshots),
+               "dirty": info.dirty, "corrupt": info.corrupt,
+               "fragmentation": info.fragmentation, "problems": info.problems,
+               "summary": info.describe()}
+    except (OSError, ValueError) as e:
+        res = {"error": str(e)}
+    with _qcow2_lock:
+        if len(_qcow2_summaries) > 256:
+            _qcow2_summaries.clear()
+        _qcow2_summaries[key] = res
+    return res
+
+
+def _card_disk(summary):
+    """The few qcow2 fields an instance card shows (stable between refreshes
+    of a running instance except for the allocation)."""
+    if not summary:
+        return None
+    if summary.get("error"):
+        return {"error": summary["error"]}
+    return {"virtual_gb": round(summary["virtual_size"] / 1024 ** 3, 1),
+            "allocated_gb": round(summary["allocated_bytes"] / 1024 ** 3, 1),
+            "snapshots": summary["snapshots"], "corrupt": summary["corrupt"],
+            "fragmentation": summary["fragmentation"]}
+
+
+def _download_limit_kwargs(saved):
+    """Shaper.configure() arguments from the download_limit setting."""
+    return {"rate": float(saved.get("rate_mbps", 0) or 0) * 1048576,
+            "adaptive": bool(saved.get("adaptive", False)),
+            "background": bool(saved.get("background", True))}
+
+
+def _download_limit_dict(settings):
+    return {"rate_mbps": round(settings["rate"] / 1048576, 2),
+            "adaptive": settings["adaptive"], "background": settings["background"]}
+
+
+def _print_mirrors(stats, configured):
+    """Log the mirrors a download will use, fastest first."""
+    print(f"Mirrors: {len(stats)} of {configured} reachable")
+    for m in stats:
+        rate = f"{m['throughput'] / 1048576:.1f} MB/s" if m["throughput"] else "?"
+        print(f"  {m['url']} — {m['latency_ms']} ms, {rate}")
 
 
 # ─── Engine directory detection (Mac) ────────────────────────────────────────
@@ -409,26 +1015,163 @@ class Api:
 
     def __init__(self):
         self._window = None
-        self._running = False
-        self._running_lock = threading.Lock()
         self._vpn_manager = None  # Lazy-initialized VPNManager
+        self._last_fleet_report = None
+        self._telemetry = None  # Lazy-initialized TelemetrySampler
+        self._log_capture = None  # Shared by every job; created on first use
+        self._bus = EventBus(lambda: self._window)
+        self._logs = log_store.LogStore(LOG_DIR)   # on-disk copy of the log panel
+        atexit.register(self._logs.close)
+        self._instances_diff = snapshot_diff.SnapshotDiffer()  # last list sent to the UI
+        self._shaper = bandwidth.shared()     # every image download draws from it
+        self._shaper.configure(**_download_limit_kwargs(_settings.get("download_limit", {})))
+        self._journal = op_journal.Journal(JOURNAL_FILE)
+        # Jobs declare the resources they touch; non-conflicting jobs run
+        # concurrently, conflicting ones wait in the queue
+        self._scheduler = scheduler.Scheduler(
+            spawn=self._run_with_log,
+            on_change=self._job_queue_callback,
+        )
 
     def set_window(self, window):
         self._window = window
 
-    def _acquire_running(self):
-        """Thread-safe check-and-set for _running flag. Returns True if acquired."""
-        with self._running_lock:
-            if self._running:
-                return False
-            self._running = True
-            return True
+    def _submit_job(self, kind, label, resources, fn):
+        """Queue fn on the scheduler. Returns the standard Api response dict.
+
+        Every job is recorded in the operation journal when it finishes.
+        """
+        def _journaled():
+            wait_host_setup()     # jobs rewrite bluestacks.conf
+            op = self._journal.begin(kind, label)
+            job = self._scheduler.current_job()
+            try:
+                fn()
+            except Exception as e:
+                self._journal.finish(op, "failed", str(e))
+                raise
+            self._journal.finish(op, "cancelled" if job and job.cancelled else "done")
+
+        job = self._scheduler.submit(kind, label, resources, _journaled)
+        return {"error": None, "job_id": job.id, "queued": job.state == "queued"}
+
+    def _job_queue_callback(self, jobs):
+        """Push the job queue snapshot to the frontend."""
+        self._bus.emit("job_queue", jobs)
+
+    def _operation_done(self, name):
+        """Tell the UI an operation finished, after the log lines it printed."""
+        if self._log_capture is not None:
+            self._log_capture.drain(_job_streams.key())
+        for topic in STALE_AFTER_OPERATION.get(name, ()):
+            self._bus.forget(topic)
+        self._bus.emit("operation_done", name)
+
+    def _emit(self, msg):
+        """Progress line from inside a job (stdout is the log panel there)."""
+        print(msg)
+
+    def startup_mark(self, phase, final=False):
+        """Page-side startup stage (first_paint, instances); final prints the
+        --debug timing report."""
+        _startup.mark(str(phase))
+        if final:
+            _startup.report()
+        return True
+
+    def get_startup_timings(self):
+        return {"error": None, "timings": _startup.timings()}
+
+    def get_event_replay(self):
+        """Recent pushes (progress, statuses, log) for a page that just loaded."""
+        return {"error": None, "events": self._bus.replay()}
+
+    def get_operation_stats(self, days=14):
+        """Aggregates from the operation journal (per day, per kind, per step)."""
+        try:
+            return {"error": None, **self._journal.stats(int(days))}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def get_operation_history(self, limit=50):
+        """Most recent journal records, newest first."""
+        try:
+            return {"error": None, "operations": self._journal.recent(int(limit))}
+        except Exception as e:
+            return {"error": str(e), "operations": []}
+
+    def plan_batch(self, ops, engine_dir=None):
+        """Dry-run a batch of clone/delete/create_base ops: ports, names, bytes,
+        free space and estimated duration. Read-only and fast — call it before
+        submitting the real operation."""
+        ed = engine_dir or _settings.get("engine_dir") or clone_instance.detect_engine_dir()
+        if not ed:
+            return {"error": "Engine directory not set"}
+        try:
+            rates = self._journal.rates()
+        except Exception:
+            rates = None
+        try:
+            return {"error": None, **batch_planner.plan_batch(ed, list(ops or []), rates).to_dict()}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def get_log_stats(self):
+        """Log forwarding counters (lines, batches sent, coalesced, dropped)
+        plus the event bus counters under "bus"."""
+        if self._log_capture is None:
+            stats = {"lines": 0, "sent": 0, "batches": 0,
+                     "coalesced": 0, "dropped": 0, "pending": 0}
+        else:
+            stats = self._log_capture.stats()
+        return {"error": None, **stats, "bus": self._bus.stats(), "store": self._logs.stats()}
+
+    def search_logs(self, query="", op_id="", instance="", limit=200, regex=False):
+        """Search the on-disk log (all runs), newest first.
+
+        op_id is an operation journal ID (get_operation_history); only
+        segments whose index lists the op / instance are decompressed.
+        """
+        try:
+            return {"error": None, **self._logs.search(query or "", op_id or "", instance or "",
+                                                       int(limit), bool(regex))}
+        except re.error as e:
+            return {"error": f"Invalid pattern: {e}", "matches": []}
+        except Exception as e:
+            return {"error": str(e), "matches": []}
+
+    def get_log_tail(self, limit=200):
+        """Most recent stored log lines (this run and earlier), oldest first."""
+        return {"error": None, "lines": self._logs.tail(int(limit))}
+
+    def get_log_segments(self):
+        """On-disk log segments with time range, line count and instances."""
+        try:
+            return {"error": None, "segments": self._logs.segments()}
+        except Exception as e:
+            return {"error": str(e), "segments": []}
+
+    def get_jobs(self):
+        """Return running, queued and recently finished jobs (position + ETA)."""
+        return self._scheduler.snapshot()
+
+    def cancel_job(self, job_id):
+        """Cancel a queued job (or flag a running one to stop early)."""
+        if self._scheduler.cancel(int(job_id)):
+            return {"error": None}
+        return {"error": "Job not found or already finished"}
 
     # ── Settings / paths ──
 
     def get_initial_state(self):
-        """Called on page load. Returns engine dir + bluestacks dir + instances + source images."""
-        settings = load_settings()
+        """Called on page load. Returns engine dir + bluestacks dir + instances + source images.
+
+        instances is the last-known list from the previous ADB scan when one
+        is cached ("instances_cached": True) so the page can paint it at
+        once; the caller refreshes it right after.
+        """
+        t0 = time.perf_counter()
+        settings = _settings.snapshot()
         saved = settings.get("engine_dir", "")
 
         if saved and Path(saved).is_dir():
@@ -436,26 +1179,29 @@ class Api:
         else:
             engine_dir = detect_engine_dir_simple()
             if engine_dir:
-                settings["engine_dir"] = engine_dir
-                save_settings(settings)
+                _settings.set("engine_dir", engine_dir)
 
         # Images dir: default to DATA_DIR/images (writable location)
         images_dir = settings.get("images_dir", "")
         if not images_dir or not Path(images_dir).is_dir():
             images_dir = os.path.join(DATA_DIR, "images")
             os.makedirs(images_dir, exist_ok=True)
-            settings["images_dir"] = images_dir
-            save_settings(settings)
+            _settings.set("images_dir", images_dir)
 
-        instances = scan_instances(engine_dir) if engine_dir else []
+        instances, cached_at = load_instance_cache(engine_dir) if engine_dir else ([], None)
+        if engine_dir and cached_at is None:
+            instances = scan_instances(engine_dir)
         source_images = self._scan_source_images(images_dir)
 
         bs_dir = detect_bs_install_dir()
+        _startup.mark("initial_state", since=t0)
 
         return {
             "engine_dir": engine_dir,
             "bs_dir": bs_dir,
             "instances": instances,
+            "instances_cached": cached_at is not None,
+            "instances_cached_at": cached_at,
             "python_version": f"{sys.version_info.major}.{sys.version_info.minor}",
             "images_dir": images_dir,
             "source_images": source_images,
@@ -486,10 +1232,7 @@ class Api:
 
         # Persist newly-detected engine_dir so future calls use it
         if engine_path and engine_path.is_dir():
-            settings = load_settings()
-            if settings.get("engine_dir") != str(engine_path):
-                settings["engine_dir"] = str(engine_path)
-                save_settings(settings)
+            _settings.set("engine_dir", str(engine_path))
 
         return {
             "engine_exists": bool(engine_path and engine_path.is_dir()),
@@ -504,41 +1247,50 @@ class Api:
 
     def set_wizard_pending(self, step):
         """Persist wizard-pending flag to disk (survives force-close)."""
-        settings = load_settings()
-        settings["wizard_pending"] = step
-        save_settings(settings)
+        _settings.set("wizard_pending", step)
+        _settings.flush()       # not write-behind: a force-close may follow
         return True
 
     def get_wizard_pending(self):
         """Read wizard-pending flag from disk."""
-        settings = load_settings()
-        return settings.get("wizard_pending", "")
+        return _settings.get("wizard_pending", "")
 
     def clear_wizard_pending(self):
         """Remove wizard-pending flag from disk."""
-        settings = load_settings()
-        settings.pop("wizard_pending", None)
-        save_settings(settings)
+        _settings.pop("wizard_pending")
+        _settings.flush()
         return True
 
     def reset_settings(self):
         """Clear all saved settings to re-trigger setup wizard."""
         # Remove download marker if it exists
-        settings = load_settings()
-        engine_dir = settings.get("engine_dir", "")
+        engine_dir = _settings.get("engine_dir", "")
         if engine_dir:
             marker = Path(engine_dir) / ".jspoof_image_downloaded"
             if marker.is_file():
                 marker.unlink()
-        save_settings({})
+        _settings.replace({})
+        _settings.flush()
         return True
 
-    def check_image_exists(self, engine_dir):
-        """Check if any source images with the required disk file exist."""
-        settings = load_settings()
-        images_dir = settings.get("images_dir", os.path.join(DATA_DIR, "images"))
+    def check_image_exists(self, engine_dir, verify=False):
+        """Check if any source images with the required disk file exist.
+
+        Each image carries its last chunk verification ("verify", None if
+        never checked); verify=True checks them now (see verify_image_file).
+        An image that failed verification doesn't count as present.
+        """
+        images_dir = images_dir_setting()
         source_images = self._scan_source_images(images_dir)
-        complete = [img for img in source_images if img["complete"]]
+        complete = []
+        for img in source_images:
+            if not img["complete"]:
+                continue
+            img["verify"] = verify_image_file(os.path.join(img["path"], "data.qcow2"), run=verify)
+            if img["verify"] and not img["verify"]["ok"]:
+                print(f"[Warning] Source image {img['name']} is damaged: {img['verify']['summary']}")
+                continue
+            complete.append(img)
         if complete:
             return {"exists": True, "images": complete}
 
@@ -550,58 +1302,74 @@ class Api:
         return {"exists": False, "images": []}
 
     def download_image(self, engine_dir, version='a13'):
-        """Download and extract a source image archive."""
-        if not self._acquire_running():
-            return {"error": "An operation is already running"}
+        """Download and extract a source image archive.
 
-        settings = load_settings()
-        images_dir = settings.get("images_dir", os.path.join(DATA_DIR, "images"))
+        download_urls maps a version to a URL or to a list of mirror URLs
+        for the same file; the fastest mirrors are used together and a
+        failing one is dropped mid-transfer.
+        """
+        images_dir = images_dir_setting()
         default_urls = {
             "a13": "https://ntii.io/base.qcow2",
         }
-        urls = settings.get("download_urls", {})
-        url = urls.get(version, default_urls.get(version, ""))
+        urls = _settings.get("download_urls", {})
+        entry = urls.get(version, default_urls.get(version, ""))
+        mirrors = [u for u in entry if u] if isinstance(entry, list) else [entry] if entry else []
+        url = mirrors[0] if mirrors else ""
 
         if not url:
             # No URL configured — create the directory structure but skip download
             dest = Path(images_dir) / version
             dest.mkdir(parents=True, exist_ok=True)
-            self._running = False
-            if self._window:
-                try:
-                    self._window.evaluate_js(
-                        "if(window.onOperationDone)window.onOperationDone('download')"
-                    )
-                except Exception:
-                    pass
+            self._operation_done("download")
             return {"error": None, "version": version, "path": str(dest),
                     "skipped": True, "message": "No download URL configured. Place disk files manually."}
 
         def _run():
             try:
-                self._download_and_extract(url, images_dir, version)
+                self._download_and_extract(url, images_dir, version, mirrors[1:])
             except Exception as e:
                 print(f"[Error] Download failed: {e}")
+                op_journal.fail(e)
                 self._emit_download_progress(-1, str(e))
             finally:
-                self._running = False
-                if self._window:
-                    try:
-                        self._window.evaluate_js(
-                            "if(window.onOperationDone)window.onOperationDone('download')"
-                        )
-                    except Exception:
-                        pass
-
-        self._run_with_log(_run)
-        return {"error": None, "version": version}
+                self._operation_done("download")
 
-    def _download_and_extract(self, url, images_dir, version):
-        """Download an archive (or raw qcow2) to images_dir/version/."""
-        import urllib.request
+        resp = self._submit_job("download", f"Download {version} image",
+                                {scheduler.RES_DISK, scheduler.RES_IMAGES}, _run)
+        resp["version"] = version
+        return resp
 
+    def _download_and_extract(self, url, images_dir, version, mirrors=()):
+        """Download an archive (or raw qcow2) to images_dir/version/.
+        mirrors: more URLs for the same file."""
         dest = Path(images_dir) / version
         dest.mkdir(parents=True, exist_ok=True)
+        expected = _settings.get("download_sha256", {}).get(version)    # of data.qcow2
+
+        if decompress_stream.codec_for(url):
+            # .qcow2.zst / .gz / .xz — decompressed while downloading, no archive on disk
+            print(f"Downloading {version} image from {url} (decompressing on the fly)...")
+            res = self._fetch_decompressed(url, str(dest / "data.qcow2"), expected, mirrors)
+            print(f"Download complete. Saved {res.bytes_out // (1024 * 1024)} MB as {res.path} "
+                  f"({res.bytes_in // (1024 * 1024)} MB transferred, sha256 {res.sha256[:16]}…)")
+            self._store_image(version, images_dir)
+            self._emit_download_progress(100, "complete")
+            return
+
+        if url.lower().endswith(golden_pack.SUFFIX):
+            # Golden pack — chunks decompressed and verified on every core
+            archive = dest / f"{version}{golden_pack.SUFFIX}"
+            print(f"Downloading {version} image from {url}...")
+            self._fetch(url, str(archive), mirrors)
+            print("Download complete. Unpacking...")
+            res = self._unpack_golden(str(archive), str(dest), expected)
+            archive.unlink(missing_ok=True)
+            print(f"Unpack complete: {res['path']} ({res['size'] // (1024 * 1024)} MB, "
+                  f"sha256 {res['sha256'][:16]}…)")
+            self._store_image(version, images_dir)
+            self._emit_download_progress(100, "done")
+            return
 
         is_qcow2 = url.lower().endswith('.qcow2')
         is_7z = url.lower().endswith('.7z')
@@ -609,45 +1377,42 @@ class Api:
         if is_qcow2:
             # Raw qcow2 — download directly as data.qcow2
             dl_path = dest / "data.qcow2"
-            partial = str(dl_path) + ".part"
         else:
             ext = '.7z' if is_7z else '.zip'
             dl_path = dest / f"{version}{ext}"
-            partial = str(dl_path)
 
         archive_path = dl_path  # used by extraction code below
 
-        # Download with progress
-        print(f"Downloading {version} image from {url}...")
-        req = urllib.request.Request(url, headers={"User-Agent": "LukesMirage/2.2"})
-
-        with urllib.request.urlopen(req) as resp:
-            total = int(resp.headers.get("Content-Length", 0))
-            downloaded = 0
-            chunk_size = 256 * 1024  # 256KB chunks
+        # Raw qcow2 with a published chunk manifest: fetch only what changed
+        if is_qcow2 and self._try_delta(url, images_dir, version, dl_path, mirrors,
+                                        expected):
+            self._store_image(version, images_dir)
+            self._emit_download_progress(100, "complete")
+            return
 
-            with open(partial, "wb") as f:
-                while True:
-                    chunk = resp.read(chunk_size)
-                    if not chunk:
-                        break
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if total > 0:
-                        pct = int(downloaded * 100 / total)
-                        self._emit_download_progress(pct, "downloading")
+        # Download with progress (resumes a previous partial download)
+        print(f"Downloading {version} image from {url}...")
+        self._fetch(url, str(dl_path), mirrors, expected if is_qcow2 else None)
 
-        # For qcow2: rename .part → final and we're done (no extraction)
+        # For qcow2 we're done (no extraction)
         if is_qcow2:
-            os.replace(partial, str(dl_path))
             size_mb = dl_path.stat().st_size // (1024 * 1024)
             print(f"Download complete. Saved {size_mb} MB as {dl_path}")
+            self._store_image(version, images_dir)
             self._emit_download_progress(100, "complete")
             return
 
         print(f"Download complete. Extracting...")
         self._emit_download_progress(100, "extracting")
 
+        # Extract beside the version and rename the files in: data.qcow2 may
+        # be a hard link into the image store, and extracting over it would
+        # truncate the shared file in place.
+        final_dest = dest
+        dest = final_dest / ".extract"
+        shutil.rmtree(dest, ignore_errors=True)
+        dest.mkdir()
+
         if is_7z:
             # Try py7zr first, then BlueStacks' bundled 7zz, then 7z on PATH
             extracted = False
@@ -694,23 +1459,194 @@ class Api:
             nested = subdirs[0]
             if self.REQUIRED_DISK_FILES.issubset({f.name for f in nested.iterdir() if f.is_file()}):
                 print(f"Flattening nested directory: {nested.name}/")
-                import shutil
                 for item in list(nested.iterdir()):
                     shutil.move(str(item), str(dest / item.name))
                 nested.rmdir()
 
+        for item in list(dest.iterdir()):
+            target = final_dest / item.name
+            if target.is_dir() and not target.is_symlink():
+                shutil.rmtree(target)
+            os.replace(item, target)        # a rename: never writes through a link
+        dest.rmdir()
+        dest = final_dest
+
         print(f"Extraction complete: {dest}")
+        self._store_image(version, images_dir)
         self._emit_download_progress(100, "done")
 
-    def _emit_download_progress(self, pct, status):
-        """Push download progress to the frontend."""
-        if self._window:
+    def get_download_limits(self):
+        """Download bandwidth settings plus live shaper state (current
+        adaptive rate, RTTs)."""
+        return {"error": None, **_download_limit_dict(self._shaper.settings()),
+                "stats": self._shaper.stats()}
+
+    def set_download_limits(self, rate_mbps=None, adaptive=None, background=None):
+        """Change the download cap (MB/s, 0 = none), adaptive back-off or
+        low-priority marking.  Cap and adaptive mode apply to running
+        downloads immediately, the marking from their next download."""
+        try:
+            rate = None if rate_mbps is None else max(0.0, float(rate_mbps)) * 1048576
+        except (TypeError, ValueError):
+            return {"error": f"invalid rate: {rate_mbps!r}"}
+        self._shaper.configure(rate=rate, adaptive=adaptive, background=background)
+        limits = _download_limit_dict(self._shaper.settings())
+        _settings.set("download_limit", limits)
+        return {"error": None, **limits}
+
+    def _emit_download_progress(self, pct, status, info=None):
+        """Push download progress to the frontend. info: ProgressUpdate.to_dict()
+        (throughput, ETA) when known."""
+        self._bus.emit("download", pct, status, info)
+
+    def _download_reporter(self, total, start=0):
+        """ProgressReporter feeding _emit_download_progress (rate-limited, with ETA)."""
+        return progress_reporter.ProgressReporter(
+            total,
+            lambda u: self._emit_download_progress(max(u.pct, 0), "downloading", u.to_dict()),
+            start=start,
+        )
+
+    def _fetch(self, url, dest, mirrors=(), expected_sha256=None):
+        """Download url to dest over parallel ranged connections.
+
+        An interrupted download leaves dest.part + dest.part.json behind and
+        the next call resumes it.  Progress goes to the download bar, bytes
+        and time to the journal; cancelling the job stops the transfer.
+        With mirrors, segments come from all of them (see downloader); with
+        expected_sha256 the file is verified and dest.sha256 written.
+        """
+        job = self._scheduler.current_job()
+        dl = downloader.Download(url, dest, cancelled=lambda: bool(job and job.cancelled),
+                                 mirrors=mirrors, expected_sha256=expected_sha256,
+                                 shaper=self._shaper)
+        with op_journal.step("download"):
+            info = dl.probe()
+            if mirrors:
+                _print_mirrors(dl.mirror_stats(), 1 + len(mirrors))
+            if dl.done:
+                print(f"Resuming download at {dl.done // 1048576} MB of {info.size // 1048576} MB")
+            elif not info.ranges:
+                print("Server doesn't support ranged requests — single-stream download")
+            reporter = self._download_reporter(info.size or 0, start=dl.done)
             try:
-                self._window.evaluate_js(
-                    f"if(window.onDownloadProgress)window.onDownloadProgress({pct},{json.dumps(status)})"
-                )
-            except Exception:
-                pass
+                dl.run(on_progress=reporter.update)
+            finally:
+                op_journal.add_bytes(dl.fetched)
+            reporter.finish()
+        if mirrors:
+            for m in dl.mirror_stats():
+                if m["fetched"] or m["dead"]:
+                    print(f"  {m['url']}: {m['fetched'] // 1048576} MB"
+                          + (" (dropped)" if m["dead"] else ""))
+        if dl.sha256:
+            with open(dest + ".sha256", "w") as f:
+                f.write(f"{dl.sha256}  {os.path.basename(dest)}\n")
+        return dest
+
+    def _unpack_golden(self, archive, dest, expected_sha256=None):
+        """Unpack a golden pack into dest on all cores; progress goes to the
+        download bar as "extracting".  The pack's image must be data.qcow2
+        and, when expected_sha256 is set, hash to it."""
+        job = self._scheduler.current_job()
+        reporter = None
+
+        def _progress(done, total):
+            nonlocal reporter
+            if reporter is None:
+                reporter = progress_reporter.ProgressReporter(
+                    total, lambda u: self._emit_download_progress(
+                        max(u.pct, 0), "extracting", u.to_dict()))
+            reporter.update(done)
+
+        self._emit_download_progress(0, "extracting")
+        with op_journal.step("unpack"):
+            res = golden_pack.unpack(archive, dest, on_progress=_progress,
+                                     cancelled=lambda: bool(job and job.cancelled),
+                                     image_name="data.qcow2", expected_sha256=expected_sha256)
+        if reporter is not None:
+            reporter.finish()
+        return res
+
+    def _try_delta(self, url, images_dir, version, dest, mirrors=(), expected_sha256=None):
+        """Update dest from a local image plus the chunks that changed.
+
+        Needs a manifest next to the image on the server (or the version's
+        entry in the download_manifests setting) and a local image to start
+        from: the version's current one, else any other stored image.  The
+        result must hash to expected_sha256 when that is set.
+        False means no delta was possible; the caller downloads in full.
+        """
+        refs = [r for r in get_image_store(images_dir).refs() if r["complete"]]
+        refs.sort(key=lambda r: r["name"] != version)
+        if not refs:
+            return False
+        base = refs[0]["path"]
+        manifest_url = (_settings.get("download_manifests", {}).get(version)
+                        or url + image_manifest.SUFFIX)
+        job = self._scheduler.current_job()
+        reporter = None
+        last_pct = -1
+
+        def _hashing(done, total):
+            nonlocal last_pct
+            pct = done * 100 // max(total, 1)
+            if pct != last_pct:
+                last_pct = pct
+                self._emit_download_progress(pct, "hashing local image")
+
+        def _start(plan):
+            nonlocal reporter
+            total = plan.byte_count(plan.fetch)
+            print(f"Delta update from {refs[0]['name']}: {len(plan.fetch)} of "
+                  f"{len(plan.manifest.chunks)} chunks changed ({total // (1024 * 1024)} MB to fetch)")
+            reporter = self._download_reporter(total)
+
+        try:
+            with op_journal.step("delta"):
+                res = delta_update.fetch_delta(
+                    url, manifest_url, base, str(dest), on_start=_start,
+                    on_progress=lambda n: reporter.update(n), on_hash_progress=_hashing,
+                    cancelled=lambda: bool(job and job.cancelled), mirrors=mirrors,
+                    shaper=self._shaper, expected_sha256=expected_sha256)
+                op_journal.add_bytes(res.fetched_bytes)
+                reporter.finish()
+        except delta_update.DeltaUnavailable as e:
+            print(f"No delta update ({e}) — downloading the full image")
+            return False
+        except downloader.DownloadCancelled:
+            raise
+        except downloader.DownloadError as e:
+            print(f"[Warning] Delta update failed ({e}) — downloading the full image")
+            return False
+        print(f"Delta update complete: {res.fetched_bytes // (1024 * 1024)} MB fetched, "
+              f"{res.reused_bytes // (1024 * 1024)} MB reused from the local image")
+        return True
+
+    def _fetch_decompressed(self, url, dest, expected_sha256=None, mirrors=()):
+        """Download a compressed image and decompress it to dest in one pass.
+
+        Progress follows the compressed transfer; the SHA-256 of the image is
+        checked against expected_sha256 (when set) and saved as dest.sha256.
+        """
+        job = self._scheduler.current_job()
+        reporter = None
+
+        def _start(info):
+            nonlocal reporter
+            if not info.ranges:
+                print("Server doesn't support ranged requests — single-stream download")
+            reporter = self._download_reporter(info.size or 0)
+
+        with op_journal.step("download"):
+            res = decompress_stream.fetch_decompressed(
+                url, dest, expected_sha256=expected_sha256, on_start=_start,
+                on_progress=lambda n: reporter.update(n),
+                cancelled=lambda: bool(job and job.cancelled), mirrors=mirrors,
+                shaper=self._shaper)
+            op_journal.add_bytes(res.bytes_in)
+            reporter.finish()
+        return res
 
     def analyze_clones(self, engine_dir):
         """Analyze the Engine directory to find the source instance and existing clones.
@@ -807,9 +1743,7 @@ class Api:
 
     def set_engine_dir(self, path):
         """Save engine dir and return updated instance list."""
-        settings = load_settings()
-        settings["engine_dir"] = path
-        save_settings(settings)
+        _settings.set("engine_dir", path)
         instances = scan_instances(path) if path and Path(path).is_dir() else []
         return {"instances": instances}
 
@@ -833,37 +1767,124 @@ class Api:
     REQUIRED_DISK_FILES = {"data.qcow2"}
 
     def _scan_source_images(self, images_dir):
-        """Scan images_dir for subdirectories containing data.qcow2."""
-        images_path = Path(images_dir)
+        """Version subdirectories of images_dir and whether they hold
+        data.qcow2, answered from the image store index, plus the disk's
+        qcow2 metadata (virtual / allocated size, flags)."""
+        if not Path(images_dir).is_dir():
+            return []
         results = []
-        if not images_path.is_dir():
-            return results
-        for child in sorted(images_path.iterdir()):
-            if child.is_dir():
-                found = {f.name for f in child.iterdir() if f.is_file()}
-                has_all = self.REQUIRED_DISK_FILES.issubset(found)
-                total_size = sum(
-                    (child / f).stat().st_size for f in self.REQUIRED_DISK_FILES
-                    if (child / f).is_file()
-                ) if has_all else 0
-                results.append({
-                    "name": child.name,
-                    "path": str(child),
-                    "complete": has_all,
-                    "size_mb": total_size // (1024 * 1024),
-                    "files": [f for f in self.REQUIRED_DISK_FILES if (child / f).is_file()],
-                })
+        for ref in get_image_store(images_dir).refs(kind="version"):
+            results.append({
+                "name": ref["name"],
+                "path": os.path.dirname(ref["path"]),
+                "complete": ref["complete"],
+                "size_mb": ref["size"] // (1024 * 1024),
+                "files": sorted(self.REQUIRED_DISK_FILES) if ref["complete"] else [],
+                "sha256": ref["hash"],
+                "qcow2": qcow2_summary(ref["path"]) if ref["complete"] else None,
+            })
         return results
 
     def get_source_images(self):
         """Return current images dir and all source images found."""
-        settings = load_settings()
-        images_dir = settings.get("images_dir", os.path.join(DATA_DIR, "images"))
+        images_dir = images_dir_setting()
         return {
             "images_dir": images_dir,
             "images": self._scan_source_images(images_dir),
         }
 
+    def get_image_store(self):
+        """Image store index: refs, aliases and dedup counters."""
+        store = get_image_store()
+        return {"error": None, "refs": store.refs(), "aliases": store.aliases(),
+                "stats": store.stats()}
+
+    def set_image_alias(self, alias, name=None):
+        """Point an alias (e.g. "default") at a version or "base-image";
+        name None removes it.  find_base_image() prefers "default"."""
+        try:
+            get_image_store().set_alias(alias, name or None)
+        except KeyError as e:
+            return {"error": str(e.args[0])}
+        return {"error": None, "aliases": get_image_store().aliases()}
+
+    def dedupe_images(self):
+        """Hash new or changed source images, share identical ones on disk
+        and delete stored images nothing refers to anymore."""
+        def _run():
+            try:
+                job = self._scheduler.current_job()
+                store = get_image_store()
+                with op_journal.step("ingest"):
+                    res = store.ingest(cancelled=lambda: bool(job and job.cancelled))
+                with op_journal.step("gc"):
+                    freed = store.gc()
+                print(f"Image store: {res['hashed']} hashed, {res['linked']} deduplicated "
+                      f"({(res['bytes_saved'] + freed['bytes_freed']) // (1024 * 1024)} MB freed)")
+                for err in res["errors"]:
+                    print(f"[Warning] {err}")
+            except InterruptedError:
+                print("Image dedup cancelled")
+            except Exception as e:
+                print(f"[Error] Image dedup failed: {e}")
+                op_journal.fail(e)
+            finally:
+                self._operation_done("dedupe_images")
+
+        return self._submit_job("dedupe_images", "Deduplicate source images",
+                                {scheduler.RES_DISK, scheduler.RES_IMAGES}, _run)
+
+    def verify_images(self, engine_dir=None):
+        """Chunk-verify every source image, and every instance disk that
+        still has a manifest, against it.  Results show up in
+        check_image_exists() and diagnose_launch_readiness()."""
+        def _run():
+            try:
+                job = self._scheduler.current_job()
+                paths = [(img["name"], os.path.join(img["path"], "data.qcow2"))
+                         for img in self._scan_source_images(images_dir_setting())
+                         if img["complete"]]
+                engine = Path(engine_dir) if engine_dir else self._BS_ENGINE
+                if engine.is_dir():
+                    paths += [(child.name, str(child / "data.qcow2"))
+                              for child in sorted(engine.iterdir())
+                              if (child / "data.qcow2").is_file()]
+                checked = damaged = 0
+                for name, path in paths:
+                    with op_journal.step("verify", instance=name):
+                        res = verify_image_file(path, cancelled=lambda: bool(job and job.cancelled))
+                    if res is None:
+                        continue
+                    checked += 1
+                    if res["ok"]:
+                        print(f"{name}: verified ({res['secs']}s)")
+                    else:
+                        damaged += 1
+                        print(f"[Warning] {name} is damaged: {res['summary']}")
+                print(f"Image verification: {checked} checked, {damaged} damaged, "
+                      f"{len(paths) - checked} without a manifest")
+            except InterruptedError:
+                print("Image verification cancelled")
+            except Exception as e:
+                print(f"[Error] Image verification failed: {e}")
+                op_journal.fail(e)
+            finally:
+                self._operation_done("verify_images")
+
+        return self._submit_job("verify_images", "Verify disk images",
+                                {scheduler.RES_DISK, scheduler.RES_IMAGES}, _run)
+
+    def _store_image(self, name, images_dir=None):
+        """Index a freshly downloaded image and share it with identical ones."""
+        store = get_image_store(images_dir)
+        with op_journal.step("ingest"):
+            res = store.ingest(name)
+            store.gc()
+        if res["linked"]:
+            print(f"Identical image already stored — {res['bytes_saved'] // (1024 * 1024)} MB shared")
+        for err in res["errors"]:
+            print(f"[Warning] Image store: {err}")
+
     def scan_instances_for_dir(self, engine_dir):
         """Scan engine dir and return instance names."""
         return scan_instances(engine_dir) if engine_dir else []
@@ -911,14 +1932,7 @@ class Api:
 
     def _bs_install_status(self, phase, detail, pct=-1):
         """Push live install status to the frontend."""
-        import json
-        if self._window:
-            try:
-                payload = json.dumps({"phase": phase, "detail": detail, "pct": pct})
-                self._window.evaluate_js(
-                    f'if(window._onBsInstallProgress)window._onBsInstallProgress({payload})')
-            except Exception:
-                pass
+        self._bus.emit("bs_install", {"phase": phase, "detail": detail, "pct": pct})
 
     def install_bluestacks(self, force_reinstall=False):
         """Download and install BlueStacks 5.21.755.7538.
@@ -966,21 +1980,18 @@ class Api:
                     headers={"User-Agent": "jorkSpoofer-GUI/2.2-mac"})
                 with urllib.request.urlopen(req, timeout=600) as resp:
                     total = int(resp.headers.get("Content-Length", 0))
-                    downloaded = 0
-                    last_pct = -1
+                    reporter = progress_reporter.ProgressReporter(
+                        total,
+                        lambda u: self._bs_install_status(
+                            "download", f"Downloading... {u.describe()}", u.pct),
+                    )
                     with open(str(pkg_path), "wb") as f:
                         while True:
                             chunk = resp.read(262144)  # 256KB
                             if not chunk:
                                 break
                             f.write(chunk)
-                            downloaded += len(chunk)
-                            if total > 0:
-                                pct = int(downloaded / total * 100)
-                                if pct != last_pct:
-                                    self._bs_install_status("download",
-                                        f"Downloading... {pct}%", pct)
-                                    last_pct = pct
+                            reporter.advance(len(chunk))
                 self._bs_install_status("download", "Download complete", 100)
             else:
                 self._bs_install_status("download", "Installer cached", 100)
@@ -1521,39 +2532,12 @@ class Api:
                 capture_output=True, text=True, timeout=timeout
             )
 
-        # Collect ALL running + rooted instances
-        connected = []  # list of (serial, inst) tuples
-        for inst in instances:
-            serial = f"127.0.0.1:{inst.adb_port}"
-            try:
-                if not randomize_instances.adb_connect(adb_exe, serial):
-                    continue
-                if not randomize_instances.probe_boot_completed(adb_exe, serial):
-                    continue
-                if not randomize_instances.probe_root(adb_exe, serial):
-                    continue
-                connected.append((serial, inst))
-            except Exception:
-                continue
-
-        if not connected:
-            result["magisk_settings_detail"] = "No running instance with root"
-            result["shell_root_detail"] = "No running instance with root"
-            result["checker_root_detail"] = "No running instance with root"
-            return result
-
-        # ── Apply device-side fixes to EVERY connected instance ──
+        # ── Apply device-side fixes to EVERY running + rooted instance ──
         #
-        # We track per-instance results and report a summary.
-        # All instances must pass for the step to be marked successful.
-        magisk_ok_names = []
-        magisk_fail_names = []
-        policy_ok_names = []
-        policy_fail_names = []
-        checker_ok_names = []
-        checker_fail_names = []
-        checker_missing_names = []
-
+        # Each instance runs the plan below in order; instances are worked
+        # on in parallel (capped) by the fan-out executor.  Per-instance,
+        # per-step results are collected and the summary is built from them.
+        # All instances must pass for a step to be marked successful.
         settings_cmds = [
             "magisk --sqlite \\\"CREATE TABLE IF NOT EXISTS settings (key TEXT, value INT, PRIMARY KEY(key))\\\"",
             "magisk --sqlite \\\"INSERT OR REPLACE INTO settings VALUES('su_access', 2)\\\"",
@@ -1572,121 +2556,138 @@ class Api:
             "magisk --sqlite \\\"INSERT OR REPLACE INTO policies VALUES(2000, 2, 0, 1, 0)\\\"",
         ]
 
-        for serial, inst in connected:
-            name = inst.name
-            dbg(f"Device-side fix: {name} at {serial}")
-
-            # ── Step 7: Magisk settings ──
-            try:
-                all_ok = True
-                for cmd in settings_cmds:
-                    cp = adb_su(serial, cmd)
-                    if cp.returncode != 0:
-                        all_ok = False
-                        dbg(f"  {name}: Magisk setting failed: {cmd} -> {cp.stderr}")
-                # Verify
-                cp = adb_su(serial, "magisk --sqlite \\\"SELECT value FROM settings WHERE key='su_access'\\\"")
-                if "2" in cp.stdout or all_ok:
-                    magisk_ok_names.append(name)
-                else:
-                    magisk_fail_names.append(name)
-            except Exception as e:
-                dbg(f"  {name}: Magisk settings exception: {e}")
-                magisk_fail_names.append(name)
+        # Disable GMS system-update components (pm disable with root for reliability)
+        gms_update_components = [
+            "com.google.android.gms/com.google.android.gms.update.SystemUpdateActivity",
+            "com.google.android.gms/com.google.android.gms.update.SystemUpdateService",
+            "com.google.android.gms/com.google.android.gms.update.SystemUpdateService\\$ActiveReceiver",
+            "com.google.android.gms/com.google.android.gms.update.SystemUpdateService\\$Receiver",
+            "com.google.android.gms/com.google.android.gms.update.SystemUpdateService\\$SecretCodeReceiver",
+        ]
 
-            # ── Step 8: UID 0 + 2000 root policies ──
-            try:
-                all_ok = True
-                for cmd in policy_cmds:
-                    cp = adb_su(serial, cmd)
-                    if cp.returncode != 0:
-                        all_ok = False
-                # Verify
-                cp = adb_su(serial, "magisk --sqlite \\\"SELECT uid FROM policies WHERE uid=2000 AND policy=2\\\"")
-                if "2000" in cp.stdout or all_ok:
-                    policy_ok_names.append(name)
-                else:
-                    policy_fail_names.append(name)
-            except Exception as e:
-                dbg(f"  {name}: Policy exception: {e}")
-                policy_fail_names.append(name)
+        # ── Step 6: Only running + rooted instances get the rest of the plan ──
+        def step_probe(name, serial):
+            if not randomize_instances.adb_connect(adb_exe, serial):
+                return "offline", "adb connect failed"
+            if not randomize_instances.probe_boot_completed(adb_exe, serial):
+                return "offline", "not booted"
+            if not randomize_instances.probe_root(adb_exe, serial):
+                return "no_root", "no root"
+            dbg(f"Device-side fix: {name} at {serial}")
+            return True
 
-            # ── Step 9: Grant Checker app root ──
-            try:
-                # Find Checker UID on THIS instance
-                cp = adb_su(serial, "dumpsys package com.jorkspoofer.checker | grep userId=")
-                uid = None
-                if cp.returncode == 0:
-                    m = re.search(r'userId=(\d+)', cp.stdout)
-                    if m:
-                        uid = int(m.group(1))
+        # ── Step 7: Magisk settings ──
+        def step_magisk_settings(name, serial):
+            all_ok = True
+            for cmd in settings_cmds:
+                cp = adb_su(serial, cmd)
+                if cp.returncode != 0:
+                    all_ok = False
+                    dbg(f"  {name}: Magisk setting failed: {cmd} -> {cp.stderr}")
+            # Verify
+            cp = adb_su(serial, "magisk --sqlite \\\"SELECT value FROM settings WHERE key='su_access'\\\"")
+            return "2" in cp.stdout or all_ok
+
+        # ── Step 8: UID 0 + 2000 root policies ──
+        def step_shell_root(name, serial):
+            all_ok = True
+            for cmd in policy_cmds:
+                cp = adb_su(serial, cmd)
+                if cp.returncode != 0:
+                    all_ok = False
+            # Verify
+            cp = adb_su(serial, "magisk --sqlite \\\"SELECT uid FROM policies WHERE uid=2000 AND policy=2\\\"")
+            return "2000" in cp.stdout or all_ok
+
+        # ── Step 9: Grant Checker app root ──
+        def step_checker_root(name, serial):
+            # Find Checker UID on THIS instance
+            cp = adb_su(serial, "dumpsys package com.jorkspoofer.checker | grep userId=")
+            uid = None
+            if cp.returncode == 0:
+                m = re.search(r'userId=(\d+)', cp.stdout)
+                if m:
+                    uid = int(m.group(1))
+            if uid is None:
+                return "missing", "Checker not installed"
+
+            # Check if already granted
+            cp = adb_su(serial, f"magisk --sqlite \\\"SELECT uid FROM policies WHERE uid={uid} AND policy=2\\\"")
+            if str(uid) in cp.stdout:
+                dbg(f"  {name}: Checker UID {uid} already granted")
+                return True, f"UID {uid} already granted"
+
+            # Grant root to Checker
+            cp = adb_su(serial,
+                f"magisk --sqlite \\\"INSERT OR REPLACE INTO policies VALUES({uid}, 2, 0, 1, 0)\\\"")
+            adb_su(serial, "sync")
+            if cp.returncode == 0:
+                dbg(f"  {name}: Checker UID {uid} granted")
+                return True, f"UID {uid} granted"
+            dbg(f"  {name}: Checker grant failed: {cp.stderr}")
+            return False, cp.stderr.strip()
+
+        # ── Step 10: Auto-grant su to ALL installed apps ──
+        # Scan packages.list and grant root to every app UID >= 10000.
+        # Uses INSERT OR IGNORE so existing grants are untouched.
+        def step_grant_apps(name, serial):
+            adb_su(serial,
+                "awk '{uid=$2; if(uid+0 >= 10000) print uid}' /data/system/packages.list"
+                " | sort -u"
+                " | while read uid; do"
+                " magisk --sqlite \\\"INSERT OR IGNORE INTO policies VALUES($uid, 2, 0, 1, 0)\\\";"
+                " done")
+            dbg(f"  {name}: Auto-granted su to all installed apps")
+
+        # ── Step 11: Device-side auto-update hardening ──
+        # Disable Play Store auto-updates + GMS system update services.
+        # Non-fatal — failures here don't block the permissions step.
+        def step_update_hardening(name, serial):
+            # Disable package verifier (prevents Google scanning installed APKs)
+            adb_su(serial, "settings put global package_verifier_enable 0")
+            adb_su(serial, "settings put global verifier_verify_adb_installs 0")
+            for comp in gms_update_components:
+                adb_su(serial, f"pm disable '{comp}' 2>/dev/null || true")
+
+            # Restrict Play Store and GMS background activity
+            adb_su(serial, "cmd appops set com.android.vending RUN_IN_BACKGROUND deny 2>/dev/null || true")
+            adb_su(serial, "cmd appops set com.google.android.gms RUN_IN_BACKGROUND deny 2>/dev/null || true")
+
+            # Disable Play Protect (prevents scanning / removing modules)
+            adb_su(serial, "settings put global package_verifier_user_consent -1")
+            dbg(f"  {name}: Device auto-update hardening applied")
+
+        plan = [
+            fleet_fanout.PlanStep("probe", step_probe, required=True),
+            fleet_fanout.PlanStep("magisk_settings", step_magisk_settings),
+            fleet_fanout.PlanStep("shell_root", step_shell_root),
+            fleet_fanout.PlanStep("checker_root", step_checker_root),
+            fleet_fanout.PlanStep("grant_apps", step_grant_apps),
+            fleet_fanout.PlanStep("update_hardening", step_update_hardening),
+        ]
+        targets = [(inst.name, f"127.0.0.1:{inst.adb_port}") for inst in instances]
+        results = fleet_fanout.FanOut().run(targets, plan)
+        for r in results:
+            for st in r.steps:
+                if st.status == "error":
+                    dbg(f"  {r.name}: {st.step} exception: {st.detail}")
 
-                if uid is None:
-                    checker_missing_names.append(name)
-                else:
-                    # Check if already granted
-                    cp = adb_su(serial, f"magisk --sqlite \\\"SELECT uid FROM policies WHERE uid={uid} AND policy=2\\\"")
-                    if str(uid) in cp.stdout:
-                        checker_ok_names.append(name)
-                        dbg(f"  {name}: Checker UID {uid} already granted")
-                    else:
-                        # Grant root to Checker
-                        cp = adb_su(serial,
-                            f"magisk --sqlite \\\"INSERT OR REPLACE INTO policies VALUES({uid}, 2, 0, 1, 0)\\\"")
-                        adb_su(serial, "sync")
-                        if cp.returncode == 0:
-                            checker_ok_names.append(name)
-                            dbg(f"  {name}: Checker UID {uid} granted")
-                        else:
-                            checker_fail_names.append(name)
-                            dbg(f"  {name}: Checker grant failed: {cp.stderr}")
-            except Exception as e:
-                dbg(f"  {name}: Checker exception: {e}")
-                checker_fail_names.append(name)
+        connected = [r for r in results if r.status("probe") == "ok"]
+        result["instances"] = [r.to_dict() for r in connected]
 
-            # ── Step 10: Auto-grant su to ALL installed apps ──
-            # Scan packages.list and grant root to every app UID >= 10000.
-            # Uses INSERT OR IGNORE so existing grants are untouched.
-            try:
-                cp = adb_su(serial,
-                    "awk '{uid=$2; if(uid+0 >= 10000) print uid}' /data/system/packages.list"
-                    " | sort -u"
-                    " | while read uid; do"
-                    " magisk --sqlite \\\"INSERT OR IGNORE INTO policies VALUES($uid, 2, 0, 1, 0)\\\";"
-                    " done")
-                dbg(f"  {name}: Auto-granted su to all installed apps")
-            except Exception as e:
-                dbg(f"  {name}: Auto-grant exception: {e}")
+        if not connected:
+            result["magisk_settings_detail"] = "No running instance with root"
+            result["shell_root_detail"] = "No running instance with root"
+            result["checker_root_detail"] = "No running instance with root"
+            return result
 
-            # ── Step 11: Device-side auto-update hardening ──
-            # Disable Play Store auto-updates + GMS system update services.
-            # Non-fatal — failures here don't block the permissions step.
-            try:
-                # Disable package verifier (prevents Google scanning installed APKs)
-                adb_su(serial, "settings put global package_verifier_enable 0")
-                adb_su(serial, "settings put global verifier_verify_adb_installs 0")
-
-                # Disable GMS system-update components (pm disable with root for reliability)
-                gms_update_components = [
-                    "com.google.android.gms/com.google.android.gms.update.SystemUpdateActivity",
-                    "com.google.android.gms/com.google.android.gms.update.SystemUpdateService",
-                    "com.google.android.gms/com.google.android.gms.update.SystemUpdateService\\$ActiveReceiver",
-                    "com.google.android.gms/com.google.android.gms.update.SystemUpdateService\\$Receiver",
-                    "com.google.android.gms/com.google.android.gms.update.SystemUpdateService\\$SecretCodeReceiver",
-                ]
-                for comp in gms_update_components:
-                    adb_su(serial, f"pm disable '{comp}' 2>/dev/null || true")
-
-                # Restrict Play Store and GMS background activity
-                adb_su(serial, "cmd appops set com.android.vending RUN_IN_BACKGROUND deny 2>/dev/null || true")
-                adb_su(serial, "cmd appops set com.google.android.gms RUN_IN_BACKGROUND deny 2>/dev/null || true")
-
-                # Disable Play Protect (prevents scanning / removing modules)
-                adb_su(serial, "settings put global package_verifier_user_consent -1")
-
-                dbg(f"  {name}: Device auto-update hardening applied")
-            except Exception as e:
-                dbg(f"  {name}: Auto-update hardening warning (non-fatal): {e}")
+        magisk_ok_names = fleet_fanout.names_with(connected, "magisk_settings", "ok")
+        magisk_fail_names = fleet_fanout.names_failed(connected, "magisk_settings")
+        policy_ok_names = fleet_fanout.names_with(connected, "shell_root", "ok")
+        policy_fail_names = fleet_fanout.names_failed(connected, "shell_root")
+        checker_ok_names = fleet_fanout.names_with(connected, "checker_root", "ok")
+        checker_fail_names = fleet_fanout.names_failed(connected, "checker_root")
+        checker_missing_names = fleet_fanout.names_with(connected, "checker_root", "missing")
 
         # ── Build summary results ──
         total = len(connected)
@@ -1747,7 +2748,11 @@ class Api:
           has at least one instance block, valid format
         - initrd: exists, is gzip, size
         - Engine directory: exists, has instance folders
-        - Instance details: data.qcow2 presence, subdirs
+        - Instance details: data.qcow2 presence, subdirs, qcow2 metadata
+          (virtual / allocated size, backing file, snapshots, dirty / corrupt
+          flags, fragmentation), and a chunk check against its manifest
+          while it has a fresh one (cloned, not booted)
+        - Source images: chunk check against their manifests
 
         This helps us identify the ACTUAL cause of "Failed to read
         configuration file" errors without needing access to the test machine.
@@ -1858,6 +2863,14 @@ class Api:
                             inst["data_qcow2_size_human"] = (
                                 f"{(child / 'data.qcow2').stat().st_size / (1024*1024):.0f} MB"
                             )
+                            # Last result of a verify_images job; only checkable
+                            # until first boot (the manifest goes stale)
+                            inst["data_qcow2_verify"] = verify_image_file(child / "data.qcow2",
+                                                                          run=False)
+                            try:
+                                inst["qcow2"] = qcow2_info.read_info(str(child / "data.qcow2")).to_dict()
+                            except (OSError, ValueError) as e:
+                                inst["qcow2"] = {"error": str(e)}
                         # List subdirs
                         subdirs = [d.name for d in child.iterdir() if d.is_dir()]
                         inst["subdirs"] = subdirs
@@ -1865,6 +2878,17 @@ class Api:
         except Exception as e:
             diag["engine"]["error"] = str(e)
 
+        # ── Source images ──
+        diag["source_images"] = []
+        try:
+            for img in self._scan_source_images(images_dir_setting()):
+                if img["complete"]:
+                    img["verify"] = verify_image_file(os.path.join(img["path"], "data.qcow2"),
+                                                      run=False)
+                    diag["source_images"].append(img)
+        except Exception as e:
+            diag["source_images_error"] = str(e)
+
         # ── Overall assessment ──
         issues = []
         if not diag["conf"].get("exists"):
@@ -1888,6 +2912,27 @@ class Api:
         elif not diag["instances"]:
             issues.append("No instance directories found")
 
+        for inst in diag["instances"]:
+            check = inst.get("data_qcow2_verify")
+            if check and not check["ok"]:
+                issues.append(f"{inst['name']}/data.qcow2 is damaged ({check['summary']})")
+            q = inst.get("qcow2")
+            if not q:
+                continue
+            if q.get("error"):
+                issues.append(f"{inst['name']}/data.qcow2 is not a valid qcow2 image: {q['error']}")
+                continue
+            if q["corrupt"]:
+                issues.append(f"{inst['name']}/data.qcow2 is flagged corrupt by QEMU")
+            for problem in q["problems"]:
+                issues.append(f"{inst['name']}/data.qcow2: {problem}")
+            backing = q["backing_file"]
+            if backing and not (engine / inst["name"] / backing).exists():
+                issues.append(f"{inst['name']}/data.qcow2 backing file missing: {backing}")
+        for img in diag["source_images"]:
+            if img["verify"] and not img["verify"]["ok"]:
+                issues.append(f"Source image {img['name']} is damaged — download it again")
+
         if issues:
             diag["overall"] = "ISSUES FOUND"
             diag["issues"] = issues
@@ -1899,8 +2944,14 @@ class Api:
 
     # ── Randomize tab ──
 
-    def refresh_instances(self, engine_dir, bs_dir):
-        """Discover instances, probe ADB status. Returns list of instance dicts."""
+    def refresh_instances(self, engine_dir, bs_dir, since_version=None):
+        """Discover instances, probe ADB status.
+
+        Without since_version: returns the full list of instance dicts.
+        With the version from the previous reply: returns only a patch
+        (added / removed / changed fields) unless the versions diverged, in
+        which case the full list comes back with "full": True.
+        """
         if not engine_dir:
             return {"error": "Engine directory not set", "instances": []}
 
@@ -1908,23 +2959,32 @@ class Api:
         if not conf_path.is_file():
             return {"error": f"bluestacks.conf not found at {conf_path}", "instances": []}
 
+        wait_host_setup()
         bs_dir = bs_dir or randomize_instances.DEFAULT_BLUESTACKS_DIR
         adb_exe = randomize_instances.find_adb_exe(bs_dir)
 
         instances = randomize_instances.discover_instances_from_conf(conf_path)
         if not instances:
-            return {"error": None, "instances": []}
+            return self._instances_reply(engine_dir, [], since_version)
 
-        results = []
-        for inst in instances:
-            serial = f"{randomize_instances.DEFAULT_HOST}:{inst.adb_port}"
-            is_running = False
-            has_root = False
+        def step_running(name, serial):
+            return (randomize_instances.adb_connect(adb_exe, serial)
+                    and randomize_instances.probe_boot_completed(adb_exe, serial))
 
-            if randomize_instances.adb_connect(adb_exe, serial):
-                is_running = randomize_instances.probe_boot_completed(adb_exe, serial)
-                if is_running:
-                    has_root = randomize_instances.probe_root(adb_exe, serial)
+        def step_root(name, serial):
+            return randomize_instances.probe_root(adb_exe, serial)
+
+        # Probe every instance in parallel; root is only probed when running
+        probes = fleet_fanout.FanOut().run(
+            [(i.name, f"{randomize_instances.DEFAULT_HOST}:{i.adb_port}") for i in instances],
+            [fleet_fanout.PlanStep("running", step_running, required=True),
+             fleet_fanout.PlanStep("root", step_root)],
+        )
+
+        results = []
+        for inst, probe in zip(instances, probes):
+            is_running = probe.status("running") == "ok"
+            has_root = probe.status("root") == "ok"
 
             print(f"[scan] {inst.name} :{inst.adb_port} running={is_running} root={has_root}")
 
@@ -1934,9 +2994,23 @@ class Api:
                 "display": inst.display_name or "",
                 "running": is_running,
                 "root": has_root,
+                "disk": _card_disk(qcow2_summary(Path(engine_dir) / inst.name / "data.qcow2")),
             })
 
-        return {"error": None, "instances": results}
+        return self._instances_reply(engine_dir, results, since_version)
+
+    def _instances_reply(self, engine_dir, results, since_version):
+        before = self._instances_diff.version
+        sync = self._instances_diff.sync(results, since_version)
+        if sync["version"] != before:
+            save_instance_cache(engine_dir, results)   # painted on next launch
+        reply = {"error": None, "full": sync["full"], "version": sync["version"],
+                 "base_version": sync["base_version"]}
+        if sync["full"]:
+            reply["instances"] = results
+        else:
+            reply["patch"] = sync["patch"]
+        return reply
 
     def fix_promotions(self, engine_dir):
         """Seed custom load.jpg into all instances missing boot promotions."""
@@ -1977,44 +3051,19 @@ class Api:
 
     def do_randomize(self, instance_names, engine_dir, bs_dir, do_profile, skip_reboot):
         """Run randomization on selected instances with per-instance progress."""
-        if not self._acquire_running():
-            return {"error": "An operation is already running"}
 
         def _emit_progress(inst_name, step_index, status, text):
             """Send progress update to frontend."""
-            if self._window:
-                import json as _j
-                try:
-                    self._window.evaluate_js(
-                        f"if(window.onRandProgress)"
-                        f"window.onRandProgress({_j.dumps(inst_name)},{step_index},{_j.dumps(status)},{_j.dumps(text)})"
-                    )
-                except Exception:
-                    pass
+            self._bus.emit("rand_progress", inst_name, step_index, status, text,
+                           key=(inst_name, step_index))
 
         def _emit_instance_done(inst_name, success):
             """Signal that an instance is fully done."""
-            if self._window:
-                import json as _j
-                try:
-                    self._window.evaluate_js(
-                        f"if(window.onRandInstanceDone)"
-                        f"window.onRandInstanceDone({_j.dumps(inst_name)},{'true' if success else 'false'})"
-                    )
-                except Exception:
-                    pass
+            self._bus.emit("rand_done", inst_name, bool(success), key=inst_name)
 
         def _emit_results(results_data):
             """Send before/after results to frontend for the results modal."""
-            if self._window:
-                import json as _json
-                try:
-                    payload = _json.dumps(results_data)
-                    self._window.evaluate_js(
-                        f"if(window.onRandResults)window.onRandResults({payload})"
-                    )
-                except Exception:
-                    pass
+            self._bus.emit("rand_results", results_data)
 
         def _run():
             try:
@@ -2160,18 +3209,13 @@ class Api:
                 print("\nRandomization complete.")
             except Exception as e:
                 print(f"[Error] {e}")
+                op_journal.fail(e)
             finally:
-                self._running = False
-                if self._window:
-                    try:
-                        self._window.evaluate_js(
-                            "if(window.onOperationDone)window.onOperationDone('randomize')"
-                        )
-                    except Exception:
-                        pass
+                self._operation_done("randomize")
 
-        self._run_with_log(_run)
-        return {"error": None}
+        return self._submit_job(
+            "randomize", f"Randomize {len(instance_names)} instance(s)",
+            {scheduler.instance_resource(n) for n in instance_names}, _run)
 
     # ── Base-image instance creation ──
 
@@ -2181,25 +3225,28 @@ class Api:
         """Locate the pre-built base image (data.qcow2 or base-image.qcow2).
 
         Searches in order:
-          1. DATA_DIR/images/*/data.qcow2  (wizard download location)
-          2. DATA_DIR/base-image.qcow2     (direct download location)
-          3. BUNDLE_DIR/base-image.qcow2   (if bundled with dev checkout)
-          4. dist/base-image.qcow2         (dev build directory)
-
-        Returns dict with 'found' (bool), 'path' (str or None),
-        and 'download_url' / 'download_to' when not found.
+          1. the image store's "default" alias, if set
+          2. images_dir/*/data.qcow2       (wizard download location)
+          3. DATA_DIR/base-image.qcow2     (direct download location)
+          4. BUNDLE_DIR/base-image.qcow2   (if bundled with dev checkout)
+          5. dist/base-image.qcow2         (dev build directory)
+
+        1–3 come from the image store index.  Returns dict with 'found'
+        (bool), 'path' (str or None), and 'download_url' / 'download_to'
+        when not found.
         """
-        # Check wizard-downloaded images first (images/a13/data.qcow2 etc.)
-        images_dir = os.path.join(DATA_DIR, "images")
-        if os.path.isdir(images_dir):
-            for subdir in sorted(Path(images_dir).iterdir()):
-                candidate = subdir / "data.qcow2"
-                if candidate.is_file():
-                    return {"found": True, "path": str(candidate)}
-
-        # Then check explicit base-image paths
+        store = get_image_store()
+        default = store.resolve("default")
+        if default and default["complete"]:
+            return {"found": True, "path": default["path"], "sha256": default["hash"]}
+        refs = store.refs()
+        for ref in ([r for r in refs if r["kind"] == "version"]
+                    + [r for r in refs if r["name"] == "base-image"]):
+            if ref["complete"]:
+                return {"found": True, "path": ref["path"], "sha256": ref["hash"]}
+
+        # Then the dev-checkout locations
         candidates = [
-            os.path.join(DATA_DIR, "base-image.qcow2"),
             os.path.join(BUNDLE_DIR, "base-image.qcow2"),
             os.path.join(BUNDLE_DIR, "..", "dist", "base-image.qcow2"),
         ]
@@ -2211,7 +3258,7 @@ class Api:
             "found": False,
             "path": None,
             "download_url": self._BASE_IMAGE_URL,
-            "download_to": os.path.join(DATA_DIR, "base-image.qcow2"),
+            "download_to": BASE_IMAGE_FILE,
         }
 
     def download_base_image(self):
@@ -2220,62 +3267,33 @@ class Api:
         Returns dict with 'error' (None on success) and 'path'.
         Progress is emitted via _emit_download_progress().
         """
-        if not self._acquire_running():
-            return {"error": "An operation is already running"}
 
-        dest = os.path.join(DATA_DIR, "base-image.qcow2")
+        dest = BASE_IMAGE_FILE
 
         def _run():
-            import urllib.request
-
             try:
                 self._emit(f"Downloading base image from {self._BASE_IMAGE_URL} ...")
                 os.makedirs(DATA_DIR, exist_ok=True)
 
-                partial = dest + ".part"
-                req = urllib.request.Request(
-                    self._BASE_IMAGE_URL,
-                    headers={"User-Agent": "LukesMirage/2.2"},
-                )
-                with urllib.request.urlopen(req) as resp:
-                    total = int(resp.headers.get("Content-Length", 0))
-                    downloaded = 0
-                    chunk_size = 256 * 1024  # 256 KB
-
-                    with open(partial, "wb") as f:
-                        while True:
-                            chunk = resp.read(chunk_size)
-                            if not chunk:
-                                break
-                            f.write(chunk)
-                            downloaded += len(chunk)
-                            if total > 0:
-                                pct = int(downloaded * 100 / total)
-                                self._emit_download_progress(pct, "downloading")
-
-                # Rename .part → final only after complete download
-                os.replace(partial, dest)
+                # .part → final only after the complete download
+                self._fetch(self._BASE_IMAGE_URL, dest)
                 size_mb = os.path.getsize(dest) / (1024 * 1024)
                 self._emit(f"✓ Base image downloaded ({size_mb:.0f} MB)")
                 self._emit(f"  Saved to: {dest}")
+                self._store_image("base-image")
+            except downloader.DownloadCancelled:
+                self._emit("✗ Download cancelled — it will resume next time")
             except Exception as e:
                 self._emit(f"✗ Download failed: {e}")
-                # Clean up partial file
-                try:
-                    os.remove(dest + ".part")
-                except OSError:
-                    pass
+                self._emit("  The partial download is kept and resumes on the next attempt.")
+                op_journal.fail(e)
             finally:
-                if self._window:
-                    try:
-                        self._window.evaluate_js(
-                            "if(window.onOperationDone)window.onOperationDone('download')"
-                        )
-                    except Exception:
-                        pass
+                self._operation_done("download")
 
-        self._run_with_log(_run)
-        return {"error": None, "path": dest}
+        resp = self._submit_job("download", "Download base image",
+                                {scheduler.RES_DISK, scheduler.RES_IMAGES}, _run)
+        resp["path"] = dest
+        return resp
 
     def create_base_instance(self, base_image_path=None, instance_name=None, display_name=None,
                              engine_dir=None):
@@ -2287,8 +3305,6 @@ class Api:
 
         If base_image_path is None or empty, auto-discovers via find_base_image().
         """
-        if not self._acquire_running():
-            return {"error": "An operation is already running"}
 
         def _run():
             try:
@@ -2305,6 +3321,7 @@ class Api:
                         self._emit("✗ Base image not found (base-image.qcow2).")
                         self._emit(f"  Download from: {loc['download_url']}")
                         self._emit(f"  Or use the download_base_image() API to fetch it automatically.")
+                        op_journal.fail("base image not found")
                         return
 
                 # Determine engine dir + conf path for unlocking
@@ -2314,6 +3331,7 @@ class Api:
                     eng = clone_instance.detect_engine_dir()
                 if not eng:
                     self._emit("✗ Could not detect BlueStacks Engine directory")
+                    op_journal.fail("engine directory not found")
                     return
                 conf_path = eng.parent / "bluestacks.conf"
 
@@ -2326,6 +3344,7 @@ class Api:
                         engine_dir=str(eng),
                         quiet=False,
                         on_progress=self._emit,
+                        verify=_settings.get("verify_clones", True),
                     )
 
                 if result.get("ok"):
@@ -2334,21 +3353,26 @@ class Api:
                     self._emit("Instance is ready — launch it from BlueStacks or the Manager tab.")
                 else:
                     self._emit(f"✗ Failed: {result.get('error', 'unknown')}")
+                    op_journal.fail(result.get("error", "unknown"))
             except PermissionError as e:
                 self._emit(f"✗ Permission denied: {e}")
+                op_journal.fail(e)
             except Exception as e:
                 self._emit(f"✗ Creation failed: {e}")
+                op_journal.fail(e)
 
-        self._run_with_log(_run)
-        return {"error": None}
+        resources = {scheduler.RES_CONF, scheduler.RES_MIM, scheduler.RES_DISK}
+        if instance_name:
+            resources.add(scheduler.instance_resource(instance_name))
+        return self._submit_job(
+            "create_base", f"Create instance {display_name or instance_name or ''}".strip(),
+            resources, _run)
 
     # ── Clone tab ──
 
     def do_clone(self, source, clone_names, engine_dir, bs_dir, fix_mode, dry_run,
                  skip_bs_check=False, source_image_path=None, clone_display_names=None):
         """Run clone operation. source_image_path overrides engine_dir/source as the source directory."""
-        if not self._acquire_running():
-            return {"error": "An operation is already running"}
 
         def _run():
             import subprocess
@@ -2414,6 +3438,7 @@ class Api:
                         )
                         if cp.returncode != 0:
                             print("ERROR: Could not unlock bluestacks.conf — user cancelled or permission denied.")
+                            op_journal.fail("could not unlock bluestacks.conf")
                             return
                         print("bluestacks.conf unlocked.")
 
@@ -2438,11 +3463,13 @@ class Api:
                 for idx, name in enumerate(clone_names, 1):
                     print(f"\n[{idx}/{total}] {source} → {name}")
                     display_override = display_map.get(name)
-                    clone_instance.clone_instance(
-                        source, name, ed, bd, fix_mode, dry_run,
-                        quiet=True, source_dir_override=src_dir,
-                        display_name_override=display_override
-                    )
+                    with op_journal.step("clone", instance=name):
+                        clone_instance.clone_instance(
+                            source, name, ed, bd, fix_mode, dry_run,
+                            quiet=True, source_dir_override=src_dir,
+                            display_name_override=display_override,
+                            verify=_settings.get("verify_clones", True)
+                        )
                     print(f"[{idx}/{total}] Complete")
                 print(f"\nAll {total} clone(s) done!")
 
@@ -2458,42 +3485,10 @@ class Api:
                     bs = bs_dir or randomize_instances.DEFAULT_BLUESTACKS_DIR
                     adb_exe = randomize_instances.find_adb_exe(bs)
 
-                    for ci in cloned_inst:
+                    def _auto_randomize(ci):
+                        """Post-boot steps for one clone — runs as soon as it is ready."""
                         cname = ci.name
-                        cdisp = ci.display_name or cname
                         cserial = f"{randomize_instances.DEFAULT_HOST}:{ci.adb_port}"
-                        print(f"\n[auto-rand] Starting {cname} ({cdisp})...")
-
-                        # Start the instance
-                        try:
-                            subprocess.Popen(
-                                ["open", "-na", "/Applications/BlueStacks.app",
-                                 "--args", "--instance", cname],
-                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-                            )
-                        except Exception as e:
-                            print(f"[auto-rand] Failed to start {cname}: {e}")
-                            continue
-
-                        # Wait for boot (poll up to 90 seconds)
-                        booted = False
-                        for _wait in range(45):
-                            time.sleep(2)
-                            randomize_instances.adb_connect(adb_exe, cserial)
-                            if randomize_instances.probe_boot_completed(adb_exe, cserial):
-                                booted = True
-                                break
-                        if not booted:
-                            print(f"[auto-rand] {cname}: boot timeout — skipping randomize")
-                            continue
-
-                        # Wait a bit more for Magisk to finish init
-                        time.sleep(5)
-
-                        # Check root
-                        if not randomize_instances.probe_root(adb_exe, cserial):
-                            print(f"[auto-rand] {cname}: no root — skipping randomize")
-                            continue
 
                         # Randomize profile
                         try:
@@ -2545,12 +3540,69 @@ class Api:
                         except Exception:
                             print(f"[auto-rand] {cname}: reboot failed — may need manual restart")
 
+                    # Start every clone first so they boot in parallel
+                    job = self._scheduler.current_job()
+                    waiter = boot_waiter.BootWaiter(
+                        adb_exe, settle_check=randomize_instances.probe_root,
+                    )
+                    try:
+                        pending = {}
+                        for ci in cloned_inst:
+                            if job and job.cancelled:
+                                break
+                            cname = ci.name
+                            cdisp = ci.display_name or cname
+                            cserial = f"{randomize_instances.DEFAULT_HOST}:{ci.adb_port}"
+                            print(f"\n[auto-rand] Starting {cname} ({cdisp})...")
+
+                            # Start the instance
+                            try:
+                                subprocess.Popen(
+                                    ["open", "-na", "/Applications/BlueStacks.app",
+                                     "--args", "--instance", cname],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                                )
+                            except Exception as e:
+                                print(f"[auto-rand] Failed to start {cname}: {e}")
+                                continue
+                            pending[waiter.watch(cname, cserial)] = ci
+
+                        # Randomize each clone as soon as it has booted and has
+                        # root; the 1 s wait keeps a cancel from blocking on boots
+                        with concurrent.futures.ThreadPoolExecutor(
+                                max_workers=max(1, len(pending))) as pool:
+                            waiting = set(pending)
+                            while waiting and not (job and job.cancelled):
+                                done, waiting = concurrent.futures.wait(
+                                    waiting, timeout=1.0,
+                                    return_when=concurrent.futures.FIRST_COMPLETED)
+                                for fut in done:
+                                    ci = pending[fut]
+                                    res = fut.result()
+                                    op_journal.record_step("boot_wait", res.ready_secs,
+                                                           instance=ci.name, ok=res.settled)
+                                    if not res.booted:
+                                        print(f"[auto-rand] {ci.name}: boot timeout — skipping randomize")
+                                        continue
+                                    if not res.settled:
+                                        print(f"[auto-rand] {ci.name}: no root — skipping randomize")
+                                        continue
+                                    print(f"[auto-rand] {ci.name}: ready after {res.ready_secs:.0f}s ({res.method})")
+                                    pool.submit(_auto_randomize, ci)
+                    finally:
+                        waiter.cancel()      # boot-wait threads stop with the job
+
+                    if job and job.cancelled:
+                        print("\n--- Auto-randomization cancelled ---")
+                        return
                     print("\n--- Auto-randomization complete ---")
 
             except SystemExit:
                 print("\n[Aborted] Operation stopped (see above).")
+                op_journal.fail("aborted")
             except Exception as e:
                 print(f"\n[Error] {e}")
+                op_journal.fail(e)
             finally:
                 # ── Re-lock bluestacks.conf if we unlocked it ──
                 if conf_was_locked and conf_path.is_file():
@@ -2585,20 +3637,16 @@ class Api:
                         print("MIM launched — new instances ready.")
                     except Exception:
                         pass
-                self._running = False
-                if self._window:
-                    try:
-                        self._window.evaluate_js("if(window.onOperationDone)window.onOperationDone('clone')")
-                    except Exception:
-                        pass
+                self._operation_done("clone")
 
-        self._run_with_log(_run)
-        return {"error": None}
+        resources = {scheduler.RES_CONF, scheduler.RES_MIM, scheduler.RES_DISK}
+        resources.update(scheduler.instance_resource(n) for n in clone_names)
+        if not source_image_path:
+            resources.add(scheduler.instance_resource(source))   # read as the clone source
+        return self._submit_job("clone", f"Clone {len(clone_names)} instance(s)", resources, _run)
 
     def do_delete(self, instance_names, engine_dir):
         """Delete one or more instances. Handles uchg unlock/relock and MIM restart."""
-        if not self._acquire_running():
-            return {"error": "An operation is already running"}
 
         def _run():
             import subprocess
@@ -2645,6 +3693,7 @@ class Api:
                         )
                         if cp.returncode != 0:
                             print("ERROR: Could not unlock bluestacks.conf — user cancelled or permission denied.")
+                            op_journal.fail("could not unlock bluestacks.conf")
                             return
                         print("bluestacks.conf unlocked.")
 
@@ -2652,12 +3701,14 @@ class Api:
                 total = len(instance_names)
                 for idx, name in enumerate(instance_names, 1):
                     print(f"\n[{idx}/{total}] Deleting {name}...")
-                    clone_instance.delete_instance(name, ed, dry_run=False, quiet=True)
+                    with op_journal.step("delete", instance=name):
+                        clone_instance.delete_instance(name, ed, dry_run=False, quiet=True)
                     print(f"[{idx}/{total}] Deleted")
                 print(f"\nAll {total} instance(s) deleted!")
 
             except Exception as e:
                 print(f"\n[Error] {e}")
+                op_journal.fail(e)
             finally:
                 # ── Re-lock bluestacks.conf if we unlocked it ──
                 if conf_was_locked and conf_path and conf_path.is_file():
@@ -2690,27 +3741,33 @@ class Api:
                     print("MIM launched — instances updated.")
                 except Exception:
                     pass
-                self._running = False
-                if self._window:
-                    try:
-                        self._window.evaluate_js("if(window.onOperationDone)window.onOperationDone('delete')")
-                    except Exception:
-                        pass
+                self._operation_done("delete")
 
-        self._run_with_log(_run)
-        return {"error": None}
+        resources = {scheduler.RES_CONF, scheduler.RES_MIM}
+        resources.update(scheduler.instance_resource(n) for n in instance_names)
+        return self._submit_job("delete", f"Delete {len(instance_names)} instance(s)", resources, _run)
 
     # ── Instance Start / Stop ──
 
     def start_instance(self, instance_name):
         """Start a single BlueStacks Air instance by launching with --instance flag."""
+        busy = self._scheduler.busy({scheduler.instance_resource(instance_name)})
+        if busy:
+            return {"error": f"{instance_name} is busy ({busy.label})"}
+        err = self._launch_instance_process(instance_name)
+        if err:
+            return {"error": err}
+        return {"error": None, "name": instance_name}
+
+    def _launch_instance_process(self, instance_name):
+        """Spawn BlueStacks for one instance. Returns an error string or None."""
         import subprocess as _sp
         try:
             bs_dir = self._detect_bs_dir()
             bs_exe = os.path.join(bs_dir, "MacOS", "BlueStacks") if bs_dir else None
 
             if not bs_exe or not os.path.isfile(bs_exe):
-                return {"error": f"BlueStacks executable not found"}
+                return "BlueStacks executable not found"
 
             _sp.Popen(
                 [bs_exe, "--instance", instance_name],
@@ -2718,9 +3775,75 @@ class Api:
                 stderr=_sp.DEVNULL,
             )
             dbg(f"start_instance: launched {instance_name}")
-            return {"error": None, "name": instance_name}
+            return None
         except Exception as e:
-            return {"error": str(e)}
+            return str(e)
+
+    def launch_fleet(self, instance_names, engine_dir=None, bs_dir=None, policy=None):
+        """Start many instances in load-aware waves.
+
+        policy: optional dict overriding LaunchPolicy fields; merged over the
+        persisted "fleet_launch_policy" setting.  Progress is pushed to
+        window.onFleetLaunch(event); the final report (per-instance
+        time-to-boot, per-wave host samples) is kept for
+        get_fleet_launch_report().
+        """
+        engine_dir = engine_dir or _settings.get("engine_dir", "")
+        if not engine_dir:
+            return {"error": "Engine directory not set"}
+        conf_path = Path(engine_dir).parent / "bluestacks.conf"
+        if not conf_path.is_file():
+            return {"error": "bluestacks.conf not found"}
+
+        merged = _settings.get("fleet_launch_policy", {})
+        merged.update(policy or {})
+        launch_policy = fleet_launcher.LaunchPolicy.from_dict(merged)
+
+        ports = {i.name: i.adb_port
+                 for i in randomize_instances.discover_instances_from_conf(conf_path)}
+        targets = [(n, f"{randomize_instances.DEFAULT_HOST}:{ports[n]}")
+                   for n in instance_names if n in ports]
+        missing = [n for n in instance_names if n not in ports]
+        if not targets:
+            return {"error": "None of the instances were found in config"}
+
+        bs = bs_dir or self._detect_bs_dir() or clone_instance.DEFAULT_BLUESTACKS_DIR
+        adb_exe = randomize_instances.find_adb_exe(bs)
+
+        def _emit_event(event):
+            if event["type"] == "wave":
+                print(f"[fleet] Wave {event['wave']}: starting {event['size']} "
+                      f"({event['remaining']} left)")
+            elif event["type"] == "booted":
+                print(f"[ok]   {event['name']}: booted in {event['boot_secs']:.0f}s")
+            elif event["type"] == "failed":
+                print(f"[fail] {event['name']}: {event['error']}")
+            self._bus.emit("fleet_launch", event)
+
+        def _run():
+            for n in missing:
+                print(f"[skip] {n}: not found in bluestacks.conf")
+            job = self._scheduler.current_job()
+            launcher = fleet_launcher.FleetLauncher(
+                adb_exe, self._launch_instance_process,
+                policy=launch_policy, on_event=_emit_event,
+                cancelled=lambda: bool(job and job.cancelled),
+            )
+            report = launcher.launch(targets)
+            self._last_fleet_report = report
+            s = report["summary"]
+            if launcher.cancelled:
+                print("[fleet] Cancelled — no further waves started")
+            print(f"[fleet] {s['booted']}/{s['total']} booted in {s['elapsed_secs']:.0f}s "
+                  f"(p50 {s['boot_p50_secs']}s, p95 {s['boot_p95_secs']}s)")
+
+        return self._submit_job(
+            "launch", f"Launch {len(targets)} instance(s)",
+            {scheduler.instance_resource(n) for n, _ in targets}, _run)
+
+    def get_fleet_launch_report(self):
+        """Return the report from the most recent launch_fleet() run (or None)."""
+        return self._last_fleet_report
 
     def stop_instance(self, instance_name, engine_dir, bs_dir):
         """Stop a running BlueStacks instance gracefully via ADB power-off.
@@ -2731,6 +3854,9 @@ class Api:
         3. Fallback: kill the QEMU process for this instance
         """
         import subprocess as _sp
+        busy = self._scheduler.busy({scheduler.instance_resource(instance_name)})
+        if busy:
+            return {"error": f"{instance_name} is busy ({busy.label})"}
         try:
             if not engine_dir:
                 return {"error": "Engine directory not set"}
@@ -2786,6 +3912,63 @@ class Api:
         except Exception as e:
             return {"error": str(e)}
 
+    def stop_instances(self, instance_names, engine_dir, bs_dir, graceful_timeout=None):
+        """Stop many instances at once.
+
+        Ports come from one bluestacks.conf snapshot; 'reboot -p' goes to
+        every instance concurrently, then all share one deadline before the
+        stragglers are escalated to SIGTERM / SIGKILL.  Runs as a "stop" job
+        holding every target; instances busy in another job are skipped.
+
+        Returns {"error", "results": [{name, method, secs, ...}], "summary"}.
+        """
+        if not engine_dir:
+            return {"error": "Engine directory not set"}
+        conf_path = Path(engine_dir).parent / "bluestacks.conf"
+        if not conf_path.is_file():
+            return {"error": "bluestacks.conf not found"}
+
+        ports = {i.name: i.adb_port
+                 for i in randomize_instances.discover_instances_from_conf(conf_path)}
+        targets, skipped = [], []
+        for name in instance_names:
+            busy = self._scheduler.busy({scheduler.instance_resource(name)})
+            if name not in ports:
+                skipped.append({"name": name, "method": "", "secs": None,
+                                "error": "not found in config"})
+            elif busy:
+                skipped.append({"name": name, "method": "", "secs": None,
+                                "error": f"busy ({busy.label})"})
+            else:
+                targets.append((name, f"127.0.0.1:{ports[name]}"))
+
+        adb_exe = randomize_instances.find_adb_exe(bs_dir or clone_instance.DEFAULT_BLUESTACKS_DIR)
+        outcome = {"error": "cancelled"}
+
+        def _run():
+            try:
+                results = bulk_stop.stop_instances(
+                    adb_exe, targets,
+                    graceful_timeout=float(graceful_timeout or bulk_stop.GRACEFUL_TIMEOUT),
+                )
+            except Exception as e:
+                outcome["error"] = str(e)
+                return
+            for r in results:
+                dbg(f"stop_instances: {r.name} -> {r.method} in {r.secs}s {r.error}")
+            summary = bulk_stop.summarize(results)
+            summary["skipped"] = len(skipped)
+            outcome.update(error=None, results=bulk_stop.to_dicts(results) + skipped,
+                           summary=summary)
+
+        # Hold every target for the whole stop so nothing starts or clones
+        # them mid-shutdown; the caller gets the results once the job is done
+        resp = self._submit_job(
+            "stop", f"Stop {len(targets)} instance(s)",
+            {scheduler.instance_resource(n) for n, _ in targets}, _run)
+        self._scheduler.wait(resp["job_id"])
+        return outcome
+
     # ── CDP (removed — stubs for frontend compatibility) ──
 
     def cdp_toggle(self, instance_name, adb_port, enable):
@@ -2803,6 +3986,51 @@ class Api:
     def cdp_reload(self, instance_name):
         return {"error": None}
 
+    # ── Instance telemetry ──
+
+    def _get_telemetry(self):
+        """Lazily initialize the per-instance resource sampler."""
+        if self._telemetry is None:
+            self._telemetry = instance_telemetry.TelemetrySampler(
+                on_sample=self._telemetry_callback,
+            )
+        return self._telemetry
+
+    def _telemetry_callback(self, latest):
+        """Push the newest per-instance samples to the frontend."""
+        self._bus.emit("telemetry", latest)
+
+    def telemetry_start(self, interval=None):
+        """Start background sampling of CPU / RSS / disk I/O per instance."""
+        try:
+            self._get_telemetry().start(interval)
+            return {"error": None}
+        except Exception as e:
+            return {"error": str(e)}
+
+    def telemetry_stop(self):
+        """Stop background telemetry sampling (buffers are kept)."""
+        if self._telemetry:
+            self._telemetry.stop()
+        return {"error": None}
+
+    def get_instance_telemetry(self, instance_name=None):
+        """Latest sample per running instance; with a name, also its history.
+
+        Samples: {t, cpu_pct, rss_mb, read_mb_s, write_mb_s, pids}.  Rates are
+        None until two ticks have been seen (or when disk I/O is unavailable).
+        """
+        try:
+            sampler = self._get_telemetry()
+            if not sampler.running:
+                sampler.sample_once()
+            result = {"error": None, "latest": sampler.latest()}
+            if instance_name:
+                result["history"] = sampler.history(instance_name)
+            return result
+        except Exception as e:
+            return {"error": str(e), "latest": {}}
+
     # ── VPN / Proxy Management ──
 
     def _get_vpn_manager(self):
@@ -2815,23 +4043,15 @@ class Api:
                 on_status_change=self._vpn_status_callback,
             )
             # Auto-restore Suborbital credentials if saved
-            settings = load_settings()
-            sub_user = settings.get("suborbital_email", "")
-            sub_pass = settings.get("suborbital_password", "")
+            sub_user = _settings.get("suborbital_email", "")
+            sub_pass = _settings.get("suborbital_password", "")
             if sub_user and sub_pass:
                 self._vpn_manager.set_suborbital_credentials(sub_user, sub_pass)
         return self._vpn_manager
 
     def _vpn_status_callback(self, instance_name, status_dict):
         """Push VPN status changes to the frontend."""
-        if self._window:
-            try:
-                self._window.evaluate_js(
-                    f"if(window.onVpnStatus)"
-                    f"window.onVpnStatus({json.dumps(instance_name)},{json.dumps(status_dict)})"
-                )
-            except Exception:
-                pass
+        self._bus.emit("vpn_status", instance_name, status_dict, key=instance_name)
 
     def vpn_apply(self, instance_name, adb_port, server, port, username, password):
         """Apply proxy config and connect VPN on one instance."""
@@ -2986,10 +4206,7 @@ class Api:
                 p["password"] = password
 
             # Persist credentials
-            settings = load_settings()
-            settings["suborbital_email"] = username
-            settings["suborbital_password"] = password
-            save_settings(settings)
+            _settings.update({"suborbital_email": username, "suborbital_password": password})
             return {
                 "error": None,
                 "user": user_info,
@@ -3006,10 +4223,8 @@ class Api:
         try:
             mgr = self._get_vpn_manager()
             mgr.set_suborbital_credentials("", "")
-            settings = load_settings()
-            settings.pop("suborbital_email", None)
-            settings.pop("suborbital_password", None)
-            save_settings(settings)
+            _settings.pop("suborbital_email")
+            _settings.pop("suborbital_password")
             return {"error": None}
         except Exception as e:
             return {"error": str(e)}
@@ -3020,8 +4235,7 @@ class Api:
             mgr = self._get_vpn_manager()
             proxies = mgr.fetch_proxies()
             # Inject SOCKS5 credentials: port is always 1337, password is account password
-            settings = load_settings()
-            acct_pass = settings.get("suborbital_password", "")
+            acct_pass = _settings.get("suborbital_password", "")
             for p in proxies:
                 p.setdefault("port", 1337)
                 p["password"] = acct_pass
@@ -3032,32 +4246,21 @@ class Api:
             return {"error": str(e), "proxies": []}
 
     def vpn_save_state(self, proxy_pool, assignments):
-        """Persist VPN proxy pool and assignments to settings JSON.
+        """Persist VPN proxy pool and assignments.
 
-        Uses the global settings lock to ensure atomic read-modify-write,
-        preventing concurrent vpnSaveState() calls from overwriting each other.
+        Both keys change in one store update, so concurrent vpnSaveState()
+        calls can't interleave; each lives in its own file and is only
+        rewritten when it actually changed.
         """
         try:
-            with _settings_lock:
-                try:
-                    with open(SETTINGS_FILE, "r") as f:
-                        settings = json.load(f)
-                except (FileNotFoundError, json.JSONDecodeError):
-                    settings = {}
-                settings["vpn_proxy_pool"] = proxy_pool
-                settings["vpn_assignments"] = assignments
-                try:
-                    with open(SETTINGS_FILE, "w") as f:
-                        json.dump(settings, f, indent=2)
-                except OSError:
-                    pass
+            _settings.update({"vpn_proxy_pool": proxy_pool, "vpn_assignments": assignments})
             return {"error": None}
         except Exception as e:
             return {"error": str(e)}
 
     def vpn_get_state(self):
-        """Load persisted VPN state from settings JSON."""
-        settings = load_settings()
+        """Load persisted VPN state from settings."""
+        settings = _settings.snapshot()
         return {
             "vpn_proxy_pool": settings.get("vpn_proxy_pool", []),
             "vpn_assignments": settings.get("vpn_assignments", {}),
@@ -3080,7 +4283,7 @@ class Api:
         """
         try:
             mgr = self._get_vpn_manager()
-            settings = load_settings()
+            settings = _settings.snapshot()
             pool = settings.get("vpn_proxy_pool", [])
             assignments = settings.get("vpn_assignments", {})
             engine_dir = settings.get("engine_dir", "")
@@ -3132,38 +4335,132 @@ class Api:
 
     # ── Helpers ──
 
+    def _log_sink(self, batch):
+        """A LogCapture batch goes to disk (with op IDs) and to the log panel."""
+        try:
+            self._logs.append(batch)
+        except Exception:
+            pass    # a full disk mustn't stop the UI log
+        self._bus.emit("log", [entry[:2] for entry in batch])
+
     def _run_with_log(self, fn):
-        """Run fn in a thread with stdout/stderr redirected to the webview log."""
-        import weakref
-        capture = LogCapture(weakref.ref(self._window) if self._window else lambda: None)
+        """Run fn in a thread whose stdout/stderr go to the webview log."""
+        if self._log_capture is None:
+            self._log_capture = LogCapture(self._log_sink)
+        _job_streams.install(self._log_capture)
 
         def wrapper():
-            with contextlib.redirect_stdout(capture), contextlib.redirect_stderr(capture):
+            with _job_streams.job():
                 fn()
-            capture.flush()
+            self._logs.flush()
 
         threading.Thread(target=wrapper, daemon=True).start()
 
 
 # ─── Main ────────────────────────────────────────────────────────────────────
 
+class RemoteApi(rpc_daemon.remote_api_class(Api)):
+    """js_api for a GUI attached to a running daemon.
+
+    Every call is forwarded over JSON-RPC; only the native folder picker
+    runs locally because it needs this process's window.
+    """
+
+    def __init__(self, client):
+        super().__init__(client)
+        self._window = None
+
+    def set_window(self, window):
+        self._window = window
+
+    # Startup timing is about this process, not the daemon's
+    startup_mark = Api.startup_mark
+    get_startup_timings = Api.get_startup_timings
+
+    def browse_engine_dir(self):
+        """Open native folder picker, return selected path."""
+        if not self._window:
+            return ""
+        result = self._window.create_file_dialog(
+            webview.FOLDER_DIALOG,
+            directory="",
+            allow_multiple=False
+        )
+        if result and len(result) > 0:
+            path = result[0]
+            self.set_engine_dir(path)
+            return path
+        return ""
+
+
+def run_daemon(address):
+    """Serve the Api headless over JSON-RPC until interrupted."""
+    import signal
+
+    run_host_setup()
+
+    api = Api()
+    server = rpc_daemon.RpcServer(api, address, exclude={"set_window", "browse_engine_dir"})
+    api.set_window(server.bridge)
+
+    def _stop(*_):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    signal.signal(signal.SIGTERM, _stop)
+
+    print(f"Luke's Mirage daemon listening on {address}", file=sys.__stderr__, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _settings.close()
+
+
 def main():
     global DEBUG
     parser = argparse.ArgumentParser(add_help=False)
     parser.add_argument("--debug", action="store_true")
+    parser.add_argument("--daemon", nargs="?", const=DAEMON_SOCKET, default=None)
+    parser.add_argument("--attach", nargs="?", const=DAEMON_SOCKET, default=None)
     args, _ = parser.parse_known_args()
     DEBUG = args.debug
 
+    if args.daemon:
+        run_daemon(args.daemon)
+        return
+
+    if webview is None:
+        print("ERROR: pywebview is not installed (pip install pywebview)", file=sys.stderr)
+        sys.exit(1)
+
     if DEBUG:
         dbg("=== Luke's Mirage GUI starting (pywebview, Mac, debug mode) ===")
 
-    # Deploy promo_guard + loading screen if missing (fallback for pkg postinstall)
-    setup_promo_guard()
+    # Attach to a running daemon instead of owning the backend — two backends
+    # would race on bluestacks.conf and the instances themselves
+    attach = args.attach or (DAEMON_SOCKET if rpc_daemon.daemon_running(DAEMON_SOCKET) else None)
+    window = None
+    if attach:
+        dbg(f"Attaching to daemon at {attach}")
 
-    # Suppress BlueStacks ads at the host level (bluestacks.conf)
-    disable_host_ads()
+        def _forward_event(params):
+            if window is not None and params.get("js"):
+                try:
+                    window.evaluate_js(params["js"])
+                except Exception:
+                    pass
 
-    api = Api()
+        try:
+            api = RemoteApi(rpc_daemon.RpcClient(attach, on_event=_forward_event))
+        except OSError as e:
+            print(f"ERROR: cannot attach to daemon at {attach}: {e}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        # Host setup shells out to launchctl and may rewrite bluestacks.conf;
+        # none of it is needed to open the window
+        start_host_setup()
+        api = Api()
+    _startup.mark("api")
 
     html_path = os.path.join(BUNDLE_DIR, "index.html")
     if not os.path.isfile(html_path):
@@ -3181,8 +4478,16 @@ def main():
         text_select=True,
     )
     api.set_window(window)
+    _startup.mark("window")
+    try:
+        window.events.loaded += lambda *_: _startup.mark("page_loaded")
+    except AttributeError:
+        pass    # pywebview without window events
 
-    webview.start(debug=DEBUG)
+    try:
+        webview.start(debug=DEBUG)
+    finally:
+        _settings.close()     # write anything still pending behind
 
 
 if __name__ == "__main__":
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Image Store — content-addressed store for source disk images.
+
+Source images live at ``<images_dir>/<version>/data.qcow2`` and, for the
+base-image flow, at ``DATA_DIR/base-image.qcow2``.  The same multi-GB
+image often ends up in several of those places.  The store keeps one copy
+per distinct image, keyed by its SHA-256, and makes every location a
+hard link to it:
+
+    <images_dir>/.store/blobs/<sha256>.qcow2    one file per distinct image
+    <images_dir>/.store/index.json              refs, aliases, blob sizes
+    <images_dir>/a13/data.qcow2                 hard link -> blob
+    DATA_DIR/base-image.qcow2                   hard link -> same blob
+
+The existing paths keep working for everything that reads them; only the
+disk space is shared.  Images are only ever copied out of these paths, and
+downloads (archives too: they are extracted beside the version and renamed
+in) replace them by rename, so a shared inode is never written through one
+ref and seen through another.
+
+Refs are small index records (name -> path, hash, size, inode, mtime).
+A ref is either a version directory under images_dir or a tracked file
+outside it.  Aliases map a name to a ref ("default" -> "a13").
+
+    store = ImageStore(images_dir)
+    store.track("base-image", "/data/base-image.qcow2")
+    store.refs()              # from the index: one stat per ref, no hashing
+    store.ingest("a13")       # hash (or read data.qcow2.sha256) and dedupe
+    store.gc()                # delete blobs no ref points at
+
+refs() rescans the directory listing only when images_dir's mtime changed
+and re-stats each ref; a ref whose file changed is listed with hash None
+until the next ingest().  A ``data.qcow2.sha256`` sidecar (written by the
+streaming downloader) newer than the image is trusted instead of hashing.
+Where hard links aren't possible (images_dir on another volume) a ref is
+hashed and indexed but not deduplicated.
+
+Requires: nothing beyond the standard library
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+# File name of the disk image inside a version directory
+IMAGE_FILE = "data.qcow2"
+
+# Store directory inside images_dir (dot-prefixed: not a version)
+STORE_DIR = ".store"
+
+# Read size when hashing an image
+HASH_CHUNK = 8 * 1024 * 1024
+
+_INDEX_VERSION = 1
+
+
+class ImageStore:
+    """Content-addressed image store for one images_dir; see the module docstring."""
+
+    def __init__(self, images_dir: str, image_file: str = IMAGE_FILE):
+        self._root = images_dir
+        self._image_file = image_file
+        self._store = os.path.join(images_dir, STORE_DIR)
+        self._blobs = os.path.join(self._store, "blobs")
+        self._lock = threading.RLock()
+        self._index: Optional[dict] = None
+        self.counters = {"rescans": 0, "hashed": 0, "sidecar_hashes": 0,
+                         "linked": 0, "bytes_saved": 0, "blobs_removed": 0}
+
+    # ── Queries (index only) ──
+
+    def refs(self, kind: Optional[str] = None) -> list[dict]:
+        """Every ref, sorted by name: name, kind, path, complete, size, hash."""
+        with self._lock:
+            self._load()
+            self._refresh()
+            out = []
+            for name, ref in sorted(self._index["refs"].items()):
+                if kind and ref["kind"] != kind:
+                    continue
+                out.append({"name": name, "kind": ref["kind"], "path": ref["path"],
+                            "complete": ref["size"] is not None, "size": ref["size"] or 0,
+                            "hash": ref["hash"]})
+            return out
+
+    def resolve(self, name: str) -> Optional[dict]:
+        """The ref for name or for the alias name, or None."""
+        with self._lock:
+            self._load()
+            target = self._index["aliases"].get(name, name)
+        return next((r for r in self.refs() if r["name"] == target), None)
+
+    def aliases(self) -> dict:
+        with self._lock:
+            self._load()
+            return dict(self._index["aliases"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load()
+            self._refresh()
+            blob_bytes = sum(b["size"] for b in self._index["blobs"].values())
+            ref_bytes = sum(r["size"] or 0 for r in self._index["refs"].values())
+            pending = [n for n, r in self._index["refs"].items()
+                       if r["size"] is not None and r["hash"] is None]
+            return dict(self.counters, refs=len(self._index["refs"]),
+                        blobs=len(self._index["blobs"]), blob_bytes=blob_bytes,
+                        ref_bytes=ref_bytes, pending=sorted(pending))
+
+    # ── Changes ──
+
+    def track(self, name: str, path: str):
+        """Add (or re-point) a ref to a file outside images_dir."""
+        with self._lock:
+            self._load()
+            path = os.path.abspath(path)
+            ref = self._index["refs"].get(name)
+            if ref and ref["path"] == path:
+                return
+            self._index["refs"][name] = _new_ref("file", path)
+            self._restat(self._index["refs"][name])
+            self._save()
+
+    def set_alias(self, alias: str, name: Optional[str]):
+        """Point alias at the ref name; name None removes the alias."""
+        with self._lock:
+            self._load()
+            if name is None:
+                self._index["aliases"].pop(alias, None)
+            elif name not in self._index["refs"]:
+                raise KeyError(f"no image named {name!r}")
+            else:
+                self._index["aliases"][alias] = name
+            self._save()
+
+    def ingest(self, name: Optional[str] = None,
+               cancelled: Optional[Callable[[], bool]] = None) -> dict:
+        """Hash refs with unknown content (one, or all when name is None),
+        move new images into the store and hard-link duplicates to it."""
+        with self._lock:
+            self._load()
+            self._refresh()
+            names = [name] if name else sorted(self._index["refs"])
+            todo = [(n, dict(self._index["refs"][n])) for n in names
+                    if n in self._index["refs"]]
+        result = {"hashed": 0, "linked": 0, "bytes_saved": 0, "errors": []}
+        for ref_name, ref in todo:
+            if ref["size"] is None:
+                continue
+            try:
+                self._ingest_one(ref_name, ref, result, cancelled)
+            except InterruptedError:
+                raise
+            except OSError as e:
+                result["errors"].append(f"{ref_name}: {e}")
+        return result
+
+    def gc(self) -> dict:
+        """Delete blobs no ref points at. Returns removed count and bytes freed."""
+        with self._lock:
+            self._load()
+            self._refresh()
+            live = {r["hash"] for r in self._index["refs"].values() if r["hash"]}
+            removed, freed = 0, 0
+            for digest in [h for h in self._index["blobs"] if h not in live]:
+                size = self._index["blobs"].pop(digest)["size"]
+                try:
+                    os.unlink(self._blob_path(digest))
+                    removed += 1
+                    freed += size
+                except FileNotFoundError:
+                    pass
+            self._clean_tmp()
+            self.counters["blobs_removed"] += removed
+            self._save()
+            return {"removed": removed, "bytes_freed": freed}
+
+    # ── Internals ──
+
+    def _ingest_one(self, name: str, ref: dict, result: dict, cancelled):
+        path = ref["path"]
+        digest = ref["hash"]
+        if digest is None:
+            digest = self._sidecar_hash(path)
+            if digest is None:
+                digest = _hash_file(path, cancelled)
+                self.counters["hashed"] += 1
+            else:
+                self.counters["sidecar_hashes"] += 1
+            result["hashed"] += 1
+        blob = self._blob_path(digest)
+        with self._lock:
+            cur = self._index["refs"].get(name)
+            if cur is None or cur["path"] != path or (cur["ino"], cur["mtime_ns"]) != (ref["ino"], ref["mtime_ns"]):
+                return                              # changed while hashing: next ingest
+            if digest not in self._index["blobs"] or not os.path.isfile(blob):
+                os.makedirs(self._blobs, exist_ok=True)
+                try:
+                    os.link(path, blob)
+                    self._index["blobs"][digest] = {"size": cur["size"], "added": time.time()}
+                except FileExistsError:
+                    self._index["blobs"][digest] = {"size": os.path.getsize(blob), "added": time.time()}
+                except OSError:
+                    pass                            # other volume: indexed, not shared
+            elif not os.path.samefile(blob, path):
+                tmp = f"{path}.store-tmp"
+                try:
+                    os.link(blob, tmp)
+                    os.replace(tmp, path)
+                    result["linked"] += 1
+                    result["bytes_saved"] += cur["size"]
+                    self.counters["linked"] += 1
+                    self.counters["bytes_saved"] += cur["size"]
+                except OSError:
+                    _remove(tmp)                    # other volume: keep the copy
+            cur["hash"] = digest
+            self._restat(cur, keep_hash=True)
+            self._save()
+
+    def _load(self):
+        # Lock held
+        if self._index is not None:
+            return
+        try:
+            with open(os.path.join(self._store, "index.json")) as f:
+                index = json.load(f)
+            if index.get("version") != _INDEX_VERSION:
+                raise ValueError("index version")
+        except (OSError, ValueError, AttributeError):
+            index = {"version": _INDEX_VERSION, "root_mtime_ns": None,
+                     "refs": {}, "aliases": {}, "blobs": {}}
+        self._index = index
+
+    def _save(self):
+        # Lock held
+        try:
+            os.makedirs(self._store, exist_ok=True)
+            target = os.path.join(self._store, "index.json")
+            tmp = target + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self._index, f, indent=1)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, target)
+        except OSError:
+            pass
+
+    def _refresh(self):
+        """Bring refs up to date: list images_dir only if its mtime moved,
+        stat every ref.  Lock held."""
+        changed = False
+        try:
+            root_mtime = os.stat(self._root).st_mtime_ns
+        except OSError:
+            root_mtime = None
+        refs = self._index["refs"]
+        if root_mtime != self._index["root_mtime_ns"]:
+            self.counters["rescans"] += 1
+            self._index["root_mtime_ns"] = root_mtime
+            versions = set()
+            if root_mtime is not None:
+                for entry in os.scandir(self._root):
+                    if entry.is_dir() and not entry.name.startswith("."):
+                        versions.add(entry.name)
+            for name in [n for n, r in refs.items() if r["kind"] == "version" and n not in versions]:
+                del refs[name]
+            for name in versions - set(refs):
+                refs[name] = _new_ref("version", os.path.join(self._root, name, self._image_file))
+            changed = True
+        for ref in refs.values():
+            changed |= self._restat(ref)
+        for alias, target in list(self._index["aliases"].items()):
+            if target not in refs:
+                del self._index["aliases"][alias]
+                changed = True
+        if changed:
+            self._save()
+
+    @staticmethod
+    def _restat(ref: dict, keep_hash: bool = False) -> bool:
+        """Update size / inode / mtime from disk; True if anything changed.
+        A changed file loses its hash unless keep_hash."""
+        try:
+            st = os.stat(ref["path"])
+            now = (st.st_size, st.st_ino, st.st_mtime_ns)
+        except OSError:
+            now = (None, None, None)
+        if now == (ref["size"], ref["ino"], ref["mtime_ns"]):
+            return False
+        ref["size"], ref["ino"], ref["mtime_ns"] = now
+        if not keep_hash:
+            ref["hash"] = None
+        return True
+
+    @staticmethod
+    def _sidecar_hash(path: str) -> Optional[str]:
+        """SHA-256 from <path>.sha256 when it is newer than the image."""
+        sidecar = path + ".sha256"
+        try:
+            if os.path.getmtime(sidecar) < os.path.getmtime(path):
+                return None
+            with open(sidecar) as f:
+                digest = f.read().split()[0].lower()
+        except (OSError, IndexError):
+            return None
+        return digest if len(digest) == 64 else None
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self._blobs, f"{digest}.qcow2")
+
+    def _clean_tmp(self):
+        for ref in self._index["refs"].values():
+            _remove(f"{ref['path']}.store-tmp")
+
+
+def _new_ref(kind: str, path: str) -> dict:
+    return {"kind": kind, "path": path, "hash": None,
+            "size": None, "ino": None, "mtime_ns": None}
+
+
+def _hash_file(path: str, cancelled: Optional[Callable[[], bool]] = None) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            if cancelled and cancelled():
+                raise InterruptedError("cancelled")
+            chunk = f.read(HASH_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Instance Telemetry — per-instance host resource usage for BlueStacks Air.
+
+Every BlueStacks Air instance runs as its own host process tree, launched
+as ``BlueStacks --instance <name>``.  The sampler takes ONE snapshot of the
+host process table per tick (psutil when installed, otherwise a single
+``ps -axo pid,ppid,time,rss,command`` call), maps each process to an
+instance by walking up to the ancestor that carries ``--instance``, and
+aggregates the tree:
+
+  cpu_pct     CPU time consumed since the previous tick / wall time
+              (100 = one full core, like Activity Monitor)
+  rss_mb      resident memory of the whole tree
+  read_mb_s   disk reads / writes since the previous tick.  Read from
+  write_mb_s  ``proc_pid_rusage`` (libproc) on macOS or /proc/<pid>/io on
+              Linux; None when the platform exposes neither.
+
+Samples are kept in a fixed-size ring buffer per instance so the UI can
+draw short history without the sampler growing over time.
+
+Requires: nothing beyond the standard library (psutil optional)
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Seconds between samples
+POLL_INTERVAL = 3.0
+
+# Samples kept per instance (120 × 3s = 6 minutes)
+HISTORY_LEN = 120
+
+_INSTANCE_ARG_RE = re.compile(r"--instance[= ]+(\S+)")
+
+
+def _instance_arg(command: str) -> Optional[re.Match]:
+    """Match --instance only when a BlueStacks executable precedes it."""
+    m = _INSTANCE_ARG_RE.search(command)
+    if not m:
+        return None
+    head = command[:m.start()].split()
+    if not any("bluestacks" in t.rsplit("/", 1)[-1].lower() for t in head):
+        return None
+    return m
+
+
+@dataclass
+class ProcRow:
+    """One row of the host process table."""
+    pid: int
+    ppid: int
+    cpu_secs: float     # cumulative user + system CPU time
+    rss_kb: int
+    command: str
+
+
+@dataclass
+class TelemetrySample:
+    """Aggregated usage of one instance's process tree at one tick."""
+    t: float
+    cpu_pct: Optional[float]    # None on the first tick (no delta yet)
+    rss_mb: float
+    read_mb_s: Optional[float]
+    write_mb_s: Optional[float]
+    pids: int
+
+
+# ─── Process table ───────────────────────────────────────────────────────────
+
+def _parse_cputime(s: str) -> float:
+    """Parse ps TIME ([dd-][hh:]mm:ss[.ss]) into seconds."""
+    days = 0
+    if "-" in s:
+        d, s = s.split("-", 1)
+        days = int(d)
+    secs = 0.0
+    for part in s.split(":"):
+        secs = secs * 60 + float(part)
+    return days * 86400 + secs
+
+
+def _snapshot_ps() -> list[ProcRow]:
+    cp = subprocess.run(
+        ["ps", "-axo", "pid=,ppid=,time=,rss=,command="],
+        capture_output=True, text=True, timeout=10,
+    )
+    rows = []
+    for line in cp.stdout.splitlines():
+        parts = line.split(None, 4)
+        if len(parts) < 5:
+            continue
+        try:
+            rows.append(ProcRow(int(parts[0]), int(parts[1]),
+                                _parse_cputime(parts[2]), int(parts[3]), parts[4]))
+        except ValueError:
+            continue
+    return rows
+
+
+def _snapshot_psutil() -> list[ProcRow]:
+    rows = []
+    for p in psutil.process_iter(["pid", "ppid", "cpu_times", "memory_info", "cmdline"]):
+        info = p.info
+        ct, mi = info.get("cpu_times"), info.get("memory_info")
+        rows.append(ProcRow(
+            pid=info["pid"],
+            ppid=info.get("ppid") or 0,
+            cpu_secs=(ct.user + ct.system) if ct else 0.0,
+            rss_kb=(mi.rss // 1024) if mi else 0,
+            command=" ".join(info.get("cmdline") or []),
+        ))
+    return rows
+
+
+def snapshot_processes() -> list[ProcRow]:
+    """One snapshot of the host process table."""
+    if psutil is not None:
+        try:
+            return _snapshot_psutil()
+        except Exception:
+            pass
+    return _snapshot_ps()
+
+
+def map_instances(rows: list[ProcRow]) -> dict[str, list[ProcRow]]:
+    """Group processes by instance: each BlueStacks --instance process plus
+    its descendants."""
+    by_pid = {r.pid: r for r in rows}
+    owner: dict[int, Optional[str]] = {}
+
+    def _owner(pid: int) -> Optional[str]:
+        chain = []
+        name = None
+        while pid in by_pid and pid not in owner and pid not in chain:
+            chain.append(pid)
+            m = _instance_arg(by_pid[pid].command)
+            if m:
+                name = m.group(1).strip("'\"")
+                break
+            pid = by_pid[pid].ppid
+        else:
+            name = owner.get(pid)
+        for p in chain:
+            owner[p] = name
+        return name
+
+    groups: dict[str, list[ProcRow]] = {}
+    for r in rows:
+        name = _owner(r.pid)
+        if name:
+            groups.setdefault(name, []).append(r)
+    return groups
+
+
+# ─── Disk I/O counters ───────────────────────────────────────────────────────
+
+class _RUsageInfoV2(ctypes.Structure):
+    _fields_ = [
+        ("ri_uuid", ctypes.c_uint8 * 16),
+        ("ri_user_time", ctypes.c_uint64),
+        ("ri_system_time", ctypes.c_uint64),
+        ("ri_pkg_idle_wkups", ctypes.c_uint64),
+        ("ri_interrupt_wkups", ctypes.c_uint64),
+        ("ri_pageins", ctypes.c_uint64),
+        ("ri_wired_size", ctypes.c_uint64),
+        ("ri_resident_size", ctypes.c_uint64),
+        ("ri_phys_footprint", ctypes.c_uint64),
+        ("ri_proc_start_abstime", ctypes.c_uint64),
+        ("ri_proc_exit_abstime", ctypes.c_uint64),
+        ("ri_child_user_time", ctypes.c_uint64),
+        ("ri_child_system_time", ctypes.c_uint64),
+        ("ri_child_pkg_idle_wkups", ctypes.c_uint64),
+        ("ri_child_interrupt_wkups", ctypes.c_uint64),
+        ("ri_child_pageins", ctypes.c_uint64),
+        ("ri_child_elapsed_abstime", ctypes.c_uint64),
+        ("ri_diskio_bytesread", ctypes.c_uint64),
+        ("ri_diskio_byteswritten", ctypes.c_uint64),
+    ]
+
+
+_RUSAGE_INFO_V2 = 2
+_libproc = None
+if sys.platform == "darwin":
+    try:
+        _libproc = ctypes.CDLL(ctypes.util.find_library("proc") or "/usr/lib/libproc.dylib")
+    except OSError:
+        _libproc = None
+
+
+def _disk_io_darwin(pid: int) -> Optional[tuple[int, int]]:
+    info = _RUsageInfoV2()
+    if _libproc.proc_pid_rusage(pid, _RUSAGE_INFO_V2, ctypes.byref(info)) != 0:
+        return None
+    return info.ri_diskio_bytesread, info.ri_diskio_byteswritten
+
+
+def _disk_io_linux(pid: int) -> Optional[tuple[int, int]]:
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            vals = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(vals["read_bytes"]), int(vals["write_bytes"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def disk_io(pid: int) -> Optional[tuple[int, int]]:
+    """Cumulative (bytes_read, bytes_written) for a process, or None."""
+    if _libproc is not None:
+        return _disk_io_darwin(pid)
+    if sys.platform.startswith("linux"):
+        return _disk_io_linux(pid)
+    return None
+
+
+# ─── Sampler ─────────────────────────────────────────────────────────────────
+
+class TelemetrySampler:
+    """Background sampler keeping a ring buffer of usage per instance.
+
+    on_sample: optional callback(latest: dict[name, dict]) after each tick.
+    """
+
+    def __init__(
+        self,
+        interval: float = POLL_INTERVAL,
+        history: int = HISTORY_LEN,
+        on_sample: Optional[Callable[[dict], None]] = None,
+    ):
+        self._interval = interval
+        self._history_len = history
+        self._on_sample = on_sample
+
+        self._lock = threading.Lock()
+        self._buffers: dict[str, deque] = {}
+        # pid -> (cpu_secs, read_bytes, write_bytes) from the previous tick
+        self._prev: dict[int, tuple[float, Optional[int], Optional[int]]] = {}
+        self._prev_t: Optional[float] = None
+
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ── Lifecycle ──
+
+    def start(self, interval: Optional[float] = None):
+        """Start (or restart with a new interval) the sampler thread."""
+        if interval:
+            self._interval = max(0.5, float(interval))
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="telemetry")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=self._interval + 2)
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                latest = self.sample_once()
+                if self._on_sample:
+                    self._on_sample(latest)
+            except Exception:
+                pass
+            self._stop.wait(timeout=self._interval)
+
+    # ── Sampling ──
+
+    def sample_once(self) -> dict[str, dict]:
+        """Take one process-table snapshot and append to every instance's buffer."""
+        now = time.monotonic()
+        groups = map_instances(snapshot_processes())
+        dt = (now - self._prev_t) if self._prev_t is not None else None
+
+        prev, cur = self._prev, {}
+        samples: dict[str, TelemetrySample] = {}
+        for name, procs in groups.items():
+            cpu_delta = 0.0
+            rd_delta = wr_delta = 0
+            have_cpu = have_io = False
+            io_ok = True
+            for p in procs:
+                io = disk_io(p.pid)
+                cur[p.pid] = (p.cpu_secs, io[0] if io else None, io[1] if io else None)
+                if io is None:
+                    io_ok = False
+                old = prev.get(p.pid)
+                if old is None:
+                    continue
+                cpu_delta += max(0.0, p.cpu_secs - old[0])
+                have_cpu = True
+                if io and old[1] is not None:
+                    rd_delta += max(0, io[0] - old[1])
+                    wr_delta += max(0, io[1] - old[2])
+                    have_io = True
+
+            rate = dt and dt > 0
+            samples[name] = TelemetrySample(
+                t=time.time(),
+                cpu_pct=round(cpu_delta / dt * 100, 1) if rate and have_cpu else None,
+                rss_mb=round(sum(p.rss_kb for p in procs) / 1024, 1),
+                read_mb_s=round(rd_delta / dt / 1048576, 2) if rate and have_io and io_ok else None,
+                write_mb_s=round(wr_delta / dt / 1048576, 2) if rate and have_io and io_ok else None,
+                pids=len(procs),
+            )
+
+        with self._lock:
+            self._prev, self._prev_t = cur, now
+            for name, s in samples.items():
+                buf = self._buffers.get(name)
+                if buf is None:
+                    buf = self._buffers[name] = deque(maxlen=self._history_len)
+                buf.append(s)
+            # Instances that stopped keep their history but get no new samples
+        return {name: asdict(s) for name, s in samples.items()}
+
+    # ── Queries ──
+
+    def latest(self) -> dict[str, dict]:
+        """Most recent sample per instance that was running on the last tick."""
+        with self._lock:
+            cutoff = time.time() - self._interval * 2 - 1
+            return {name: asdict(buf[-1]) for name, buf in self._buffers.items()
+                    if buf and buf[-1].t >= cutoff}
+
+    def history(self, name: str) -> list[dict]:
+        """Buffered samples for one instance, oldest first."""
+        with self._lock:
+            return [asdict(s) for s in self._buffers.get(name, ())]
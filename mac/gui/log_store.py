@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Log Store — rotating, compressed on-disk log with an index for search.
+
+The log panel only lives in the webview DOM, so output from a long run is
+gone after a restart.  The store is a second sink next to the UI: every
+forwarded line is appended to a gzip-compressed JSONL segment under the
+log directory, one record per line:
+
+    {"t": 1730000000.123, "op": "3f9c2a7d1b04", "m": "[ok] Tiramisu64_3 cloned"}
+
+"op" is the operation journal ID of the job that printed the line (empty
+outside jobs).  A segment is closed once it holds SEGMENT_BYTES of
+uncompressed text, and the oldest segments are deleted beyond
+MAX_SEGMENTS.  Each new process starts a new segment.
+
+index.json records, per segment, its time range and which operation IDs
+and instance names (any BlueStacks-style <Name><bits>[_N]: Tiramisu64,
+Pie64_2, ...) occur in it, so search() only decompresses the segments
+that can match and streams them line by line instead of loading them:
+
+    store.search("adb", op_id="3f9c2a7d1b04", instance="Tiramisu64_3")
+
+A small in-memory tail (TAIL_LINES) serves tail() without touching disk.
+Progress lines that the capture replaces in place ("r" entries) are kept
+as one line: the first and the final state are written, not every update.
+
+Requires: nothing beyond the standard library
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+# Uncompressed bytes per segment before rotating
+SEGMENT_BYTES = 4 * 1024 * 1024
+
+# Closed segments kept on disk (oldest deleted first)
+MAX_SEGMENTS = 32
+
+# Lines kept in memory for tail()
+TAIL_LINES = 1000
+
+# Seconds between sync-flushes of the open segment (readable after a crash)
+SYNC_SECS = 2.0
+
+# BlueStacks instance folder names: codename + bitness, then _N for clones
+_INSTANCE_RE = re.compile(r"\b[A-Z][A-Za-z]*\d+(?:_\d+)?\b")
+
+# Bumped when segment summaries change meaning; older ones are rebuilt
+_INDEX_VERSION = 2
+_SEG_RE = re.compile(r"^seg-(\d{6})\.jsonl\.gz$")
+
+
+class LogStore:
+    """Append-only segmented log; see the module docstring."""
+
+    def __init__(self, directory: str, segment_bytes: int = SEGMENT_BYTES,
+                 max_segments: int = MAX_SEGMENTS, tail_lines: int = TAIL_LINES):
+        self._dir = directory
+        self._segment_bytes = segment_bytes
+        self._max_segments = max_segments
+        self._tail: deque = deque(maxlen=tail_lines)
+        self._lock = threading.RLock()
+        self._index: dict[str, dict] = {}     # segment file -> summary
+        self._opened = False
+        self._gz = None
+        self._seg: Optional[str] = None
+        self._seg_bytes = 0
+        self._last_sync = 0.0
+        self._progress: Optional[dict] = None  # latest unwritten "r" update
+        self.counters = {"lines": 0, "segments_rotated": 0, "segments_deleted": 0}
+
+    # ── Writing ──
+
+    def append(self, entries):
+        """Store a LogCapture batch: [[kind, text, op_id?], ...]."""
+        now = round(time.time(), 3)
+        with self._lock:
+            self._open()
+            for entry in entries:
+                kind, text = entry[0], entry[1]
+                op_id = entry[2] if len(entry) > 2 else ""
+                rec = {"t": now, "op": op_id, "m": text}
+                if kind == "r":
+                    self._progress = rec            # written when the line settles
+                    continue
+                self._settle_progress()
+                self._write(rec)
+            if time.monotonic() - self._last_sync >= SYNC_SECS:
+                self._sync()
+
+    def flush(self):
+        """Write the pending progress line and sync the open segment."""
+        with self._lock:
+            if not self._opened:
+                return
+            self._settle_progress()
+            self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._gz is None:
+                return
+            self._settle_progress()
+            self._gz.close()
+            self._gz = None
+            self._save_index()
+
+    # ── Reading ──
+
+    def tail(self, limit: int = 200) -> list[dict]:
+        """Most recent lines, oldest first."""
+        with self._lock:
+            items = list(self._tail)
+        return items[-limit:] if limit else items
+
+    def segments(self) -> list[dict]:
+        """Index entries, newest first (ops / instances reduced to counts)."""
+        with self._lock:
+            self._open()
+            return [{"segment": name, "first_ts": s["first_ts"], "last_ts": s["last_ts"],
+                     "lines": s["lines"], "bytes": s["bytes"],
+                     "ops": len(s["ops"]), "instances": sorted(s["instances"])}
+                    for name, s in sorted(self._index.items(), reverse=True)]
+
+    def search(self, query: str = "", op_id: str = "", instance: str = "",
+               limit: int = 200, regex: bool = False) -> dict:
+        """Matching lines, newest first.
+
+        query: case-insensitive substring (or a regex when regex=True);
+        op_id / instance narrow both the segments read and the lines kept.
+        """
+        if regex:
+            pattern = re.compile(query, re.IGNORECASE)
+            match_text = pattern.search
+        else:
+            needle = query.lower()
+            match_text = lambda m: needle in m.lower()
+        limit = max(1, int(limit))
+        inst_re = re.compile(rf"\b{re.escape(instance)}\b") if instance else None
+        # Only names the index records can narrow the segments
+        indexed = bool(instance) and _INSTANCE_RE.fullmatch(instance) is not None
+
+        with self._lock:
+            self._open()
+            self._settle_progress()
+            self._sync()
+            order = sorted(self._index.items(), reverse=True)
+        candidates = [name for name, s in order
+                      if (not op_id or op_id in s["ops"])
+                      and (not indexed or instance in s["instances"])]
+
+        matches: list[dict] = []
+        for name in candidates:
+            found: deque = deque(maxlen=limit - len(matches))
+            for lineno, rec in self._iter_segment(name):
+                msg = rec.get("m", "")
+                if op_id and rec.get("op") != op_id:
+                    continue
+                if inst_re and not inst_re.search(msg):
+                    continue
+                if query and not match_text(msg):
+                    continue
+                found.append(dict(rec, segment=name, line=lineno))
+            matches.extend(reversed(found))
+            if len(matches) >= limit:
+                break
+        return {"matches": matches, "segments_scanned": len(candidates),
+                "segments_skipped": len(order) - len(candidates)}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, segments=len(self._index),
+                        current=self._seg, tail=len(self._tail))
+
+    # ── Internals (lock held unless noted) ──
+
+    def _open(self):
+        if self._opened:
+            return
+        self._opened = True
+        os.makedirs(self._dir, exist_ok=True)
+        try:
+            with open(self._path("index.json")) as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+        on_disk = sorted(n for n in os.listdir(self._dir) if _SEG_RE.match(n))
+        self._index = {n: s for n, s in self._index.items()
+                       if n in on_disk and s.get("v") == _INDEX_VERSION}
+        for name in on_disk:
+            if name not in self._index:
+                self._index[name] = self._rebuild(name)   # e.g. not closed cleanly
+        seq = int(_SEG_RE.match(on_disk[-1]).group(1)) + 1 if on_disk else 1
+        self._start_segment(seq)
+
+    def _start_segment(self, seq: int):
+        self._seg = f"seg-{seq:06d}.jsonl.gz"
+        self._gz = gzip.open(self._path(self._seg), "wb", compresslevel=6)
+        self._seg_bytes = 0
+        self._index[self._seg] = _empty_summary()
+        self._prune()
+        self._save_index()
+
+    def _rotate(self):
+        self._gz.close()
+        self.counters["segments_rotated"] += 1
+        seq = int(_SEG_RE.match(self._seg).group(1)) + 1
+        self._start_segment(seq)
+
+    def _write(self, rec: dict):
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        data = line.encode("utf-8")
+        self._gz.write(data)
+        self._seg_bytes += len(data)
+        self._tail.append(rec)
+        self.counters["lines"] += 1
+        _note(self._index[self._seg], rec, len(data))
+        if self._seg_bytes >= self._segment_bytes:
+            self._rotate()
+
+    def _settle_progress(self):
+        if self._progress is not None:
+            rec, self._progress = self._progress, None
+            self._write(rec)
+
+    def _sync(self):
+        if self._gz is not None:
+            try:
+                self._gz.flush()       # Z_SYNC_FLUSH: everything so far is decodable
+            except OSError:
+                pass
+        self._last_sync = time.monotonic()
+        self._save_index()
+
+    def _prune(self):
+        names = sorted(self._index)
+        for name in names[:max(0, len(names) - self._max_segments - 1)]:
+            try:
+                os.unlink(self._path(name))
+            except OSError:
+                pass
+            del self._index[name]
+            self.counters["segments_deleted"] += 1
+
+    def _save_index(self):
+        tmp = self._path("index.json.tmp")
+        try:
+            with open(tmp, "w") as f:
+                json.dump(self._index, f)
+            os.replace(tmp, self._path("index.json"))
+        except OSError:
+            pass
+
+    def _rebuild(self, name: str) -> dict:
+        summary = _empty_summary()
+        for _, rec in self._iter_segment(name):
+            _note(summary, rec, len(rec.get("m", "")) + 40)
+        return summary
+
+    def _iter_segment(self, name: str):
+        """(line number, record) from one segment, streamed (no lock needed)."""
+        try:
+            with gzip.open(self._path(name), "rt", encoding="utf-8") as f:
+                for lineno, line in enumerate(f, 1):
+                    try:
+                        yield lineno, json.loads(line)
+                    except ValueError:
+                        continue
+        except (OSError, EOFError):
+            return          # open segment without an end marker, or truncated
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self._dir, name)
+
+
+def _empty_summary() -> dict:
+    return {"v": _INDEX_VERSION, "first_ts": None, "last_ts": None, "lines": 0, "bytes": 0,
+            "ops": {}, "instances": {}}
+
+
+def _note(summary: dict, rec: dict, nbytes: int):
+    summary["first_ts"] = summary["first_ts"] or rec["t"]
+    summary["last_ts"] = rec["t"]
+    summary["lines"] += 1
+    summary["bytes"] += nbytes
+    if rec.get("op"):
+        summary["ops"][rec["op"]] = summary["ops"].get(rec["op"], 0) + 1
+    for name in set(_INSTANCE_RE.findall(rec.get("m", ""))):
+        summary["instances"][name] = summary["instances"].get(name, 0) + 1
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Operation Journal — persistent history of Api operations with step timings.
+
+Every scheduler job (clone, delete, download, randomize, ...) becomes one
+record appended to a JSONL file when it finishes:
+
+    {"id": "...", "kind": "clone", "label": "Clone 3 instance(s)",
+     "started": 1730000000.0, "ended": 1730000123.4, "secs": 123.4,
+     "outcome": "done" | "failed" | "cancelled",
+     "error": "", "bytes": 12884901888,
+     "steps": [{"name": "copy", "instance": "Tiramisu64_3",
+                "secs": 41.2, "bytes": 4294967296, "ok": true}, ...]}
+
+Steps are recorded from inside the operation's thread without passing
+anything around:
+
+    with op_journal.step("copy", instance=name):
+        ...
+    op_journal.add_bytes(n)            # credited to the innermost step
+    op_journal.record_step("boot_wait", secs, instance=name)
+    op_journal.fail("bluestacks.conf locked")
+
+All of these are no-ops when the calling thread has no open operation, so
+library code (clone_instance) can call them unconditionally.
+
+stats() aggregates the journal per day and per kind: p50/p95 durations,
+per-instance clone times, copy throughput (MB/s) and failure counts.
+rates() condenses the same history into the inputs the batch planner uses
+for its duration estimates.
+
+Requires: nothing beyond the standard library
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+# Rotate the journal (keeping one previous file) past this size
+MAX_BYTES = 4 * 1024 * 1024
+
+_local = threading.local()
+
+
+class Operation:
+    """An open journal record. Finished with Journal.finish()."""
+
+    def __init__(self, kind: str, label: str, meta: Optional[dict] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.label = label
+        self.meta = dict(meta or {})
+        self.started = time.time()
+        self.bytes = 0
+        self.steps: list[dict] = []
+        self.error = ""
+        self.failed = False
+        self._stack: list[dict] = []
+        self._lock = threading.Lock()
+
+    def record_step(self, name: str, secs: float, instance: str = "",
+                    bytes_moved: int = 0, ok: bool = True):
+        with self._lock:
+            self.steps.append({"name": name, "instance": instance,
+                               "secs": round(secs, 2), "bytes": bytes_moved, "ok": ok})
+
+    def add_bytes(self, n: int):
+        with self._lock:
+            self.bytes += n
+            if self._stack:
+                self._stack[-1]["bytes"] += n
+
+    @contextlib.contextmanager
+    def step(self, name: str, instance: str = ""):
+        entry = {"bytes": 0}
+        self._stack.append(entry)
+        t0 = time.monotonic()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            self._stack.pop()
+            self.record_step(name, time.monotonic() - t0, instance, entry["bytes"], ok)
+
+    def fail(self, error: str):
+        self.failed = True
+        self.error = self.error or str(error)
+
+
+class Journal:
+    """Append-only JSONL journal of finished operations."""
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+
+    # ── Recording ──
+
+    def begin(self, kind: str, label: str, meta: Optional[dict] = None) -> Operation:
+        """Open an operation and make it current for the calling thread."""
+        op = Operation(kind, label, meta)
+        _local.op = op
+        return op
+
+    def finish(self, op: Operation, outcome: str = "done", error: str = ""):
+        """Close op and append its record. A recorded fail() overrides "done"."""
+        if getattr(_local, "op", None) is op:
+            _local.op = None
+        if error:
+            op.fail(error)
+        if op.failed and outcome == "done":
+            outcome = "failed"
+        ended = time.time()
+        rec = {
+            "id": op.id,
+            "kind": op.kind,
+            "label": op.label,
+            "started": round(op.started, 3),
+            "ended": round(ended, 3),
+            "secs": round(ended - op.started, 2),
+            "outcome": outcome,
+            "error": op.error,
+            "bytes": op.bytes,
+            "steps": op.steps,
+            "meta": op.meta,
+        }
+        line = json.dumps(rec) + "\n"
+        with self._lock:
+            try:
+                if os.path.getsize(self._path) > MAX_BYTES:
+                    os.replace(self._path, self._path + ".1")
+            except OSError:
+                pass
+            try:
+                with open(self._path, "a") as f:
+                    f.write(line)
+            except OSError:
+                pass
+        return rec
+
+    # ── Queries ──
+
+    def records(self, since: float = 0.0) -> list[dict]:
+        """All records (oldest first) that ended at or after since."""
+        out = []
+        with self._lock:
+            for path in (self._path + ".1", self._path):
+                try:
+                    with open(path) as f:
+                        for line in f:
+                            try:
+                                rec = json.loads(line)
+                            except ValueError:
+                                continue   # torn write from a crash
+                            if rec.get("ended", 0) >= since:
+                                out.append(rec)
+                except OSError:
+                    continue
+        return out
+
+    def recent(self, limit: int = 50) -> list[dict]:
+        """Most recent records, newest first."""
+        return list(reversed(self.records()[-limit:]))
+
+    def stats(self, days: int = 14) -> dict:
+        """Per-day and per-kind aggregates over the last `days` days."""
+        since = time.time() - days * 86400
+        recs = self.records(since)
+
+        by_day: dict[str, dict] = {}
+        by_kind: dict[str, list[dict]] = {}
+        step_secs: dict[str, list[float]] = {}
+        for rec in recs:
+            day = time.strftime("%Y-%m-%d", time.localtime(rec["started"]))
+            d = by_day.setdefault(day, {"ops": 0, "failed": 0, "bytes": 0,
+                                        "clone_secs": [], "copy_bytes": 0, "copy_secs": 0.0})
+            d["ops"] += 1
+            d["failed"] += rec["outcome"] == "failed"
+            d["bytes"] += rec.get("bytes", 0)
+            by_kind.setdefault(rec["kind"], []).append(rec)
+            for st in rec.get("steps", []):
+                step_secs.setdefault(st["name"], []).append(st["secs"])
+                if st["name"] == "clone" and st.get("ok"):
+                    d["clone_secs"].append(st["secs"])
+                if st.get("bytes") and st["name"] in ("copy", "download"):
+                    d["copy_bytes"] += st["bytes"]
+                    d["copy_secs"] += st["secs"]
+
+        day_rows = []
+        for day in sorted(by_day):
+            d = by_day[day]
+            clone = sorted(d["clone_secs"])
+            day_rows.append({
+                "date": day,
+                "ops": d["ops"],
+                "failed": d["failed"],
+                "bytes": d["bytes"],
+                "clones": len(clone),
+                "clone_p50_secs": percentile(clone, 50),
+                "clone_p95_secs": percentile(clone, 95),
+                "copy_mb_s": (round(d["copy_bytes"] / 1048576 / d["copy_secs"], 1)
+                              if d["copy_secs"] > 0 else None),
+            })
+
+        kind_rows = {}
+        for kind, rs in by_kind.items():
+            secs = sorted(r["secs"] for r in rs if r["outcome"] == "done")
+            kind_rows[kind] = {
+                "count": len(rs),
+                "failed": sum(r["outcome"] == "failed" for r in rs),
+                "p50_secs": percentile(secs, 50),
+                "p95_secs": percentile(secs, 95),
+            }
+
+        step_rows = {name: {"count": len(v),
+                            "p50_secs": percentile(sorted(v), 50),
+                            "p95_secs": percentile(sorted(v), 95)}
+                     for name, v in step_secs.items()}
+
+        return {"days": day_rows, "kinds": kind_rows, "steps": step_rows}
+
+    def rates(self, days: int = 30) -> dict:
+        """Historical throughput for estimates: overall copy MB/s and p50 per step."""
+        copy_bytes, copy_secs = 0, 0.0
+        step_secs: dict[str, list[float]] = {}
+        for rec in self.records(time.time() - days * 86400):
+            for st in rec.get("steps", []):
+                if not st.get("ok"):
+                    continue
+                step_secs.setdefault(st["name"], []).append(st["secs"])
+                if st.get("bytes") and st["name"] == "copy":
+                    copy_bytes += st["bytes"]
+                    copy_secs += st["secs"]
+        return {
+            "copy_mb_s": round(copy_bytes / 1048576 / copy_secs, 1) if copy_secs > 0 else None,
+            "copy_samples": len(step_secs.get("copy", [])),
+            "step_p50_secs": {name: percentile(sorted(v), 50) for name, v in step_secs.items()},
+        }
+
+
+def percentile(sorted_vals: list[float], pct: float) -> Optional[float]:
+    if not sorted_vals:
+        return None
+    k = (len(sorted_vals) - 1) * pct / 100.0
+    lo, hi = math.floor(k), math.ceil(k)
+    return round(sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo), 1)
+
+
+# ─── Thread-local helpers (no-ops outside an operation) ──────────────────────
+
+def current() -> Optional[Operation]:
+    return getattr(_local, "op", None)
+
+
+def step(name: str, instance: str = ""):
+    """Context manager timing a step of the current operation."""
+    op = current()
+    return op.step(name, instance) if op else contextlib.nullcontext()
+
+
+def record_step(name: str, secs: float, instance: str = "", bytes_moved: int = 0, ok: bool = True):
+    op = current()
+    if op:
+        op.record_step(name, secs, instance, bytes_moved, ok)
+
+
+def add_bytes(n: int):
+    op = current()
+    if op:
+        op.add_bytes(n)
+
+
+def fail(error: str):
+    op = current()
+    if op:
+        op.fail(error)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Progress Reporter — rate-limited progress with smoothed throughput and ETA.
+
+Copy and download loops see a chunk every few hundred KB, so reporting on
+every chunk means thousands of UI updates for the same percentage.  The
+reporter sits between the loop and whatever displays progress:
+
+    rep = ProgressReporter(total_bytes, on_update, max_hz=4)
+    for chunk in ...:
+        rep.advance(len(chunk))
+    rep.finish()
+
+on_update(ProgressUpdate) fires at most ``max_hz`` times a second and only
+when the displayed value (integer percent, or whole MB when the total is
+unknown) has changed; finish() always reports the final state.  Throughput
+is an exponentially weighted moving average over the intervals between
+reports, so the ETA doesn't jump with every stalled or bursty read.
+
+Requires: nothing beyond the standard library
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# Default ceiling on reports per second
+MAX_HZ = 4.0
+
+# EWMA weight of the newest throughput sample (0..1)
+SMOOTHING = 0.3
+
+
+@dataclass
+class ProgressUpdate:
+    done: int
+    total: int                    # 0 when unknown
+    pct: int                      # -1 when total is unknown
+    rate_bps: Optional[float]     # smoothed bytes/second
+    eta_secs: Optional[int]
+    elapsed_secs: float
+    final: bool = False
+
+    @property
+    def rate_mb_s(self) -> Optional[float]:
+        return round(self.rate_bps / 1048576, 1) if self.rate_bps is not None else None
+
+    def to_dict(self) -> dict:
+        return {
+            "done": self.done, "total": self.total, "pct": self.pct,
+            "rate_mb_s": self.rate_mb_s, "eta_secs": self.eta_secs,
+            "elapsed_secs": round(self.elapsed_secs, 1), "final": self.final,
+        }
+
+    def describe(self) -> str:
+        """'1024/4096 MB (25%) · 210.4 MB/s · 15s left' — for log lines."""
+        mb_done, mb_total = self.done // 1048576, self.total // 1048576
+        text = f"{mb_done}/{mb_total} MB ({self.pct}%)" if self.total else f"{mb_done} MB"
+        if self.rate_bps:
+            text += f" · {self.rate_mb_s} MB/s"
+        if self.eta_secs is not None and not self.final:
+            text += f" · {fmt_secs(self.eta_secs)} left"
+        return text
+
+
+class ProgressReporter:
+    """Turns a stream of byte counts into throttled ProgressUpdates."""
+
+    def __init__(
+        self,
+        total: int,
+        on_update: Callable[[ProgressUpdate], None],
+        max_hz: float = MAX_HZ,
+        smoothing: float = SMOOTHING,
+        start: int = 0,
+    ):
+        """start: bytes already done before this run (a resumed download);
+        counted in progress but not in throughput."""
+        self._total = max(0, int(total or 0))
+        self._on_update = on_update
+        self._min_gap = 1.0 / max_hz if max_hz > 0 else 0.0
+        self._alpha = smoothing
+        self._t0 = time.monotonic()
+        self._done = start
+        self._rate: Optional[float] = None
+        self._sample_t = self._t0     # start of the current throughput sample
+        self._sample_done = start
+        self._last_emit = 0.0
+        self._last_value = None
+        self._finished = False
+
+    @property
+    def done(self) -> int:
+        return self._done
+
+    def advance(self, n: int):
+        self.update(self._done + n)
+
+    def update(self, done: int):
+        """Record absolute progress; reports only if due and changed."""
+        self._done = done
+        now = time.monotonic()
+        if now - self._last_emit < self._min_gap:
+            return
+        self._sample_rate(now)
+        value = self._value()
+        if value == self._last_value:
+            return
+        self._emit(now, value)
+
+    def finish(self):
+        """Report the final state once, regardless of throttling."""
+        if self._finished:
+            return
+        self._finished = True
+        now = time.monotonic()
+        self._sample_rate(now, force=self._rate is None)
+        if self._total and self._done > self._total:
+            self._total = self._done      # server under-reported Content-Length
+        self._emit(now, self._value(), final=True)
+
+    # ── Internals ──
+
+    def _value(self):
+        if self._total:
+            return min(100, self._done * 100 // self._total)
+        return self._done // 1048576
+
+    def _sample_rate(self, now: float, force: bool = False):
+        dt = now - self._sample_t
+        if dt <= 0 or (dt < max(self._min_gap, 0.05) and not force):
+            return
+        inst = (self._done - self._sample_done) / dt
+        self._rate = inst if self._rate is None else self._alpha * inst + (1 - self._alpha) * self._rate
+        self._sample_t, self._sample_done = now, self._done
+
+    def _emit(self, now: float, value, final: bool = False):
+        self._last_emit, self._last_value = now, value
+        eta = None
+        if self._total and self._rate:
+            eta = int(max(0, self._total - self._done) / self._rate)
+        upd = ProgressUpdate(
+            done=self._done,
+            total=self._total,
+            pct=value if self._total else -1,
+            rate_bps=self._rate,
+            eta_secs=0 if final else eta,
+            elapsed_secs=now - self._t0,
+            final=final,
+        )
+        try:
+            self._on_update(upd)
+        except Exception:
+            pass
+
+
+def fmt_secs(secs: int) -> str:
+    if secs < 60:
+        return f"{secs}s"
+    if secs < 3600:
+        return f"{secs // 60}m {secs % 60:02d}s"
+    return f"{secs // 3600}h {secs % 3600 // 60:02d}m"
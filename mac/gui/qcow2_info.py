@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Qcow2 Info — read-only qcow2 metadata reader.
+
+data.qcow2 used to be an opaque blob with an apparent file size.  This
+reads only the metadata of the image through a read-only memory map (the
+header and its extensions, the L1 and L2 tables, the refcount table and
+blocks, the snapshot table) and never touches a data cluster, so even a
+multi-GB image is summarised in milliseconds:
+
+    info = read_info("/engine/Tiramisu64/data.qcow2")
+    info.virtual_size, info.allocated_bytes, info.backing_file
+    info.dirty, info.corrupt, info.fragmentation, info.snapshots
+
+Allocation comes from the L2 tables of the active image: a cluster with
+a host offset (or a compressed descriptor) is allocated, one with only
+the zero flag reads as zeros.  Fragmentation is measured in guest order:
+``fragments`` counts the runs of consecutive guest clusters that are
+also consecutive on the host, and ``fragmentation`` is the share of
+allocated clusters that start a new run (0.0 = one contiguous extent).
+
+The reader never writes.  The image of a running instance may change
+underneath it; offsets that point outside the file are reported in
+``problems`` rather than followed.
+
+    python3 qcow2_info.py data.qcow2 [--json]
+
+Requires: nothing beyond the standard library
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+# Header magic ("QFI\xfb")
+MAGIC = b"QFI\xfb"
+
+# Supported format versions
+VERSIONS = (2, 3)
+
+# Sanity limit on L1 / refcount table entries read (32 M entries)
+MAX_TABLE_ENTRIES = 32 * 1024 * 1024
+
+_HEADER_V2 = struct.Struct(">4sIQIIQIIQQIIQ")       # 72 bytes
+_HEADER_V3 = struct.Struct(">QQQII")                # bytes 72..104
+
+# Incompatible feature bits
+_INCOMPAT_DIRTY = 1 << 0
+_INCOMPAT_CORRUPT = 1 << 1
+_INCOMPAT_DATA_FILE = 1 << 2
+_INCOMPAT_COMPRESSION = 1 << 3
+_INCOMPAT_EXTL2 = 1 << 4
+
+# Compatible feature bits
+_COMPAT_LAZY_REFCOUNTS = 1 << 0
+
+# Header extension types
+_EXT_END = 0x00000000
+_EXT_BACKING_FORMAT = 0xE2792ACA
+_EXT_DATA_FILE = 0x44415441
+
+# Table entry fields
+_OFFSET_MASK = 0x00FFFFFFFFFFFE00
+_L2_COMPRESSED = 1 << 62
+_L2_ZERO = 1 << 0
+
+
+class Qcow2Error(ValueError):
+    """Not a qcow2 image, or one this reader can't parse."""
+
+
+@dataclass
+class Snapshot:
+    id: str
+    name: str
+    date: float                 # seconds since the epoch
+    vm_state_size: int
+    disk_size: Optional[int]    # virtual size at snapshot time (v3)
+
+
+@dataclass
+class Qcow2Info:
+    path: str
+    version: int
+    cluster_size: int
+    virtual_size: int
+    file_size: int
+    backing_file: Optional[str] = None
+    backing_format: Optional[str] = None
+    data_file: Optional[str] = None
+    encrypted: bool = False
+    dirty: bool = False
+    corrupt: bool = False
+    lazy_refcounts: bool = False
+    extended_l2: bool = False
+    compression_type: str = "zlib"
+    refcount_bits: int = 16
+    snapshots: list[Snapshot] = field(default_factory=list)
+    l2_tables: int = 0
+    allocated_clusters: int = 0
+    compressed_clusters: int = 0
+    zero_clusters: int = 0
+    referenced_clusters: Optional[int] = None   # host clusters with refcount > 0
+    fragments: int = 0
+    problems: list[str] = field(default_factory=list)
+    secs: float = 0.0
+
+    @property
+    def allocated_bytes(self) -> int:
+        return self.allocated_clusters * self.cluster_size
+
+    @property
+    def fragmentation(self) -> float:
+        standard = self.allocated_clusters - self.compressed_clusters
+        if standard <= 1:
+            return 0.0
+        return round((self.fragments - 1) / (standard - 1), 4)
+
+    def describe(self) -> str:
+        flags = [f for f, on in (("dirty", self.dirty), ("CORRUPT", self.corrupt),
+                                 ("encrypted", self.encrypted)) if on]
+        text = (f"qcow2 v{self.version}, {_gb(self.virtual_size)} virtual, "
+                f"{_gb(self.allocated_bytes)} allocated in {self.fragments} extent(s), "
+                f"{len(self.snapshots)} snapshot(s)")
+        if self.backing_file:
+            text += f", backing {self.backing_file}"
+        if flags:
+            text += f" [{', '.join(flags)}]"
+        return text
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d.update(allocated_bytes=self.allocated_bytes, fragmentation=self.fragmentation,
+                 secs=round(self.secs, 4), summary=self.describe())
+        return d
+
+
+def _gb(n: int) -> str:
+    return f"{n / (1024 ** 3):.1f} GB"
+
+
+def is_qcow2(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(4) == MAGIC
+    except OSError:
+        return False
+
+
+def read_info(path: str, refcounts: bool = True) -> Qcow2Info:
+    """Parse the metadata of the qcow2 image at path (refcounts False
+    skips the refcount walk)."""
+    t0 = time.monotonic()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _HEADER_V2.size:
+            raise Qcow2Error("file too small for a qcow2 header")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            try:
+                info = _parse(mm, path, size, refcounts)
+            except struct.error as e:
+                raise Qcow2Error(f"truncated metadata: {e}") from e
+    info.secs = time.monotonic() - t0
+    return info
+
+
+# ── Parsing ──
+
+def _parse(mm, path: str, size: int, refcounts: bool) -> Qcow2Info:
+    (magic, version, backing_off, backing_len, cluster_bits, virtual_size, crypt,
+     l1_size, l1_off, rc_off, rc_clusters, nb_snapshots, snap_off) = _HEADER_V2.unpack_from(mm, 0)
+    if magic != MAGIC:
+        raise Qcow2Error("not a qcow2 image")
+    if version not in VERSIONS:
+        raise Qcow2Error(f"unsupported qcow2 version {version}")
+    if not 9 <= cluster_bits <= 21:
+        raise Qcow2Error(f"invalid cluster size 2^{cluster_bits}")
+    incompat = compat = 0
+    refcount_order, header_len, compression = 4, _HEADER_V2.size, 0
+    if version >= 3:
+        if size < _HEADER_V2.size + _HEADER_V3.size:
+            raise Qcow2Error("truncated v3 header")
+        incompat, compat, _autoclear, refcount_order, header_len = \
+            _HEADER_V3.unpack_from(mm, _HEADER_V2.size)
+        if header_len > 104:
+            compression = mm[104]
+    cluster = 1 << cluster_bits
+    info = Qcow2Info(path=path, version=version, cluster_size=cluster,
+                     virtual_size=virtual_size, file_size=size,
+                     encrypted=crypt != 0,
+                     dirty=bool(incompat & _INCOMPAT_DIRTY),
+                     corrupt=bool(incompat & _INCOMPAT_CORRUPT),
+                     lazy_refcounts=bool(compat & _COMPAT_LAZY_REFCOUNTS),
+                     extended_l2=bool(incompat & _INCOMPAT_EXTL2),
+                     compression_type="zstd" if (incompat & _INCOMPAT_COMPRESSION) and compression == 1 else "zlib",
+                     refcount_bits=1 << refcount_order)
+    if incompat & ~0x1F:
+        info.problems.append(f"unknown incompatible features 0x{incompat & ~0x1F:x}")
+
+    _read_extensions(mm, info, header_len, cluster, size)
+    if backing_off and backing_len:
+        if backing_off + backing_len <= size and backing_len <= 1023:
+            info.backing_file = bytes(mm[backing_off:backing_off + backing_len]).decode("utf-8", "replace")
+        else:
+            info.problems.append("backing file name lies outside the image")
+    if info.data_file is None and incompat & _INCOMPAT_DATA_FILE:
+        info.problems.append("external data file without a name")
+    info.snapshots = _read_snapshots(mm, info, nb_snapshots, snap_off, size)
+    _walk_l1(mm, info, l1_off, l1_size, cluster_bits, size)
+    if refcounts:
+        _walk_refcounts(mm, info, rc_off, rc_clusters, cluster, refcount_order, size)
+    return info
+
+
+def _read_extensions(mm, info: Qcow2Info, offset: int, cluster: int, size: int):
+    end = min(cluster, size)
+    while offset + 8 <= end:
+        kind, length = struct.unpack_from(">II", mm, offset)
+        if kind == _EXT_END:
+            return
+        data = bytes(mm[offset + 8:offset + 8 + length])
+        if kind == _EXT_BACKING_FORMAT:
+            info.backing_format = data.decode("ascii", "replace")
+        elif kind == _EXT_DATA_FILE:
+            info.data_file = data.decode("utf-8", "replace")
+        offset += 8 + ((length + 7) & ~7)
+
+
+def _read_snapshots(mm, info: Qcow2Info, count: int, offset: int, size: int) -> list[Snapshot]:
+    snaps = []
+    for _ in range(count):
+        if offset + 40 > size:
+            info.problems.append("snapshot table runs past the end of the image")
+            break
+        (_l1_off, _l1_size, id_len, name_len, date_s, date_ns, _clock,
+         vm_state, extra_len) = struct.unpack_from(">QIHHIIQII", mm, offset)
+        extra_off = offset + 40
+        disk_size = None
+        if extra_len >= 16 and extra_off + 16 <= size:
+            vm_state_large, disk_size = struct.unpack_from(">QQ", mm, extra_off)
+            vm_state = vm_state_large or vm_state
+        id_off = extra_off + extra_len
+        name_off = id_off + id_len
+        end = name_off + name_len
+        if end > size:
+            info.problems.append("snapshot table runs past the end of the image")
+            break
+        snaps.append(Snapshot(id=bytes(mm[id_off:name_off]).decode("utf-8", "replace"),
+                              name=bytes(mm[name_off:end]).decode("utf-8", "replace"),
+                              date=date_s + date_ns / 1e9, vm_state_size=vm_state,
+                              disk_size=disk_size))
+        offset = (end + 7) & ~7
+    return snaps
+
+
+def _table(mm, offset: int, entries: int, code: str) -> array:
+    """Big-endian table of entries at offset as a native array."""
+    a = array(code)
+    a.frombytes(mm[offset:offset + entries * a.itemsize])
+    if sys.byteorder == "little" and a.itemsize > 1:
+        a.byteswap()
+    return a
+
+
+def _walk_l1(mm, info: Qcow2Info, l1_off: int, l1_size: int, cluster_bits: int, size: int):
+    cluster = 1 << cluster_bits
+    entry_bytes = 16 if info.extended_l2 else 8
+    l2_entries = cluster // entry_bytes
+    if l1_size > MAX_TABLE_ENTRIES or l1_off + l1_size * 8 > size:
+        info.problems.append("L1 table lies outside the image")
+        return
+    if l1_size * l2_entries * cluster < info.virtual_size:
+        info.problems.append("L1 table too small for the virtual size")
+    guest_clusters = -(-info.virtual_size // cluster)
+    allocated = compressed = zero = fragments = 0
+    prev_host = -1
+    for i, l1 in enumerate(_table(mm, l1_off, l1_size, "Q")):
+        l2_off = l1 & _OFFSET_MASK
+        if not l2_off:
+            prev_host = -1
+            continue
+        if l2_off % cluster or l2_off + cluster > size:
+            info.problems.append(f"L2 table {i} at {l2_off} lies outside the image")
+            prev_host = -1
+            continue
+        info.l2_tables += 1
+        entries = _table(mm, l2_off, l2_entries * entry_bytes // 8, "Q")
+        if entry_bytes == 16:
+            entries = entries[::2]
+        remaining = guest_clusters - i * l2_entries
+        if remaining < len(entries):
+            entries = entries[:max(0, remaining)]
+        for e in entries:
+            if not e:
+                prev_host = -1
+                continue
+            if e & _L2_COMPRESSED:
+                compressed += 1
+                allocated += 1
+                prev_host = -1
+                continue
+            host = e & _OFFSET_MASK
+            if not host:
+                if e & _L2_ZERO:
+                    zero += 1
+                prev_host = -1
+                continue
+            allocated += 1
+            if host != prev_host + cluster:
+                fragments += 1
+            prev_host = host
+    info.allocated_clusters = allocated
+    info.compressed_clusters = compressed
+    info.zero_clusters = zero
+    info.fragments = fragments
+
+
+def _walk_refcounts(mm, info: Qcow2Info, rc_off: int, rc_clusters: int, cluster: int,
+                    order: int, size: int):
+    entries = rc_clusters * cluster // 8
+    if order > 6 or entries > MAX_TABLE_ENTRIES or rc_off + entries * 8 > size:
+        info.problems.append("refcount table lies outside the image")
+        return
+    code = {3: "B", 4: "H", 5: "I", 6: "Q"}.get(order)
+    referenced = 0
+    for block in _table(mm, rc_off, entries, "Q"):
+        block &= _OFFSET_MASK
+        if not block:
+            continue
+        if block % cluster or block + cluster > size:
+            info.problems.append(f"refcount block at {block} lies outside the image")
+            continue
+        data = mm[block:block + cluster]
+        if code is not None:
+            counts = array(code, data)
+            referenced += len(counts) - counts.count(0)
+        else:
+            bits = 1 << order                           # 1, 2 or 4 bits per entry
+            mask = (1 << bits) - 1
+            for byte in data:
+                for shift in range(0, 8, bits):
+                    if (byte >> shift) & mask:
+                        referenced += 1
+    info.referenced_clusters = referenced
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show qcow2 image metadata without reading data.")
+    parser.add_argument("image")
+    parser.add_argument("--json", action="store_true", help="print everything as JSON")
+    args = parser.parse_args()
+    try:
+        info = read_info(args.image)
+    except (OSError, Qcow2Error) as e:
+        print(f"{args.image}: {e}", file=sys.stderr)
+        raise SystemExit(1)
+    if args.json:
+        print(json.dumps(info.to_dict(), indent=1))
+        return
+    print(f"{args.image}: {info.describe()}")
+    print(f"  cluster size {info.cluster_size // 1024} KB, {info.l2_tables} L2 tables, "
+          f"{info.allocated_clusters} allocated ({info.compressed_clusters} compressed), "
+          f"{info.zero_clusters} zero")
+    if info.referenced_clusters is not None:
+        print(f"  {info.referenced_clusters} of {-(-info.file_size // info.cluster_size)} "
+              f"host clusters referenced ({info.refcount_bits}-bit refcounts)")
+    print(f"  fragmentation {info.fragmentation:.1%}, read in {info.secs * 1000:.1f} ms")
+    for s in info.snapshots:
+        print(f"  snapshot {s.id} {s.name!r} {time.strftime('%Y-%m-%d %H:%M', time.localtime(s.date))}")
+    for p in info.problems:
+        print(f"  ! {p}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+RPC Daemon — headless JSON-RPC 2.0 server for the Luke's Mirage backend.
+
+Serves the public methods of ``gui.Api`` over a Unix socket (default) or a
+loopback TCP port, so fleets can be scripted and the manager can run on a
+machine without a display:
+
+    python gui.py --daemon                      # DATA_DIR/mirage.sock
+    python gui.py --daemon tcp:127.0.0.1:8765
+
+Wire format: newline-delimited JSON, one message per line.
+  → {"jsonrpc": "2.0", "id": 1, "method": "refresh_instances", "params": [...]}
+  ← {"jsonrpc": "2.0", "id": 1, "result": {...}}
+Requests on one connection run concurrently on a worker pool and are
+answered as they finish, so replies may come out of order (match them by
+``id``); a slow call never holds up the ones behind it.  A JSON array of
+requests is a batch: it is executed in order and answered with one array,
+in one round trip.  ``params`` may be a list (positional) or an object
+(keyword).
+
+Everything the Api would push into the webview (log lines, progress, job
+queue, VPN status, ...) is captured by a stand-in window object and
+broadcast to every connected client as a notification.  The Api's event bus
+delivers one batch per frame, so ``args`` holds [[handler, args], ...]:
+  ← {"jsonrpc": "2.0", "method": "event",
+     "params": {"name": "onBusEvents", "args": [[["appendLogBatch", ...]]],
+                "js": "if(window..."}}
+
+The GUI attaches to a running daemon with RpcClient + remote_api_class(): the
+window's js_api becomes a thin proxy and each notification's ``js`` is
+evaluated in the window unchanged.
+
+A client that stops reading is dropped once a notification has been stuck
+on its socket for SEND_TIMEOUT seconds, so one stalled client can't hold
+up the others (or the Api thread that pushed the event).
+
+Built-in methods: ``rpc.ping``, ``rpc.methods``.
+
+Requires: nothing beyond the standard library
+"""
+from __future__ import annotations
+
+import functools
+import inspect
+import itertools
+import json
+import os
+import re
+import socket
+import socketserver
+import struct
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+# Seconds a client waits for the daemon to answer a ping
+PING_TIMEOUT = 2.0
+
+# Seconds a send to one client may block before that client is dropped
+SEND_TIMEOUT = 5.0
+
+# Requests (or batches) the daemon runs at once, across all connections
+WORKERS = 32
+
+_JS_CALL_RE = re.compile(r"window\.(\w+)\((.*)\)\s*;?\s*$", re.S)
+
+
+class RpcError(Exception):
+    """Error response from the daemon."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+# ─── Addresses ───────────────────────────────────────────────────────────────
+
+def parse_address(address: str) -> tuple[str, object]:
+    """'unix:/path', '/path' or 'tcp:host:port' → (family, target).
+
+    TCP is restricted to loopback hosts — the Api has no authentication.
+    """
+    if address.startswith("tcp:"):
+        host, _, port = address[4:].rpartition(":")
+        host = host or "127.0.0.1"
+        if host not in ("127.0.0.1", "localhost", "::1"):
+            raise ValueError(f"refusing to listen on non-loopback host {host!r}")
+        return "tcp", (host, int(port))
+    if address.startswith("unix:"):
+        address = address[5:]
+    return "unix", address
+
+
+def _connect(address: str, timeout: Optional[float] = None) -> socket.socket:
+    family, target = parse_address(address)
+    if family == "tcp":
+        return socket.create_connection(target, timeout=timeout)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    sock.connect(target)
+    return sock
+
+
+def daemon_running(address: str) -> bool:
+    """True if a daemon answers rpc.ping at address."""
+    try:
+        with _connect(address, timeout=PING_TIMEOUT) as sock:
+            sock.sendall(b'{"jsonrpc":"2.0","id":0,"method":"rpc.ping"}\n')
+            line = sock.makefile("rb").readline()
+        return json.loads(line).get("result") == "pong"
+    except (OSError, ValueError):
+        return False
+
+
+# ─── Window stand-in ─────────────────────────────────────────────────────────
+
+def parse_js_call(js: str) -> tuple[Optional[str], list]:
+    """Split 'if(window.X)window.X(a, b)' into ('X', [a, b]).
+
+    Api pushes always pass json.dumps()'d arguments, so the argument list is
+    valid JSON inside brackets.  Returns (None, []) for anything else.
+    """
+    m = _JS_CALL_RE.search(js)
+    if not m:
+        return None, []
+    try:
+        return m.group(1), json.loads(f"[{m.group(2)}]")
+    except ValueError:
+        return m.group(1), []
+
+
+class EventBridge:
+    """Replaces the pywebview window for a headless Api.
+
+    evaluate_js() turns each push into an "event" notification broadcast to
+    all connected clients.
+    """
+
+    def __init__(self, broadcast: Callable[[dict], None]):
+        self._broadcast = broadcast
+
+    def evaluate_js(self, js: str):
+        name, args = parse_js_call(js)
+        self._broadcast({
+            "jsonrpc": "2.0",
+            "method": "event",
+            "params": {"name": name, "args": args, "js": js},
+        })
+
+    def create_file_dialog(self, *args, **kwargs):
+        raise RuntimeError("file dialogs are not available in headless mode")
+
+
+# ─── Server ──────────────────────────────────────────────────────────────────
+
+def public_methods(obj, exclude: Iterable[str] = ()) -> dict[str, Callable]:
+    """Public callables of obj (what pywebview would expose as js_api)."""
+    skip = set(exclude)
+    out = {}
+    for name in dir(obj):
+        if name.startswith("_") or name in skip:
+            continue
+        attr = getattr(obj, name)
+        if callable(attr) and not inspect.isclass(attr):
+            out[name] = attr
+    return out
+
+
+def _set_send_timeout(sock: socket.socket, secs: float):
+    """SO_SNDTIMEO: sends fail after secs instead of blocking forever, while
+    reads stay blocking (settimeout() would time out idle reads too)."""
+    whole = int(secs)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO,
+                        struct.pack("ll", whole, int((secs - whole) * 1_000_000)))
+    except (OSError, AttributeError):
+        pass
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self._send_lock = threading.Lock()
+        _set_send_timeout(self.connection, SEND_TIMEOUT)
+        self.server.rpc._add_client(self)
+
+    def finish(self):
+        self.server.rpc._remove_client(self)
+        super().finish()
+
+    def send(self, msg):
+        data = (json.dumps(msg) + "\n").encode()
+        with self._send_lock:
+            self.wfile.write(data)
+            self.wfile.flush()
+
+    def drop(self):
+        """Disconnect; a half-sent message leaves the stream unusable anyway."""
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def handle(self):
+        for raw in self.rfile:
+            if raw.strip():
+                self.server.rpc.dispatch(raw, self)
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TcpServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class RpcServer:
+    """JSON-RPC server dispatching to the public methods of api.
+
+    exclude: method names not to expose (e.g. ones that need a real window).
+    """
+
+    def __init__(self, api, address: str, exclude: Iterable[str] = ()):
+        self._methods = public_methods(api, exclude)
+        self._address = address
+        self._clients: set = set()
+        self._clients_lock = threading.Lock()
+        self.bridge = EventBridge(self.broadcast)
+
+        family, target = parse_address(address)
+        if family == "unix":
+            if os.path.exists(target):
+                if daemon_running(address):
+                    raise RuntimeError(f"a daemon is already listening on {target}")
+                os.unlink(target)   # stale socket from a crashed daemon
+            old_umask = os.umask(0o177)   # socket is 0600 — owner only
+            try:
+                self._server = _UnixServer(target, _Handler)
+            finally:
+                os.umask(old_umask)
+        else:
+            self._server = _TcpServer(target, _Handler)
+        self._server.rpc = self
+        self._pool = ThreadPoolExecutor(WORKERS, thread_name_prefix="rpc")
+
+    # ── Lifecycle ──
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            family, target = parse_address(self._address)
+            if family == "unix":
+                try:
+                    os.unlink(target)
+                except OSError:
+                    pass
+
+    def shutdown(self):
+        """Stop serve_forever (call from another thread)."""
+        self._server.shutdown()
+
+    # ── Clients / notifications ──
+
+    def _add_client(self, handler):
+        with self._clients_lock:
+            self._clients.add(handler)
+
+    def _remove_client(self, handler):
+        with self._clients_lock:
+            self._clients.discard(handler)
+
+    def broadcast(self, msg: dict):
+        with self._clients_lock:
+            clients = list(self._clients)
+        for c in clients:
+            try:
+                c.send(msg)
+            except OSError:                     # gone, or stalled past SEND_TIMEOUT
+                self._remove_client(c)
+                c.drop()
+
+    # ── Dispatch ──
+
+    def dispatch(self, raw: bytes, client):
+        """Run one line from client on the worker pool and send the reply
+        (if any) when it is done; the client's reader moves straight on."""
+        self._pool.submit(self._dispatch, raw, client)
+
+    def _dispatch(self, raw: bytes, client):
+        reply = self.handle_message(raw)
+        if reply is None:
+            return
+        try:
+            client.send(reply)                  # serialised by the client's _send_lock
+        except OSError:
+            self._remove_client(client)
+            client.drop()
+
+    def handle_message(self, raw: bytes):
+        """Handle one line: a request, a notification or a batch."""
+        try:
+            msg = json.loads(raw)
+        except ValueError:
+            return _error(None, PARSE_ERROR, "Parse error")
+        if isinstance(msg, list):
+            if not msg:
+                return _error(None, INVALID_REQUEST, "Empty batch")
+            replies = [r for r in (self._handle_one(m) for m in msg) if r is not None]
+            return replies or None
+        return self._handle_one(msg)
+
+    def _handle_one(self, msg):
+        if not isinstance(msg, dict) or not isinstance(msg.get("method"), str):
+            return _error(None, INVALID_REQUEST, "Invalid Request")
+        req_id = msg.get("id")
+        is_notification = "id" not in msg
+        method, params = msg["method"], msg.get("params", [])
+
+        try:
+            result = self._call(method, params)
+        except RpcError as e:
+            return None if is_notification else _error(req_id, e.code, str(e))
+        except Exception as e:
+            return None if is_notification else _error(req_id, INTERNAL_ERROR, str(e))
+        if is_notification:
+            return None
+        return {"jsonrpc": "2.0", "id": req_id, "result": result}
+
+    def _call(self, method: str, params):
+        if method == "rpc.ping":
+            return "pong"
+        if method == "rpc.methods":
+            return sorted(self._methods)
+        fn = self._methods.get(method)
+        if fn is None:
+            raise RpcError(METHOD_NOT_FOUND, f"Method not found: {method}")
+        try:
+            bound = inspect.signature(fn).bind(
+                *(params if isinstance(params, list) else []),
+                **(params if isinstance(params, dict) else {}),
+            )
+        except TypeError as e:
+            raise RpcError(INVALID_PARAMS, str(e))
+        return fn(*bound.args, **bound.kwargs)
+
+
+def _error(req_id, code: int, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": req_id, "error": {"code": code, "message": message}}
+
+
+# ─── Client ──────────────────────────────────────────────────────────────────
+
+class RpcClient:
+    """Connection to a running daemon.
+
+    on_event: optional callback(params: dict) for "event" notifications.
+    """
+
+    def __init__(self, address: str, on_event: Optional[Callable[[dict], None]] = None):
+        self._sock = _connect(address)
+        self._rfile = self._sock.makefile("rb")
+        self._on_event = on_event
+        self._ids = itertools.count(1)
+        self._pending: dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_loop, daemon=True, name="rpc-client")
+        self._reader.start()
+
+    def close(self):
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+
+    def _send(self, payload):
+        data = (json.dumps(payload) + "\n").encode()
+        with self._send_lock:
+            self._sock.sendall(data)
+
+    def _request(self, method: str, params) -> tuple[dict, Future]:
+        fut = Future()
+        req_id = next(self._ids)
+        with self._lock:
+            self._pending[req_id] = fut
+        return {"jsonrpc": "2.0", "id": req_id, "method": method, "params": params}, fut
+
+    def call(self, method: str, *args, **kwargs):
+        """Call one method and block for its result (raises RpcError).
+
+        JSON-RPC params are either positional or named, so args and kwargs
+        can't be mixed here (remote_api_class proxies name them all).
+        """
+        if args and kwargs:
+            raise TypeError(f"{method}: pass positional or keyword arguments, not both")
+        req, fut = self._request(method, kwargs if kwargs else list(args))
+        self._send(req)
+        return fut.result()
+
+    def batch(self, calls: list[tuple[str, list]]) -> list:
+        """Run [(method, params), ...] in one round trip.
+
+        Returns results in order; failed calls yield RpcError instances.
+        """
+        reqs, futs = zip(*(self._request(m, p) for m, p in calls)) if calls else ((), ())
+        self._send(list(reqs))
+        out = []
+        for fut in futs:
+            try:
+                out.append(fut.result())
+            except RpcError as e:
+                out.append(e)
+        return out
+
+    def _resolve(self, msg: dict):
+        with self._lock:
+            fut = self._pending.pop(msg.get("id"), None)
+        if fut is None:
+            return
+        if "error" in msg:
+            err = msg["error"] or {}
+            fut.set_exception(RpcError(err.get("code", INTERNAL_ERROR), err.get("message", "")))
+        else:
+            fut.set_result(msg.get("result"))
+
+    def _read_loop(self):
+        try:
+            for raw in self._rfile:
+                try:
+                    msg = json.loads(raw)
+                except ValueError:
+                    continue
+                for m in (msg if isinstance(msg, list) else [msg]):
+                    if "id" in m:
+                        self._resolve(m)
+                    elif m.get("method") == "event" and self._on_event:
+                        try:
+                            self._on_event(m.get("params") or {})
+                        except Exception:
+                            pass
+        except OSError:
+            pass
+        # Connection gone — fail everything still waiting
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            fut.set_exception(RpcError(INTERNAL_ERROR, "daemon connection closed"))
+
+
+def remote_api_class(api_cls, exclude: Iterable[str] = ()) -> type:
+    """Build a proxy class with api_cls's public methods forwarding to a client.
+
+    Instances take an RpcClient; signatures and docstrings are copied so
+    pywebview exposes the same js_api as the local Api.
+    """
+    skip = set(exclude) | {"set_window"}
+    attrs = {"__init__": lambda self, client: setattr(self, "_client", client)}
+    for name, fn in inspect.getmembers(api_cls, inspect.isfunction):
+        if name.startswith("_") or name in skip:
+            continue
+
+        def _make(method_name, original):
+            sig = inspect.signature(original)
+
+            @functools.wraps(original)
+            def _forward(self, *args, **kwargs):
+                if kwargs:
+                    # Mixed call: send everything by name
+                    bound = sig.bind(self, *args, **kwargs)
+                    named = dict(bound.arguments)
+                    named.pop(next(iter(sig.parameters)))      # self
+                    return self._client.call(method_name, **named)
+                return self._client.call(method_name, *args)
+            return _forward
+
+        attrs[name] = _make(name, fn)
+    return type("Remote" + api_cls.__name__, (object,), attrs)
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Operation Scheduler — resource-scoped job queue for Luke's Mirage.
+
+Replaces the single global "an operation is already running" flag.  Every
+long-running Api operation is submitted as a Job that declares the named
+resources it touches.  Jobs whose resources don't overlap run concurrently;
+conflicting jobs wait in a FIFO queue.
+
+Resources:
+  conf             bluestacks.conf (read-modify-write, uchg unlock/relock)
+  mim              MimMetaData.json and the MIM process (killed/relaunched)
+  images           the source images directory
+  disk             host disk bandwidth (large copies / downloads)
+  instance:<name>  one BlueStacks instance (start, randomize, delete, ...)
+
+Resources are exclusive by default.  A capacity > 1 (e.g. for "disk") lets
+that many jobs hold the resource at once.
+
+Ordering is FIFO per resource: a queued job never overtakes an earlier
+queued job it conflicts with, so big jobs are not starved by a stream of
+small ones.  Non-conflicting jobs behind it may start immediately.
+
+Each queued job reports its position and an ETA derived from an
+exponential moving average of past durations for the same job kind.
+Queued jobs can be cancelled outright; running jobs get a cooperative
+cancel flag they can poll via ``Scheduler.current_job()``.  Callers that
+need a job's outcome before returning block on ``Scheduler.wait(job_id)``.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+RES_CONF = "conf"
+RES_MIM = "mim"
+RES_IMAGES = "images"
+RES_DISK = "disk"
+
+# Fallback duration estimate (seconds) for job kinds with no history yet
+DEFAULT_ESTIMATE = 60.0
+
+# Weight of the newest sample in the per-kind duration average
+_EMA_ALPHA = 0.3
+
+# Finished jobs kept in snapshots so the UI can show their outcome
+_HISTORY_KEEP = 10
+
+
+def instance_resource(name: str) -> str:
+    """Resource name for one BlueStacks instance."""
+    return f"instance:{name}"
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    label: str
+    resources: frozenset
+    fn: Callable[[], None]
+    state: str = "queued"   # queued | running | done | failed | cancelled
+    submitted: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    error: str = ""
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    done_event: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+
+class Scheduler:
+    """Runs jobs concurrently when their resources don't conflict.
+
+    spawn:     callable(fn) that runs fn on a new thread.  The Api passes its
+               _run_with_log so job output reaches the log panel.
+    on_change: optional callback(snapshot: list[dict]) fired whenever the
+               queue changes (submit, start, finish, cancel).
+    """
+
+    def __init__(
+        self,
+        spawn: Optional[Callable[[Callable[[], None]], None]] = None,
+        capacities: Optional[dict[str, int]] = None,
+        on_change: Optional[Callable[[list[dict]], None]] = None,
+    ):
+        self._spawn = spawn or (lambda fn: threading.Thread(target=fn, daemon=True).start())
+        self._capacities = dict(capacities or {})
+        self._on_change = on_change
+
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._queue: list[Job] = []
+        self._running: list[Job] = []
+        self._finished: list[Job] = []
+        self._usage: dict[str, int] = {}
+        self._estimates: dict[str, float] = {}
+        self._local = threading.local()
+
+    # ── Submission / cancellation ──
+
+    def submit(self, kind: str, label: str, resources: Iterable[str],
+               fn: Callable[[], None]) -> Job:
+        """Queue fn to run once all its resources are free. Returns the Job."""
+        job = Job(id=next(self._ids), kind=kind, label=label,
+                  resources=frozenset(resources), fn=fn)
+        with self._lock:
+            self._queue.append(job)
+            to_start = self._collect_startable()
+        self._start(to_start)
+        self._notify()
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job. Queued jobs are dropped; running jobs are flagged.
+
+        Returns True if the job was found and not already finished.
+        """
+        with self._lock:
+            for job in self._queue:
+                if job.id == job_id:
+                    self._queue.remove(job)
+                    job.cancel_event.set()
+                    job.state = "cancelled"
+                    job.finished = time.time()
+                    job.done_event.set()
+                    self._remember(job)
+                    to_start = self._collect_startable()
+                    break
+            else:
+                for job in self._running:
+                    if job.id == job_id:
+                        job.cancel_event.set()
+                        break
+                else:
+                    return False
+                to_start = []
+        self._start(to_start)
+        self._notify()
+        return True
+
+    def wait(self, job_id: int, timeout: Optional[float] = None) -> bool:
+        """Block until a job has finished or been cancelled from the queue.
+
+        Returns False on timeout.  Unknown (long finished) jobs count as done.
+        """
+        with self._lock:
+            job = next((j for j in self._queue + self._running + self._finished
+                        if j.id == job_id), None)
+        return job is None or job.done_event.wait(timeout)
+
+    def current_job(self) -> Optional[Job]:
+        """The Job executing on the calling thread (None outside a job)."""
+        return getattr(self._local, "job", None)
+
+    # ── Queries ──
+
+    def busy(self, resources: Iterable[str]) -> Optional[Job]:
+        """Return a running job holding any of resources, or None."""
+        wanted = set(resources)
+        with self._lock:
+            for job in self._running:
+                if job.resources & wanted:
+                    return job
+        return None
+
+    def snapshot(self) -> list[dict]:
+        """Running, queued and recently finished jobs with position and ETA."""
+        with self._lock:
+            now = time.time()
+            etas = self._estimate_starts(now)
+            out = []
+            for job in self._running:
+                out.append(self._job_dict(job, None, now, etas))
+            for pos, job in enumerate(self._queue, 1):
+                out.append(self._job_dict(job, pos, now, etas))
+            for job in self._finished:
+                out.append(self._job_dict(job, None, now, etas))
+        return out
+
+    # ── Internals ──
+
+    def _fits(self, job: Job, usage: dict[str, int]) -> bool:
+        return all(usage.get(r, 0) < self._capacities.get(r, 1) for r in job.resources)
+
+    def _collect_startable(self) -> list[Job]:
+        """Move startable queued jobs to running. Caller holds the lock."""
+        started = []
+        # Resources claimed by earlier queued jobs — later jobs may not overtake
+        reserved: dict[str, int] = dict(self._usage)
+        for job in list(self._queue):
+            if self._fits(job, reserved) and self._fits(job, self._usage):
+                self._queue.remove(job)
+                for r in job.resources:
+                    self._usage[r] = self._usage.get(r, 0) + 1
+                job.state = "running"
+                job.started = time.time()
+                self._running.append(job)
+                started.append(job)
+            for r in job.resources:
+                reserved[r] = reserved.get(r, 0) + 1
+        return started
+
+    def _start(self, jobs: list[Job]):
+        for job in jobs:
+            self._spawn(lambda j=job: self._execute(j))
+
+    def _execute(self, job: Job):
+        self._local.job = job
+        try:
+            job.fn()
+            job.state = "cancelled" if job.cancelled else "done"
+        except Exception as e:
+            job.state = "failed"
+            job.error = str(e)
+            print(f"[Error] {job.label}: {e}")
+        finally:
+            self._local.job = None
+            job.finished = time.time()
+            with self._lock:
+                self._running.remove(job)
+                for r in job.resources:
+                    self._usage[r] -= 1
+                    if self._usage[r] <= 0:
+                        del self._usage[r]
+                if job.state == "done":
+                    self._record_duration(job.kind, job.finished - job.started)
+                self._remember(job)
+                to_start = self._collect_startable()
+            job.done_event.set()
+            self._start(to_start)
+            self._notify()
+
+    def _remember(self, job: Job):
+        self._finished.insert(0, job)
+        del self._finished[_HISTORY_KEEP:]
+
+    def _record_duration(self, kind: str, secs: float):
+        prev = self._estimates.get(kind)
+        self._estimates[kind] = secs if prev is None else (
+            _EMA_ALPHA * secs + (1 - _EMA_ALPHA) * prev)
+
+    def _estimate(self, kind: str) -> float:
+        return self._estimates.get(kind, DEFAULT_ESTIMATE)
+
+    def _estimate_starts(self, now: float) -> dict[int, float]:
+        """Estimated seconds-from-now until each queued job starts.
+
+        Simulates the queue in order: a job starts when the latest-finishing
+        earlier job that shares a resource with it is done.
+        """
+        finish_at: list[tuple[frozenset, float]] = []
+        for job in self._running:
+            remaining = max(0.0, self._estimate(job.kind) - (now - (job.started or now)))
+            finish_at.append((job.resources, remaining))
+        starts: dict[int, float] = {}
+        for job in self._queue:
+            start = max((f for res, f in finish_at if res & job.resources), default=0.0)
+            starts[job.id] = start
+            finish_at.append((job.resources, start + self._estimate(job.kind)))
+        return starts
+
+    def _job_dict(self, job: Job, position: Optional[int], now: float,
+                  etas: dict[int, float]) -> dict:
+        d = {
+            "id": job.id,
+            "kind": job.kind,
+            "label": job.label,
+            "state": job.state,
+            "resources": sorted(job.resources),
+            "position": position,
+            "submitted": job.submitted,
+            "error": job.error,
+            "cancel_requested": job.cancelled,
+        }
+        if job.state == "queued":
+            start_in = etas.get(job.id, 0.0)
+            d["eta_start_secs"] = round(start_in)
+            d["eta_done_secs"] = round(start_in + self._estimate(job.kind))
+        elif job.state == "running":
+            elapsed = now - (job.started or now)
+            d["elapsed_secs"] = round(elapsed)
+            d["eta_done_secs"] = round(max(0.0, self._estimate(job.kind) - elapsed))
+        else:
+            d["duration_secs"] = round((job.finished or now) - (job.started or job.submitted))
+        return d
+
+    def _notify(self):
+        if self._on_change:
+            try:
+                self._on_change(self.snapshot())
+            except Exception:
+                pass
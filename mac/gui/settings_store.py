@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Settings Store — in-memory settings with debounced, atomic write-behind.
+
+The GUI used to re-read and re-parse its settings JSON on almost every Api
+call and rewrite (and fsync) the whole file on every change, including the
+VPN proxy pool, which can be large.  The store loads the file once, serves
+reads from memory and only writes what changed:
+
+    store = SettingsStore(path, split=("vpn_proxy_pool",))
+    store.get("engine_dir", "")
+    store.set("engine_dir", "/path")       # marks the key dirty
+    store.update({"a": 1, "b": 2})
+    store.pop("wizard_pending")
+    store.flush()                           # write now (also on close())
+
+Writes are debounced: a burst of changes within ``delay`` seconds becomes
+one write, and nothing stays unwritten longer than ``max_delay``.  Every
+write goes to a temp file that is fsynced and renamed over the target, so
+a crash leaves either the old or the new file, never a torn one.
+
+Keys listed in ``split`` live in their own file next to the main one
+(``.jorkspoofer_gui.json`` -> ``.jorkspoofer_gui.vpn_proxy_pool.json``),
+so changing a small setting doesn't rewrite a large collection and vice
+versa.  A main file from an older version that still holds a split key is
+migrated on the first write.
+
+Values handed out by get() / snapshot() are copies; change settings only
+through set() / update() / pop() / replace().
+
+Requires: nothing beyond the standard library
+"""
+from __future__ import annotations
+
+import copy
+import json
+import os
+import threading
+import time
+from typing import Any, Iterable, Optional
+
+# Quiet period before dirty settings are written (seconds)
+WRITE_DELAY = 0.5
+
+# Upper bound on how long a change may stay unwritten under constant churn
+MAX_WRITE_DELAY = 5.0
+
+_MISSING = object()
+_MAIN = ""          # dirty marker for the main file
+
+
+class SettingsStore:
+    """Process-wide settings held in memory; see the module docstring."""
+
+    def __init__(self, path: str, split: Iterable[str] = (),
+                 delay: float = WRITE_DELAY, max_delay: float = MAX_WRITE_DELAY):
+        self._path = path
+        self._split = tuple(split)
+        self._delay = delay
+        self._max_delay = max_delay
+        self._data: dict[str, Any] = {}
+        self._loaded = False
+        self._dirty: set[str] = set()
+        self._first_dirty: Optional[float] = None
+        self._last_change = 0.0
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()     # one writer at a time
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.counters = {"writes": 0, "files_written": 0, "errors": 0}
+        self.last_error = ""
+
+    # ── Reads ──
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            self._ensure_loaded()
+            value = self._data.get(key, _MISSING)
+        return default if value is _MISSING else copy.deepcopy(value)
+
+    def snapshot(self) -> dict:
+        """Copy of every setting."""
+        with self._lock:
+            self._ensure_loaded()
+            return copy.deepcopy(self._data)
+
+    # ── Writes ──
+
+    def set(self, key: str, value: Any):
+        self.update({key: value})
+
+    def update(self, values: dict):
+        with self._lock:
+            self._ensure_loaded()
+            for key, value in values.items():
+                if self._data.get(key, _MISSING) != value:
+                    self._data[key] = copy.deepcopy(value)
+                    self._mark(key)
+        self._schedule()
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            self._ensure_loaded()
+            value = self._data.pop(key, _MISSING)
+            if value is not _MISSING:
+                self._mark(key)
+        self._schedule()
+        return default if value is _MISSING else value
+
+    def replace(self, data: dict):
+        """Make the settings exactly data; only keys that differ are marked."""
+        with self._lock:
+            self._ensure_loaded()
+            for key in [k for k in self._data if k not in data]:
+                del self._data[key]
+                self._mark(key)
+            for key, value in data.items():
+                if self._data.get(key, _MISSING) != value:
+                    self._data[key] = copy.deepcopy(value)
+                    self._mark(key)
+        self._schedule()
+
+    # ── Persistence ──
+
+    def flush(self) -> bool:
+        """Write everything dirty now. False if a file couldn't be written
+        (it stays dirty and is retried on the next flush)."""
+        with self._io_lock:
+            with self._lock:
+                if not self._dirty:
+                    return True
+                dirty, self._dirty = self._dirty, set()
+                self._first_dirty = None
+                payloads = {}
+                for name in dirty:
+                    if name == _MAIN:
+                        main = {k: v for k, v in self._data.items() if k not in self._split}
+                        payloads[name] = json.dumps(main, indent=2)
+                    elif name in self._data:
+                        payloads[name] = json.dumps(self._data[name], indent=2)
+                    else:
+                        payloads[name] = None            # key removed: delete its file
+            failed = set()
+            for name, text in payloads.items():
+                try:
+                    self._write(self._file_for(name), text)
+                    self.counters["files_written"] += 1
+                except OSError as e:
+                    failed.add(name)
+                    self.counters["errors"] += 1
+                    self.last_error = f"{self._file_for(name)}: {e}"
+            self.counters["writes"] += 1
+            if failed:
+                with self._lock:
+                    self._dirty |= failed
+                    self._first_dirty = self._first_dirty or time.monotonic()
+            return not failed
+
+    def close(self):
+        """Stop the write-behind thread and flush (call on shutdown)."""
+        self._stop.set()
+        self._wake.set()
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters, dirty=sorted(k or "(main)" for k in self._dirty),
+                        last_error=self.last_error)
+
+    # ── Internals ──
+
+    def _file_for(self, name: str) -> str:
+        if name == _MAIN:
+            return self._path
+        root, ext = os.path.splitext(self._path)
+        return f"{root}.{name}{ext or '.json'}"
+
+    def _ensure_loaded(self):
+        # Lock held
+        if self._loaded:
+            return
+        self._loaded = True
+        self._data = _read_json(self._path, {})
+        if not isinstance(self._data, dict):
+            self._data = {}
+        for key in self._split:
+            if key in self._data:
+                self._dirty |= {_MAIN, key}      # legacy layout: move it out
+                continue
+            value = _read_json(self._file_for(key), _MISSING)
+            if value is not _MISSING:
+                self._data[key] = value
+        if self._dirty:
+            self._first_dirty = time.monotonic()
+
+    def _mark(self, key: str):
+        # Lock held
+        self._dirty.add(key if key in self._split else _MAIN)
+        self._last_change = time.monotonic()
+        if self._first_dirty is None:
+            self._first_dirty = self._last_change
+
+    def _schedule(self):
+        if self._thread is None and not self._stop.is_set():
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._write_loop, daemon=True, name="settings-writer")
+                    self._thread.start()
+        self._wake.set()
+
+    def _write_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            while not self._stop.is_set():
+                with self._lock:
+                    if not self._dirty:
+                        break
+                    now = time.monotonic()
+                    due = min(self._last_change + self._delay,
+                              (self._first_dirty or now) + self._max_delay)
+                if now >= due:
+                    self.flush()
+                    break
+                self._stop.wait(due - now)
+
+    @staticmethod
+    def _write(path: str, text: Optional[str]):
+        if text is None:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            return
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+
+def _read_json(path: str, default: Any) -> Any:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
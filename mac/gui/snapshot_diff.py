@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Snapshot Diff — versioned instance-list snapshots answered as patches.
+
+The UI polls the instance list every few seconds, and for a large fleet
+almost nothing changes between polls.  The differ keeps the last snapshot
+it handed out, bumps a version number whenever the list changes, and
+answers a poll with a patch against the version the caller already has:
+
+    sync = differ.sync(records, since_version=client_version)
+    {"full": False, "version": 8, "base_version": 7,
+     "patch": {"added":   [{...record...}],
+               "removed": ["Tiramisu64_3"],
+               "changed": [{"name": "Tiramisu64_2", "fields": {"running": True}}]}}
+
+When the caller's version is not the one the patch is based on (first
+call, another client advanced the snapshot, a reply got lost), the full
+list is returned instead with ``"full": True`` and ``"records"``.
+
+Versions start at the process start time in milliseconds, so a client
+holding a version from a previous run never matches by accident.
+
+Requires: nothing beyond the standard library
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+
+def diff(old: dict[str, dict], new: dict[str, dict]) -> dict:
+    """Per-record patch turning old into new ({key: record} maps)."""
+    added = [rec for key, rec in new.items() if key not in old]
+    removed = [key for key in old if key not in new]
+    changed = []
+    for key, rec in new.items():
+        prev = old.get(key)
+        if prev is None or prev == rec:
+            continue
+        fields = {f: v for f, v in rec.items() if prev.get(f) != v}
+        fields.update({f: None for f in prev if f not in rec})
+        changed.append({"name": key, "fields": fields})
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+def is_empty(patch: dict) -> bool:
+    return not (patch["added"] or patch["removed"] or patch["changed"])
+
+
+class SnapshotDiffer:
+    """Holds the last snapshot sent to the UI and its version."""
+
+    def __init__(self, key: str = "name"):
+        self._key = key
+        self._lock = threading.Lock()
+        self._snapshot: dict[str, dict] = {}
+        self._version = int(time.time() * 1000)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def sync(self, records: list[dict], since_version: Optional[int] = None) -> dict:
+        """Record the new list; return a patch for since_version or the full list."""
+        new = {rec[self._key]: dict(rec) for rec in records}
+        with self._lock:
+            base = self._version
+            patch = diff(self._snapshot, new)
+            if not is_empty(patch):
+                self._version += 1
+                self._snapshot = new
+            if since_version is not None and since_version == base:
+                return {"full": False, "version": self._version,
+                        "base_version": base, "patch": patch}
+            return {"full": True, "version": self._version,
+                    "base_version": None, "records": records}